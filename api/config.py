@@ -1,17 +1,32 @@
 from typing import Any
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Body, HTTPException, status
+from pydantic import BaseModel, ValidationError
 from config.config_manager import config_manager
 from utils.schemas import (
     FaceRecognitionConfig,
     NotificationsConfig,
     BlinkConfig,
+    ParallaxConfig,
+    LivenessConfig,
     OverlayConfig,
+    VideoConfig,
 )
 from utils.enums import ConfigSections
 
 # return types for this file all generic because config returns all types of jsons
 router = APIRouter()
 
+# a section's body is checked against its own model, not whichever one it happens to fit
+SECTION_MODELS: dict[ConfigSections, type[BaseModel]] = {
+    ConfigSections.RECOGNITION: FaceRecognitionConfig,
+    ConfigSections.NOTIFICATIONS: NotificationsConfig,
+    ConfigSections.BLINK: BlinkConfig,
+    ConfigSections.PARALLAX: ParallaxConfig,
+    ConfigSections.LIVENESS: LivenessConfig,
+    ConfigSections.OVERLAY: OverlayConfig,
+    ConfigSections.VIDEO: VideoConfig,
+}
+
 
 @router.get("/", status_code=status.HTTP_200_OK)
 async def get_config() -> dict[str, Any]:
@@ -35,9 +50,14 @@ async def get_config_section(section: ConfigSections) -> dict:
 
 @router.put("/{section}", status_code=status.HTTP_200_OK)
 async def replace_config_section(
-    section: ConfigSections,
-    payload: FaceRecognitionConfig | NotificationsConfig | BlinkConfig | OverlayConfig,
+    section: ConfigSections, body: dict[str, Any] = Body(...)
 ) -> dict:
+    try:
+        payload = SECTION_MODELS[section].model_validate(body)
+    except ValidationError as exc:
+        raise HTTPException(
+            status_code=422, detail=exc.errors(include_url=False, include_context=False)
+        )
     try:
         updated_section = config_manager.replace_section(
             section.value, payload.model_dump()
@@ -0,0 +1,12 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from utils.metrics import CONTENT_TYPE, REGISTRY
+
+router = APIRouter()
+
+
+@router.get("")
+async def prometheus_metrics() -> Response:
+    """Stage latency histograms and counters in the Prometheus text format"""
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
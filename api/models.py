@@ -0,0 +1,25 @@
+from fastapi import APIRouter, Depends
+
+from api.video import get_runtime
+from database.data_operations import db
+from face_recognition.model_registry import model_registry
+from runtime_services.state import State
+
+router = APIRouter()
+
+
+@router.get("/migration")
+async def migration_status(runtime: State = Depends(get_runtime)):
+    return {"active_model": db.active_model, **runtime.model_migration.progress()}
+
+
+@router.post("/migration/cancel")
+async def migration_cancel(runtime: State = Depends(get_runtime)):
+    runtime.model_migration.cancel()
+    return {"active_model": db.active_model, **runtime.model_migration.progress()}
+
+
+@router.get("/status")
+async def models_status():
+    """Loaded models with their load / warmup times and applied session options"""
+    return {"active_model": db.active_model, "loaded": model_registry.status()}
@@ -1,8 +1,18 @@
-from utils.schemas import UserCreate, UserResponse, ImageResponse
+from utils.schemas import (
+    UserCreate,
+    UserResponse,
+    ImageResponse,
+    BatchImageResult,
+    BatchImageResponse,
+)
 from utils.enums import AccessLevel
-from database.data_operations import db
+from config import config_manager
+from database.data_operations import db, ModelMismatchError
+from face_recognition.alignment import embed_crops, largest_face_crop
+from face_recognition.model_registry import model_for_config
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
+import asyncio
 import cv2
 from insightface.app import FaceAnalysis
 import numpy as np
@@ -11,11 +21,9 @@ import numpy as np
 router = APIRouter()
 
 
-model = "buffalo_s"
-embedding_service = FaceAnalysis(
-    name=model, providers=["CPUExecutionProvider"]
-)  # change to gpu later
-embedding_service.prepare(ctx_id=0, det_size=(640, 640))
+def embedding_service(model: str) -> FaceAnalysis:
+    """Same shared model the live recognizer uses, loaded on first use"""
+    return model_for_config(config_manager.get_section("face_recognition"), model)
 
 
 @router.post("/", status_code=201)
@@ -127,10 +135,11 @@ async def add_image(
         # read in the image file
         image_bytes = await image.read()
 
-        # find the face embedding
+        # find the face embedding, with the model the gallery is currently built on
+        model = db.active_model
         nparr = np.frombuffer(image_bytes, np.uint8)
         img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        faces = embedding_service.get(img)
+        faces = embedding_service(model).get(img)
         if not faces:
             raise HTTPException(status_code=400, detail="No face found in image")
         # take largest face if multiple
@@ -140,8 +149,8 @@ async def add_image(
         )
         normed_embedding = face.normed_embedding
 
-        # add the embedding to the table
-        db.add_image(img_name, user_id, normed_embedding)
+        # add the embedding to the table, the source is kept for future model switches
+        db.add_image(img_name, user_id, normed_embedding, image_bytes, model)
 
         return ImageResponse(
             img_name=img_name,
@@ -150,6 +159,87 @@ async def add_image(
         )
     except HTTPException:
         raise
+    except ModelMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _aligned_face(
+    app: FaceAnalysis, image_bytes: bytes
+) -> tuple[np.ndarray | None, str | None]:
+    """Decode, detect and align the largest face, returns (crop, error message)"""
+    img = cv2.imdecode(np.frombuffer(image_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        return None, "Could not decode image"
+    crop = largest_face_crop(app, img)
+    if crop is None:
+        return None, "No face found in image"
+    return crop, None
+
+
+@router.post("/{user_id}/images/batch", status_code=201)
+async def add_images(
+    user_id: int, images: list[UploadFile] = File(...)
+) -> BatchImageResponse:
+    """
+    Enroll many images at once, named by their filenames
+    Faces are decoded and detected in parallel, embedded in one recognition call and
+    stored with the updated average in a single transaction
+    """
+    try:
+        user = db.get_user(user_id)
+        if not user:
+            raise HTTPException(status_code=404, detail="User not found")
+
+        model = db.active_model
+        app = embedding_service(model)
+        names = [image.filename or f"image_{i}" for i, image in enumerate(images)]
+        payloads = await asyncio.gather(*(image.read() for image in images))
+        # decode and detection both release the GIL so threads actually run in parallel
+        prepared = await asyncio.gather(
+            *(asyncio.to_thread(_aligned_face, app, payload) for payload in payloads)
+        )
+
+        taken = {row["img_name"] for row in db.get_images_for_user(user_id)}
+        results: list[BatchImageResult] = []
+        accepted: list[tuple[str, bytes]] = []
+        crops: list[np.ndarray] = []
+        for name, payload, (crop, error) in zip(names, payloads, prepared):
+            if name in taken:
+                error = "Image name already exists for user"
+            if error:
+                results.append(
+                    BatchImageResult(img_name=name, added=False, message=error)
+                )
+                continue
+            taken.add(name)
+            accepted.append((name, payload))
+            crops.append(crop)
+            results.append(
+                BatchImageResult(
+                    img_name=name,
+                    added=True,
+                    message="Successfully added image and embedding to user",
+                )
+            )
+
+        if crops:
+            embeddings = await asyncio.to_thread(embed_crops, app, crops)
+            db.add_images(
+                user_id,
+                [
+                    (name, embedding, payload)
+                    for (name, payload), embedding in zip(accepted, embeddings)
+                ],
+                model,
+            )
+
+        return BatchImageResponse(user_id=user_id, added=len(accepted), results=results)
+    except HTTPException:
+        raise
+    except ModelMismatchError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from fastapi.responses import StreamingResponse
-import asyncio
 
+from runtime_services.camera import Camera
 from runtime_services.state import State
 
 
@@ -16,6 +16,14 @@ def get_runtime(request: Request) -> State:
     return runtime
 
 
+def get_camera(camera: str, runtime: State = Depends(get_runtime)) -> Camera:
+    try:
+        return runtime.camera(camera)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Camera '{camera}' not found")
+
+
+# unscoped endpoints act on every camera
 @router.get("/start")
 async def video_start(runtime: State = Depends(get_runtime)):
     return {"video_status": await runtime.start_video()}
@@ -31,22 +39,59 @@ async def video_status(runtime: State = Depends(get_runtime)):
     return {"video_status": "Running" if runtime.is_video_running() else "Stopped"}
 
 
-@router.get("/stream")
-async def stream_video(runtime: State = Depends(get_runtime)):
-    async def frame_generator():
-        while runtime.is_video_running():
-            if runtime.latest_frame_jpg_enc:
-                _, buffer = runtime.latest_frame_jpg_enc
-                # Yield as multipart data
-                yield (
-                    b"--frame\r\n"
-                    b"Content-Type: image/jpeg\r\n\r\n"
-                    + buffer.tobytes()
-                    + b"\r\n"
-                )
-            await asyncio.sleep(0.03)  # about 30 fps
+@router.get("/pipeline")
+async def video_pipeline(runtime: State = Depends(get_runtime)):
+    return runtime.pipeline_stats()
+
+
+@router.get("/cameras")
+async def video_cameras(runtime: State = Depends(get_runtime)):
+    return {
+        name: {
+            **camera.config,
+            "video_status": "Running" if camera.is_running() else "Stopped",
+        }
+        for name, camera in runtime.cameras.items()
+    }
+
+
+@router.get("/{camera}/start")
+async def camera_start(camera: Camera = Depends(get_camera)):
+    return {"video_status": await camera.start()}
+
+
+@router.get("/{camera}/stop")
+async def camera_stop(camera: Camera = Depends(get_camera)):
+    return {"video_status": await camera.stop()}
+
+
+@router.get("/{camera}/status")
+async def camera_status(camera: Camera = Depends(get_camera)):
+    return {"video_status": "Running" if camera.is_running() else "Stopped"}
+
+
+@router.get("/{camera}/pipeline")
+async def camera_pipeline(camera: Camera = Depends(get_camera)):
+    return camera.pipeline_stats()
+
+
+@router.get("/{camera}/viewers")
+async def camera_viewers(camera: Camera = Depends(get_camera)):
+    return camera.broadcaster.stats()
+
 
+@router.get("/{camera}/stream")
+async def stream_video(
+    request: Request,
+    camera: Camera = Depends(get_camera),
+    quality: int = Query(95, ge=10, le=100, description="JPEG quality"),
+    scale: float = Query(1.0, ge=0.1, le=1, description="Downscale factor"),
+    max_fps: float | None = Query(None, gt=0, description="Cap for slow links"),
+):
+    client = f"{request.client.host}:{request.client.port}" if request.client else "-"
+    # chunks are built once per frame and variant, viewers asking alike share the bytes
     # https://stackoverflow.com/questions/21197638/create-a-mjpeg-stream-from-jpeg-images-in-python
     return StreamingResponse(
-        frame_generator(), media_type="multipart/x-mixed-replace; boundary=frame"
+        camera.broadcaster.stream(client, (quality, round(scale, 2)), max_fps),
+        media_type="multipart/x-mixed-replace; boundary=frame",
     )
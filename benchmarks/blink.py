@@ -0,0 +1,179 @@
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from config.config_manager import DEFAULT_CONFIG
+from face_recognition.alignment import mesh_points
+from liveness import Blink
+from runtime_services.frame_source import VideoFileSource
+
+# (start s, eyes closed ms), spontaneous blinks close the eyes for roughly 100-300 ms.
+# Starts are off every frame grid, so a short blink can fall on a single frame
+BLINKS = [(1.03, 120), (2.51, 180), (4.07, 250), (5.55, 140), (7.02, 200), (8.46, 300)]
+SECONDS = 10.0
+RATES = (10.0, 15.0, 30.0)
+
+
+class FrameCountBlink(Blink):
+    """The rule Blink used before timestamps: consecutive closed frames, per frame EMA"""
+
+    def __init__(self, consec_frames: int = 2):
+        super().__init__()
+        self.consec_frames = consec_frames
+        self.closed_frames = 0
+
+    def calculate_liveness(self, mesh_landmarks: np.ndarray, now: float | None = None):
+        ears = self._ears(mesh_landmarks[self._EYES])
+        if self.smoothed_ears is not None:
+            ears = 0.7 * ears + 0.3 * self.smoothed_ears
+        self.smoothed_ears = ears
+        if ears.mean() < self.ear_threshold:
+            self.closed_frames += 1
+        else:
+            if self.closed_frames >= self.consec_frames:
+                self.total_blinks += 1
+            self.closed_frames = 0
+        return self.total_blinks >= self.blinks_to_verify
+
+
+def subject(image: Path, size: int = 300) -> tuple[np.ndarray, np.ndarray]:
+    """The face open-eyed and with both eyes painted shut over FaceMesh's eye corners"""
+    face = cv2.resize(
+        cv2.imread(str(image)), (size, size), interpolation=cv2.INTER_CUBIC
+    )
+    with mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=True, refine_landmarks=True
+    ) as face_mesh:
+        results = face_mesh.process(cv2.cvtColor(face, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        raise SystemExit(f"FaceMesh finds no face in {image}")
+    points = mesh_points(results.multi_face_landmarks[0], size, size)
+
+    closed = face.copy()
+    for outer, inner in ((33, 133), (362, 263)):
+        corners = points[[outer, inner]].astype(np.float64)
+        center = corners.mean(axis=0)
+        width = np.linalg.norm(corners[1] - corners[0])
+        # skin from just below the eye, the lid covers the eye opening
+        below = np.clip(center + (0, 0.8 * width), 0, size - 1).astype(int)
+        skin = face[below[1], below[0]].tolist()
+        axes = (int(width * 0.7), int(width * 0.35))
+        cv2.ellipse(closed, tuple(center.astype(int)), axes, 0, 0, 360, skin, -1)
+        lash = (int(width * 0.6), int(width * 0.1))
+        cv2.ellipse(closed, tuple(center.astype(int)), lash, 0, 0, 180, (40, 40, 50), 2)
+    return face, closed
+
+
+def record(path: Path, fps: float, faces: tuple[np.ndarray, np.ndarray]):
+    """The subject standing at the door, swaying slightly, blinking on BLINKS"""
+    opened, closed = faces
+    size = opened.shape[0]
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (720, 720)
+    )
+    rng = np.random.default_rng(0)
+    background = cv2.GaussianBlur(
+        rng.integers(40, 90, (720, 720, 3), dtype=np.uint8), (0, 0), 3
+    )
+    for index in range(int(SECONDS * fps)):
+        t = index / fps
+        shut = any(start <= t < start + ms / 1000 for start, ms in BLINKS)
+        left = (720 - size) // 2 + int(4 * np.sin(2 * np.pi * t / 3))
+        top = (720 - size) // 2
+        frame = background.copy()
+        frame[top : top + size, left : left + size] = closed if shut else opened
+        writer.write(frame)
+    writer.release()
+
+
+def replay(
+    path: Path, fps: float, detectors: dict[str, Blink], drop: float = 0.0
+) -> dict[str, list]:
+    """
+    Timestamps where each detector counted a blink, on the clip's own clock. `drop`
+    skips that fraction of frames at random, like a latest-wins queue under load
+    """
+    counted = {name: [] for name in detectors}
+    rng = np.random.default_rng(1)
+    source = VideoFileSource(path, fps, realtime=False)
+    with mp.solutions.face_mesh.FaceMesh(
+        refine_landmarks=True, min_detection_confidence=0.7, min_tracking_confidence=0.7
+    ) as face_mesh:
+        while (item := source.read()) is not None:
+            frame, now = item
+            if rng.random() < drop:
+                continue
+            results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not results.multi_face_landmarks:
+                continue
+            points = mesh_points(results.multi_face_landmarks[0], 720, 720)
+            for name, detector in detectors.items():
+                before = detector.total_blinks
+                detector.calculate_liveness(points, now)
+                if detector.total_blinks > before:
+                    counted[name].append(now)
+    source.close()
+    return counted
+
+
+def score(times: list[float]) -> tuple[int, int]:
+    """
+    (blinks found, extra counts). A blink is counted on the first open frame after it,
+    which dropped frames can delay, so a count belongs to the last blink started
+    """
+    found, extra = set(), 0
+    for t in times:
+        started = [i for i, (start, _) in enumerate(BLINKS) if start < t]
+        if started and started[-1] not in found:
+            found.add(started[-1])
+        else:
+            extra += 1
+    return len(found), extra
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a blinking clip at several frame rates through Blink"
+    )
+    parser.add_argument("--image", help="face photo, the InsightFace sample by default")
+    parser.add_argument("--fps", type=float, nargs="+", default=list(RATES))
+    parser.add_argument(
+        "--drop", type=float, default=0.0, help="fraction of frames dropped at random"
+    )
+    args = parser.parse_args()
+
+    if args.image is None:
+        import insightface
+
+        image = Path(insightface.__file__).parent / "data/images/Tom_Hanks_54745.png"
+    else:
+        image = Path(args.image)
+    faces = subject(image)
+
+    config = DEFAULT_CONFIG["blink_config"]
+    failed = False
+    print(
+        f"{len(BLINKS)} blinks of {min(ms for _, ms in BLINKS)}-{max(ms for _, ms in BLINKS)} ms over {SECONDS:g} s"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for fps in args.fps:
+            path = Path(directory) / f"blinks_{fps:g}.avi"
+            record(path, fps, faces)
+            timed = Blink()
+            timed.configure({**config, "reset_after_s": SECONDS})
+            frames = FrameCountBlink()
+            frames.configure(config)
+            counted = replay(path, fps, {"timed": timed, "frames": frames}, args.drop)
+            line = [f"{fps:5g} fps"]
+            for name, times in counted.items():
+                found, extra = score(times)
+                line.append(f"{name} {found}/{len(BLINKS)} found, {extra} extra")
+                if name == "timed" and (found < len(BLINKS) or extra):
+                    failed = True
+            print("  ".join(line))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,100 @@
+import argparse
+import time
+import numpy as np
+
+from runtime_services.gallery_index import BruteForceIndex, IVFIndex
+from runtime_services.quantization import QuantizedMatrix
+
+
+def synthetic_gallery(n: int, dim: int, rng, latent: int = 32, chunk: int = 65536):
+    """
+    Unit vectors with low intrinsic dimension, like real face embeddings.
+    Uniform random 512-d vectors are all near orthogonal and would make any coarse
+    quantizer look worse than it does on ArcFace output
+    """
+    basis = rng.standard_normal((latent, dim)).astype(np.float32)
+    matrix = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, chunk):
+        stop = min(start + chunk, n)
+        block = rng.standard_normal((stop - start, latent)).astype(np.float32) @ basis
+        block += 0.5 * rng.standard_normal(block.shape).astype(np.float32)
+        matrix[start:stop] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return matrix
+
+
+def probe_queries(matrix: np.ndarray, count: int, noise: float, rng):
+    """Noisy re-captures of enrolled identities, roughly cos 0.7 to their target"""
+    targets = rng.choice(matrix.shape[0], count, replace=False)
+    queries = matrix[targets] + noise * rng.standard_normal(
+        (count, matrix.shape[1])
+    ).astype(np.float32) / np.sqrt(matrix.shape[1])
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries.astype(np.float32)
+
+
+def time_search(view, queries: np.ndarray, matrix: QuantizedMatrix):
+    """One query per call, the same way the video loop hits the gallery"""
+    rows = np.empty(queries.shape[0], dtype=np.int64)
+    latencies = np.empty(queries.shape[0])
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        result, _ = view.search(query[None, :], matrix, k=1)
+        latencies[i] = time.perf_counter() - start
+        rows[i] = result[0, 0]
+    return rows, latencies * 1000
+
+
+def ivf_overhead_bytes(index: IVFIndex) -> int:
+    return (
+        index.centroids.nbytes
+        + index._assign.nbytes
+        + sum(entries.nbytes for entries in index._lists)
+    )
+
+
+def run(n: int, dim: int, queries: int, nprobe: int, seed: int):
+    rng = np.random.default_rng(seed)
+    matrix = QuantizedMatrix(synthetic_gallery(n, dim, rng))
+    probes = probe_queries(matrix.codes, min(queries, n), noise=1.0, rng=rng)
+
+    exact_rows, exact_ms = time_search(BruteForceIndex().view(), probes, matrix)
+
+    ivf = IVFIndex(nprobe=nprobe)
+    start = time.perf_counter()
+    ivf.build(matrix)
+    build_s = time.perf_counter() - start
+    ivf_rows, ivf_ms = time_search(ivf.view(), probes, matrix)
+
+    recall = float(np.mean(ivf_rows == exact_rows))
+    print(f"\nN={n:,} dim={dim} queries={probes.shape[0]}")
+    print(f"  gallery matrix        {matrix.nbytes / 2**20:10.1f} MiB")
+    print(
+        f"  brute force           p50 {np.percentile(exact_ms, 50):8.3f} ms"
+        f"  p95 {np.percentile(exact_ms, 95):8.3f} ms  recall@1 1.000"
+    )
+    print(
+        f"  ivf nlist={ivf.centroids.shape[0]} nprobe={nprobe}"
+        f"  p50 {np.percentile(ivf_ms, 50):8.3f} ms"
+        f"  p95 {np.percentile(ivf_ms, 95):8.3f} ms  recall@1 {recall:.3f}"
+    )
+    print(
+        f"  ivf build {build_s:.2f} s, index overhead "
+        f"{ivf_overhead_bytes(ivf) / 2**20:.1f} MiB on top of the matrix"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Synthetic recall / latency / memory benchmark for gallery indexes"
+    )
+    parser.add_argument(
+        "-n", "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("-d", "--dim", type=int, default=512)
+    parser.add_argument("-q", "--queries", type=int, default=200)
+    parser.add_argument("-p", "--nprobe", type=int, default=8)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.nprobe, args.seed)
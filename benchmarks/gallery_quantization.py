@@ -0,0 +1,60 @@
+import argparse
+import numpy as np
+
+from benchmarks.gallery_index import probe_queries, synthetic_gallery, time_search
+from runtime_services.gallery_index import BruteForceIndex, IVFIndex
+from runtime_services.quantization import QuantizedMatrix
+
+
+def run(n: int, dim: int, queries: int, nprobe: int, seed: int):
+    rng = np.random.default_rng(seed)
+    embeddings = synthetic_gallery(n, dim, rng)
+    probes = probe_queries(embeddings, min(queries, n), noise=1.0, rng=rng)
+
+    # exact float32 scores are the reference every other path is judged against
+    reference = probes @ embeddings.T
+    exact_rows = np.argmax(reference, axis=1)
+    exact_scores = reference[np.arange(probes.shape[0]), exact_rows]
+    del reference
+
+    print(f"\nN={n:,} dim={dim} queries={probes.shape[0]}")
+    for dtype in ("float32", "float16", "int8"):
+        matrix = QuantizedMatrix.from_float(embeddings, dtype)
+        indexes = [("brute force", BruteForceIndex())]
+        if n >= 10_000:
+            indexes.append((f"ivf nprobe={nprobe}", IVFIndex(nprobe=nprobe)))
+
+        for name, index in indexes:
+            index.build(matrix)
+            rows, ms = time_search(index.view(), probes, matrix)
+            recall = float(np.mean(rows == exact_rows))
+            top = matrix.dot(probes[:64], None) if n <= 100_000 else None
+            line = (
+                f"  {dtype:8s} {name:16s} {matrix.nbytes / 2**20:9.1f} MiB"
+                f"  p50 {np.percentile(ms, 50):8.3f} ms"
+                f"  p95 {np.percentile(ms, 95):8.3f} ms  recall@1 {recall:.3f}"
+            )
+            if top is not None:
+                # worst drift of the winning score, what the similarity threshold sees
+                drift = np.abs(
+                    top[np.arange(top.shape[0]), exact_rows[:64]] - exact_scores[:64]
+                )
+                line += f"  max score err {drift.max():.5f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Memory / latency / recall of float16 and int8 galleries against float32"
+    )
+    parser.add_argument(
+        "-n", "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("-d", "--dim", type=int, default=512)
+    parser.add_argument("-q", "--queries", type=int, default=200)
+    parser.add_argument("-p", "--nprobe", type=int, default=8)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.dim, args.queries, args.nprobe, args.seed)
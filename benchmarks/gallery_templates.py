@@ -0,0 +1,99 @@
+import argparse
+import time
+import numpy as np
+
+from benchmarks.gallery_index import synthetic_gallery
+from runtime_services.gallery_index import BruteForceIndex
+from runtime_services.quantization import QuantizedMatrix
+from runtime_services.templates import TemplateStore
+
+
+def two_mode_users(users: int, images: int, dim: int, rng):
+    """
+    Each identity has two looks (glasses / no glasses, lighting) far enough apart that
+    their average sits between them. Returns per-image embeddings, owners and centroids
+    """
+    base = synthetic_gallery(2 * users, dim, rng).reshape(users, 2, dim)
+    # the second look is still the same face, about cos 0.6 to the first
+    modes = base.copy()
+    modes[:, 1] = 0.6 * base[:, 0] + 0.8 * base[:, 1]
+    modes /= np.linalg.norm(modes, axis=2, keepdims=True)
+    pick = rng.integers(0, 2, (users, images))
+    pick[:, 0], pick[:, 1] = 0, 1  # every user enrolled both looks
+    templates = modes[np.arange(users)[:, None], pick]
+    templates += (
+        0.3 * rng.standard_normal(templates.shape).astype(np.float32) / np.sqrt(dim)
+    )
+    templates /= np.linalg.norm(templates, axis=2, keepdims=True)
+    centroids = templates.mean(axis=1)
+    centroids /= np.linalg.norm(centroids, axis=1, keepdims=True)
+    return templates, centroids, modes
+
+
+def run(users: int, images: int, dim: int, queries: int, prefilter: int, seed: int):
+    rng = np.random.default_rng(seed)
+    templates, centroids, modes = two_mode_users(users, images, dim, rng)
+
+    targets = rng.choice(users, queries, replace=False)
+    looks = rng.integers(0, 2, queries)
+    probes = modes[targets, looks] + rng.standard_normal((queries, dim)).astype(
+        np.float32
+    ) / np.sqrt(dim)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    probes = probes.astype(np.float32)
+
+    matrix = QuantizedMatrix(centroids.astype(np.float32))
+    index = BruteForceIndex().view()
+    store = TemplateStore(dim)
+    for row in range(users):
+        store.set(row, templates[row])
+    view = store.view()
+
+    def centroid(query):
+        return index.search(query, matrix, 1)
+
+    def full(query):
+        best = view.max_scores_all(query)
+        return np.argmax(best, axis=1)[:, None], best.max(axis=1)[:, None]
+
+    def shortlisted(query):
+        rows, _ = index.search(query, matrix, prefilter)
+        scores = view.max_scores(query, rows)
+        best = np.argmax(scores, axis=1)
+        return rows[np.arange(rows.shape[0]), best][:, None], scores.max(axis=1)
+
+    print(f"\nusers={users:,} images/user={images} queries={queries}")
+    for name, search in (
+        ("centroid", centroid),
+        ("templates, all", full),
+        (f"templates, prefilter {prefilter}", shortlisted),
+    ):
+        hits = np.empty(queries, dtype=bool)
+        scores = np.empty(queries)
+        latencies = np.empty(queries)
+        for i, probe in enumerate(probes):
+            start = time.perf_counter()
+            rows, top = search(probe[None, :])
+            latencies[i] = (time.perf_counter() - start) * 1000
+            hits[i] = rows[0, 0] == targets[i]
+            scores[i] = np.ravel(top)[0]
+        print(
+            f"  {name:26s} p50 {np.percentile(latencies, 50):8.3f} ms"
+            f"  recall@1 {hits.mean():.3f}  mean top score {scores.mean():.3f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Centroid vs multi-template matching on identities with two looks"
+    )
+    parser.add_argument("-u", "--users", type=int, nargs="+", default=[1_000, 20_000])
+    parser.add_argument("-i", "--images", type=int, default=5)
+    parser.add_argument("-d", "--dim", type=int, default=512)
+    parser.add_argument("-q", "--queries", type=int, default=200)
+    parser.add_argument("-p", "--prefilter", type=int, default=16)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for size in args.users:
+        run(size, args.images, args.dim, args.queries, args.prefilter, args.seed)
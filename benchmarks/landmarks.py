@@ -0,0 +1,94 @@
+import argparse
+import time
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from face_recognition.alignment import mesh_bbox, mesh_keypoints, mesh_xyz
+from liveness import Blink
+
+_RIGHT_EYE = [33, 159, 158, 133, 153, 145]
+_LEFT_EYE = [362, 380, 374, 263, 386, 385]
+
+
+def synthetic_face(rng, count: int = 478) -> landmark_pb2.NormalizedLandmarkList:
+    """A FaceMesh-sized landmark list roughly where a face sits in the frame"""
+    face = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z in rng.uniform((0.3, 0.25, -0.1), (0.7, 0.75, 0.1), (count, 3)):
+        face.landmark.add(x=x, y=y, z=z)
+    return face
+
+
+def legacy(face, width: int, height: int):
+    """The per-landmark dict path the video loop used before landmark arrays"""
+    landmarks_dict = {}
+    x1, y1, x2, y2 = width, height, 0, 0
+    for i, lm in enumerate(face.landmark):
+        x = int(lm.x * width)
+        y = int(lm.y * height)
+        landmarks_dict[i] = (x, y)
+        x1 = min(x1, x)
+        y1 = min(y1, y)
+        x2 = max(x2, x)
+        y2 = max(y2, y)
+    bbox = (max(x1 - 15, 0), max(y1 - 15, 0), min(x2 + 15, width), min(y2 + 15, height))
+
+    def ear(eye):
+        a = np.linalg.norm(
+            np.array(landmarks_dict[eye[1]]) - np.array(landmarks_dict[eye[5]])
+        )
+        b = np.linalg.norm(
+            np.array(landmarks_dict[eye[2]]) - np.array(landmarks_dict[eye[4]])
+        )
+        c = np.linalg.norm(
+            np.array(landmarks_dict[eye[0]]) - np.array(landmarks_dict[eye[3]])
+        )
+        return (a + b) / (2.0 * c)
+
+    ears = (ear(_RIGHT_EYE), ear(_LEFT_EYE))
+    keypoints = np.array(
+        [landmarks_dict[i] for i in (468, 473, 1, 61, 291)], dtype=np.float32
+    )
+    return bbox, ears, keypoints
+
+
+def vectorized(face, width: int, height: int):
+    xyz = mesh_xyz(face, width, height)
+    points = xyz[:, :2].astype(np.int32)
+    bbox = mesh_bbox(points, width, height)
+    ears = tuple(Blink._ears(points[np.array([_RIGHT_EYE, _LEFT_EYE])]).tolist())
+    return bbox, ears, mesh_keypoints(xyz[:, :2])
+
+
+def run(frames: int, width: int, height: int, seed: int):
+    face = synthetic_face(np.random.default_rng(seed))
+    expected = legacy(face, width, height)
+    got = vectorized(face, width, height)
+    assert got[0] == expected[0], (got[0], expected[0])
+    # the dict path rounds keypoints to whole pixels, the array path keeps subpixels
+    assert np.allclose(got[1], expected[1]) and np.allclose(got[2], expected[2], atol=1)
+
+    print(f"\n478 landmarks, {width}x{height}, {frames} frames")
+    for name, path in (("dict (before)", legacy), ("array (after)", vectorized)):
+        path(face, width, height)  # warm up
+        latencies = np.empty(frames)
+        for i in range(frames):
+            start = time.perf_counter()
+            path(face, width, height)
+            latencies[i] = (time.perf_counter() - start) * 1e6
+        print(
+            f"  {name:14s} p50 {np.percentile(latencies, 50):8.1f} us"
+            f"  p99 {np.percentile(latencies, 99):8.1f} us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-face landmark cost: bbox, EAR and alignment points"
+    )
+    parser.add_argument("-f", "--frames", type=int, default=2000)
+    parser.add_argument("--width", type=int, default=720)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    run(args.frames, args.width, args.height, args.seed)
@@ -0,0 +1,196 @@
+import argparse
+import sys
+from pathlib import Path
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from config.config_manager import DEFAULT_CONFIG
+from face_recognition.alignment import mesh_xyz
+from liveness import LIVE, Parallax
+
+SIZE = 720
+SECONDS = 3.0
+RATES = (10.0, 15.0, 30.0)
+# a face's liveness checks start once it is recognized, a frame or two in
+RECOGNIZED_S = 0.1
+# a visitor waiting at the door: a few degrees of sway, nothing deliberate
+SWAY_DEG = (2.0, 1.5)  # yaw, pitch amplitude
+SWAY_S = (2.3, 3.1)  # yaw, pitch period
+
+
+def head_model(image: Path, size: int = 300) -> dict:
+    """The face, its FaceMesh vertices with depth, and the mesh's triangles"""
+    face = cv2.resize(
+        cv2.imread(str(image)), (size, size), interpolation=cv2.INTER_CUBIC
+    )
+    with mp.solutions.face_mesh.FaceMesh(static_image_mode=True) as face_mesh:
+        results = face_mesh.process(cv2.cvtColor(face, cv2.COLOR_BGR2RGB))
+    if not results.multi_face_landmarks:
+        raise SystemExit(f"FaceMesh finds no face in {image}")
+    vertices = mesh_xyz(results.multi_face_landmarks[0], size, size)
+
+    neighbours: dict[int, set[int]] = {}
+    for a, b in mp.solutions.face_mesh.FACEMESH_TESSELATION:
+        neighbours.setdefault(a, set()).add(b)
+        neighbours.setdefault(b, set()).add(a)
+    triangles = sorted(
+        {
+            tuple(sorted((a, b, c)))
+            for a, linked in neighbours.items()
+            for b in linked
+            for c in linked & neighbours[b]
+        }
+    )
+    return {"face": face, "vertices": vertices, "triangles": np.array(triangles)}
+
+
+def _rotation(yaw: float, pitch: float) -> np.ndarray:
+    cy, sy, cp, sp = np.cos(yaw), np.sin(yaw), np.cos(pitch), np.sin(pitch)
+    return np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]]) @ np.array(
+        [[cy, 0, sy], [0, 1, 0], [-sy, 0, cy]]
+    )
+
+
+def _paste_triangle(frame, face, source, target):
+    x, y, w, h = cv2.boundingRect(target.astype(np.float32))
+    if w <= 0 or h <= 0 or x < 0 or y < 0 or x + w > SIZE or y + h > SIZE:
+        return
+    warp = cv2.getAffineTransform(
+        source.astype(np.float32), (target - (x, y)).astype(np.float32)
+    )
+    patch = cv2.warpAffine(
+        face, warp, (w, h), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT
+    )
+    mask = np.zeros((h, w), np.uint8)
+    cv2.fillConvexPoly(mask, np.round(target - (x, y)).astype(np.int32), 1)
+    region = frame[y : y + h, x : x + w]
+    region[mask > 0] = patch[mask > 0]
+
+
+def render_head(model: dict, yaw: float, pitch: float, backdrop: np.ndarray):
+    """
+    The face as a textured 3D mesh turned about a pivot behind it, so the nose moves
+    against the cheeks the way a real head's does
+    """
+    face, vertices = model["face"], model["vertices"]
+    size = face.shape[0]
+    pivot = vertices.mean(axis=0) + (0, 0, 0.5 * size)
+    turned = (vertices - pivot) @ _rotation(yaw, pitch).T + pivot
+    offset = (SIZE - size) / 2
+    frame = backdrop.copy()
+    # the photo behind the mesh keeps hair and ears in place
+    frame[int(offset) : int(offset) + size, int(offset) : int(offset) + size] = face
+    # far triangles first, FaceMesh depth grows away from the camera
+    order = np.argsort(-turned[model["triangles"], 2].mean(axis=1))
+    for triangle in model["triangles"][order]:
+        _paste_triangle(
+            frame, face, vertices[triangle, :2], turned[triangle, :2] + offset
+        )
+    return frame
+
+
+def render_card(face: np.ndarray, yaw: float, pitch: float, backdrop: np.ndarray):
+    """The same photo on a flat card held half a metre away, turned the same way"""
+    size = face.shape[0]
+    corners = np.array([[-1, -1, 0], [1, -1, 0], [1, 1, 0], [-1, 1, 0]], np.float64) * (
+        size / 2
+    )
+    turned = corners @ _rotation(yaw, pitch).T
+    distance = 4.0 * size  # the card's width is a quarter of its distance
+    projected = turned[:, :2] * distance / (distance + turned[:, 2:]) + SIZE / 2
+    source = np.array([[0, 0], [size, 0], [size, size], [0, size]], np.float32)
+    warp = cv2.getPerspectiveTransform(source, projected.astype(np.float32))
+    card = cv2.warpPerspective(face, warp, (SIZE, SIZE))
+    inside = cv2.warpPerspective(np.ones(face.shape[:2], np.uint8), warp, (SIZE, SIZE))
+    frame = backdrop.copy()
+    frame[inside > 0] = card[inside > 0]
+    return frame
+
+
+SCENES = {
+    # name: (renderer, sway scale, should go live)
+    "head": ("head", 1.0, True),
+    "still head": ("head", 0.0, False),
+    "card": ("card", 1.0, False),
+    "card, big turns": ("card", 4.0, False),
+}
+
+
+def frames(model: dict, scene: str, fps: float):
+    """(frame, timestamp) of one scene, with a little sensor noise on every frame"""
+    renderer, scale, _ = SCENES[scene]
+    rng = np.random.default_rng(0)
+    backdrop = cv2.GaussianBlur(
+        rng.integers(40, 90, (SIZE, SIZE, 3), dtype=np.uint8), (0, 0), 3
+    )
+    for index in range(int(SECONDS * fps)):
+        t = index / fps
+        yaw, pitch = (
+            np.radians(scale * amplitude) * np.sin(2 * np.pi * t / period + phase)
+            for amplitude, period, phase in zip(SWAY_DEG, SWAY_S, (0.0, 1.0))
+        )
+        if renderer == "head":
+            frame = render_head(model, yaw, pitch, backdrop)
+        else:
+            frame = render_card(model["face"], yaw, pitch, backdrop)
+        noise = rng.normal(0, 2, frame.shape)
+        yield np.clip(frame + noise, 0, 255).astype(np.uint8), t
+
+
+def replay(model: dict, scene: str, fps: float, config: dict) -> dict:
+    """
+    When Parallax passed, timed from the face's first frame, and what it saw. Like a
+    camera, the check starts once the face is recognized, RECOGNIZED_S after it appears
+    """
+    parallax = Parallax()
+    parallax.configure(config)
+    live, first = None, None
+    with mp.solutions.face_mesh.FaceMesh(
+        refine_landmarks=True, min_detection_confidence=0.7, min_tracking_confidence=0.7
+    ) as face_mesh:
+        for frame, now in frames(model, scene, fps):
+            results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if not results.multi_face_landmarks:
+                continue
+            first = now if first is None else first
+            if now - first < RECOGNIZED_S:
+                continue
+            xyz = mesh_xyz(results.multi_face_landmarks[0], SIZE, SIZE)
+            if parallax.update(xyz, now) == LIVE and live is None:
+                live = now - first
+    return {"live": live, **parallax.evidence()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render a swaying head and a swaying photo, replay both through Parallax"
+    )
+    parser.add_argument("--image", help="face photo, the InsightFace sample by default")
+    parser.add_argument("--fps", type=float, nargs="+", default=list(RATES))
+    args = parser.parse_args()
+
+    if args.image is None:
+        import insightface
+
+        image = Path(insightface.__file__).parent / "data/images/Tom_Hanks_54745.png"
+    else:
+        image = Path(args.image)
+    model = head_model(image)
+    config = DEFAULT_CONFIG["parallax_config"]
+
+    failed = False
+    print(f"{SWAY_DEG[0]:g}° yaw and {SWAY_DEG[1]:g}° pitch sway over {SECONDS:g} s")
+    for fps in args.fps:
+        for scene, (_, _, expected) in SCENES.items():
+            result = replay(model, scene, fps, config)
+            passed = result["live"]
+            print(
+                f"{fps:5g} fps  {scene:16s}"
+                f" live {'-' if passed is None else f'{passed:.2f} s':>7s}"
+                f"  peak {result['peak_parallax']:.4f} rad"
+            )
+            if (passed is not None) != expected:
+                failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,89 @@
+import argparse
+import multiprocessing as mp
+import resource
+import time
+import cv2
+import numpy as np
+
+from face_recognition.model_registry import DEFAULT_MODULES
+
+FULL_STACK = (
+    None  # FaceAnalysis loads every head in the pack when allowed_modules is None
+)
+
+
+def _rss_mib() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * resource.getpagesize() / 2**20
+
+
+def _measure(model: str, modules, image_path: str | None, frames: int, queue):
+    """Runs in a fresh process so each configuration's memory is counted on its own"""
+    from insightface.app import FaceAnalysis
+    from insightface.data import get_image
+
+    baseline = _rss_mib()
+    start = time.perf_counter()
+    app = FaceAnalysis(
+        name=model, providers=["CPUExecutionProvider"], allowed_modules=modules
+    )
+    app.prepare(ctx_id=0, det_size=(640, 640))
+    load_s = time.perf_counter() - start
+
+    frame = cv2.imread(image_path) if image_path else get_image("Tom_Hanks_54745")
+    app.get(frame)  # first call pays for lazy allocations
+    latencies = np.empty(frames)
+    faces = 0
+    for i in range(frames):
+        start = time.perf_counter()
+        faces = len(app.get(frame))
+        latencies[i] = time.perf_counter() - start
+
+    queue.put(
+        {
+            "heads": sorted(app.models.keys()),
+            "load_s": load_s,
+            "faces": faces,
+            "p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "p95_ms": float(np.percentile(latencies, 95) * 1000),
+            "rss_mib": _rss_mib() - baseline,
+            "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        }
+    )
+
+
+def run(model: str, modules, image_path: str | None, frames: int) -> dict:
+    ctx = mp.get_context("spawn")
+    queue = ctx.Queue()
+    proc = ctx.Process(
+        target=_measure, args=(model, modules, image_path, frames, queue)
+    )
+    proc.start()
+    result = queue.get()
+    proc.join()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Per-frame latency and memory of the full model pack vs detection + recognition only"
+    )
+    parser.add_argument("-m", "--model", default="buffalo_s")
+    parser.add_argument(
+        "-i", "--image", help="frame to run, defaults to an InsightFace sample"
+    )
+    parser.add_argument("-f", "--frames", type=int, default=50)
+    args = parser.parse_args()
+
+    for label, modules in (("full stack", FULL_STACK), ("det + rec", DEFAULT_MODULES)):
+        result = run(args.model, modules, args.image, args.frames)
+        print(f"\n{label}: {', '.join(result['heads'])}")
+        print(f"  load {result['load_s']:.2f} s, faces per frame {result['faces']}")
+        print(
+            f"  per frame p50 {result['p50_ms']:.1f} ms  p95 {result['p95_ms']:.1f} ms"
+        )
+        print(
+            f"  model memory {result['rss_mib']:.0f} MiB,"
+            f" peak process rss {result['peak_rss_mib']:.0f} MiB"
+        )
@@ -0,0 +1,104 @@
+import argparse
+import json
+
+from runtime_services.replay import STAGES, Replay
+
+
+def print_report(report: dict):
+    print(f"\n{report['source']}{' (realtime)' if report['realtime'] else ''}")
+    print(
+        f"  {report['frames']} frames, {report['processed']} past the motion gate"
+        f" in {report['seconds']:.2f} s, {report['fps']:.1f} fps"
+    )
+    for stage in STAGES:
+        stats = report["stages"][stage]
+        if not stats["count"]:
+            continue
+        print(
+            f"  {stage:12s} n {stats['count']:6d}  p50 {stats['p50_ms']:8.2f} ms"
+            f"  p95 {stats['p95_ms']:8.2f} ms  p99 {stats['p99_ms']:8.2f} ms"
+        )
+    for change in report["decisions"]:
+        faces = ", ".join(
+            f"{face['name']} verified={face['verified']} live={face['live']}"
+            for face in change["faces"]
+        )
+        print(f"  frame {change['frame']:6d} t {change['t']:8.2f}s  {faces or '-'}")
+    for unlock in report["unlocks"]:
+        print(
+            f"  frame {unlock['frame']:6d} t {unlock['t']:8.2f}s  unlock {unlock['lock']}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay a clip, image directory or synthetic frames through the video pipeline"
+    )
+    parser.add_argument(
+        "source",
+        nargs="?",
+        default="synthetic",
+        help="video file, image directory, device index or 'synthetic'",
+    )
+    parser.add_argument(
+        "-k",
+        "--kind",
+        default="auto",
+        choices=["auto", "camera", "video", "images", "synthetic"],
+    )
+    parser.add_argument("--fps", type=float, help="playback rate of images and files")
+    parser.add_argument("--width", type=int, default=720)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("-f", "--frames", type=int, help="stop after this many frames")
+    parser.add_argument(
+        "--max-faces", type=int, default=4, help="FaceMesh faces per frame"
+    )
+    parser.add_argument(
+        "--realtime", action="store_true", help="pace frames at their recorded timing"
+    )
+    parser.add_argument("--no-recognition", dest="recognize", action="store_false")
+    parser.add_argument("--no-render", dest="render", action="store_false")
+    parser.add_argument(
+        "-r",
+        "--repeat",
+        type=int,
+        default=1,
+        help="replay again and check decisions match",
+    )
+    parser.add_argument("-o", "--output", help="write the last report as JSON")
+    args = parser.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    replay = Replay(
+        {
+            "source": source,
+            "kind": args.kind,
+            "fps": args.fps,
+            "width": args.width,
+            "height": args.height,
+            "max_faces": args.max_faces,
+        },
+        realtime=args.realtime,
+        recognize=args.recognize,
+        render=args.render,
+    )
+    replay.warm_up()
+    reports = []
+    try:
+        for _ in range(args.repeat):
+            reports.append(replay.run(args.frames))
+            print_report(reports[-1])
+    finally:
+        replay.close()
+
+    outcomes = {
+        json.dumps([report["decisions"], report["unlocks"]]) for report in reports
+    }
+    if args.repeat > 1:
+        print(
+            f"\n{args.repeat} replays, "
+            + ("decisions identical" if len(outcomes) == 1 else "DECISIONS DIFFER")
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports[-1], f, indent=2)
@@ -0,0 +1,100 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import onnx
+from onnx import TensorProto, helper, numpy_helper
+
+STUB_MODEL = "bench_stub"
+DET_SIZE = 640
+
+
+def _model(graph) -> onnx.ModelProto:
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    return model
+
+
+def detector() -> onnx.ModelProto:
+    """
+    SCRFD shaped detector (3 strides x score, bbox, kps, 2 anchors) that always finds
+    one face in the middle of its 640x640 input. The input still flows through the graph
+    so ONNX Runtime can't fold the outputs into constants
+    """
+    nodes = [
+        helper.make_node("ReduceMean", ["input.1"], ["mean"], keepdims=0),
+        helper.make_node("Mul", ["mean", "zero"], ["zeros"]),
+    ]
+    initializers = [numpy_helper.from_array(np.zeros(1, np.float32), "zero")]
+    outputs: dict[str, list] = {"score": [], "bbox": [], "kps": []}
+    for stride in (8, 16, 32):
+        cells = DET_SIZE // stride
+        score = np.zeros((cells * cells * 2, 1), np.float32)
+        bbox = np.zeros((cells * cells * 2, 4), np.float32)
+        kps = np.zeros((cells * cells * 2, 10), np.float32)
+        if stride == 32:
+            anchor = ((cells // 2) * cells + cells // 2) * 2
+            score[anchor] = 0.99
+            bbox[anchor] = np.array([100, 120, 100, 130]) / stride  # l, t, r, b
+            points = [[-35, -30], [35, -30], [0, 5], [-28, 45], [28, 45]]
+            kps[anchor] = np.array(points, np.float32).reshape(-1) / stride
+        for kind, values in (("score", score), ("bbox", bbox), ("kps", kps)):
+            name = f"{kind}_{stride}"
+            initializers.append(numpy_helper.from_array(values, f"{name}_const"))
+            nodes.append(helper.make_node("Add", [f"{name}_const", "zeros"], [name]))
+            outputs[kind].append(
+                helper.make_tensor_value_info(name, TensorProto.FLOAT, values.shape)
+            )
+    graph = helper.make_graph(
+        nodes,
+        "det_stub",
+        [
+            helper.make_tensor_value_info(
+                "input.1", TensorProto.FLOAT, [1, 3, DET_SIZE, DET_SIZE]
+            )
+        ],
+        outputs["score"] + outputs["bbox"] + outputs["kps"],
+        initializers,
+    )
+    return _model(graph)
+
+
+def recognizer(seed: int = 0) -> onnx.ModelProto:
+    """112x112 crop -> 16x16 average pool -> fixed random projection to 512 dims"""
+    weights = np.random.default_rng(seed).standard_normal((147, 512)).astype(np.float32)
+    nodes = [
+        helper.make_node(
+            "AveragePool", ["data"], ["pooled"], kernel_shape=[16, 16], strides=[16, 16]
+        ),
+        helper.make_node("Flatten", ["pooled"], ["flat"]),
+        helper.make_node("MatMul", ["flat", "weights"], ["fc1"]),
+    ]
+    graph = helper.make_graph(
+        nodes,
+        "rec_stub",
+        [helper.make_tensor_value_info("data", TensorProto.FLOAT, ["N", 3, 112, 112])],
+        [helper.make_tensor_value_info("fc1", TensorProto.FLOAT, ["N", 512])],
+        [numpy_helper.from_array(weights, "weights")],
+    )
+    return _model(graph)
+
+
+def build(name: str = STUB_MODEL, root: str | Path = "~/.insightface") -> Path:
+    """
+    Write a deterministic detection + recognition pack where FaceAnalysis looks for
+    model packs, so the pipeline runs offline without downloading a real model
+    """
+    pack = Path(root).expanduser() / "models" / name
+    pack.mkdir(parents=True, exist_ok=True)
+    onnx.save(detector(), pack / "det_stub.onnx")
+    onnx.save(recognizer(), pack / "w600k_stub.onnx")
+    return pack
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write the offline stub InsightFace pack the benchmarks run on"
+    )
+    parser.add_argument("-n", "--name", default=STUB_MODEL)
+    args = parser.parse_args()
+    print(build(args.name))
@@ -0,0 +1,543 @@
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+SAMPLE_FACE = "Tom_Hanks_54745"
+# metrics that fail the baseline comparison, tails are reported but too noisy to gate on
+GATED = ("p50_ms", "p95_ms", "per_s", "fps", "peak_rss_mib")
+LOWER_IS_BETTER = ("_ms", "_mib")
+
+
+def _latency(seconds, items_per_call: int = 1) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": len(ms),
+        "per_s": round(len(ms) * items_per_call / max(ms.sum() / 1000, 1e-9), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p95_ms": round(float(np.percentile(ms, 95)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+    }
+
+
+def _timed(call, iterations: int) -> list[float]:
+    call()  # first call pays for lazy allocations
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def sample_face_path() -> Path:
+    import insightface
+
+    return Path(insightface.__file__).parent / "data" / "images" / f"{SAMPLE_FACE}.png"
+
+
+def record_clip(path: Path, frames: int, width: int, height: int, fps: float = 15.0):
+    """A doorway visit by the InsightFace sample face, identical on every run"""
+    import cv2
+
+    from runtime_services.frame_source import SyntheticSource
+
+    source = SyntheticSource(
+        width, height, fps, frames=frames, image=sample_face_path(), realtime=False
+    )
+    writer = cv2.VideoWriter(
+        str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height)
+    )
+    while (item := source.read()) is not None:
+        writer.write(item[0])
+    writer.release()
+
+
+def _prepare(opts: dict):
+    """Point this process's config and fresh database at the stub model, in memory only"""
+    from config import config_manager
+    from database.data_operations import db
+
+    config = config_manager.config
+    config["face_recognition"].update(
+        model=opts["model"], recognition_workers=0, warmup_runs=1
+    )
+    config["notifications"]["enabled_services"] = []
+    config["video"]["motion"]["enabled"] = False
+    config["video"]["cameras"] = {
+        "bench": {
+            "source": opts["clip"],
+            "loop": True,
+            "realtime": False,
+            "lock": "front",
+        }
+    }
+    db.switch_model(opts["model"])
+    return config
+
+
+def _frame(opts: dict) -> np.ndarray:
+    import cv2
+
+    cap = cv2.VideoCapture(opts["clip"])
+    # the middle of the clip, where the subject stands at the door
+    cap.set(cv2.CAP_PROP_POS_FRAMES, opts["frames"] // 2)
+    ok, frame = cap.read()
+    cap.release()
+    return frame
+
+
+def bench_blink(opts: dict) -> dict:
+    from benchmarks.landmarks import synthetic_face
+    from face_recognition.alignment import mesh_points
+    from liveness import Blink
+
+    config = _prepare(opts)
+    rng = np.random.default_rng(0)
+    faces = [mesh_points(synthetic_face(rng), 720, 720) for _ in range(64)]
+    blink = Blink()
+    blink.update_config(config["blink_config"])
+    frame = iter(range(10**9))
+
+    def call():
+        i = next(frame)
+        blink.calculate_liveness(faces[i % len(faces)], i / 30)
+
+    return {"blink": _latency(_timed(call, opts["iterations"]))}
+
+
+def bench_parallax(opts: dict) -> dict:
+    from benchmarks.landmarks import synthetic_face
+    from face_recognition.alignment import mesh_xyz
+    from liveness import Parallax
+
+    config = _prepare(opts)
+    rng = np.random.default_rng(0)
+    faces = [mesh_xyz(synthetic_face(rng), 720, 720) for _ in range(64)]
+    parallax = Parallax()
+    parallax.configure(config["parallax_config"])
+    frame = iter(range(10**9))
+
+    def call():
+        i = next(frame)
+        parallax.update(faces[i % len(faces)], i / 30)
+
+    return {"parallax": _latency(_timed(call, opts["iterations"]))}
+
+
+def bench_overlay(opts: dict) -> dict:
+    from face_recognition import Overlay
+
+    config = _prepare(opts)
+    overlay = Overlay()
+    overlay.update_config(config["overlay"])
+    frame = _frame(opts)
+    height, width = frame.shape[:2]
+    box = (width // 4, 3 * width // 4, height // 4, 3 * height // 4)
+    canvas = frame.copy()
+    return {
+        "overlay": _latency(
+            _timed(
+                lambda: overlay.draw(True, True, "alice", 2, canvas, *box),
+                opts["iterations"],
+            )
+        )
+    }
+
+
+def bench_recognizer(opts: dict) -> dict:
+    import cv2
+    import mediapipe as mp_solutions
+
+    from database.data_operations import db
+    from face_recognition import FaceRecognizer
+    from face_recognition.alignment import mesh_keypoints, mesh_xyz
+    from runtime_services.embedding_manager import EmebeddingManager
+
+    config = _prepare(opts)
+    rng = np.random.default_rng(0)
+    for i in range(opts["gallery"]):
+        user_id = db.add_user(f"user_{i}", "family")
+        embedding = rng.standard_normal(512).astype(np.float32)
+        db.add_image(
+            "img", user_id, embedding / np.linalg.norm(embedding), b"", opts["model"]
+        )
+    manager = EmebeddingManager(db)
+    manager.update_config(config["face_recognition"])
+    recognizer = FaceRecognizer()
+    recognizer.update_config(config["face_recognition"])
+
+    frame = _frame(opts)
+    with mp_solutions.solutions.face_mesh.FaceMesh(
+        static_image_mode=True, refine_landmarks=True
+    ) as face_mesh:
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    xyz = mesh_xyz(results.multi_face_landmarks[0], *frame.shape[1::-1])
+    keypoints = mesh_keypoints(xyz[:, :2])
+
+    entries = {}
+    for alignment in ("detector", "mesh"):
+        recognizer.alignment = alignment
+        entries[f"recognizer_{alignment}"] = _latency(
+            _timed(
+                lambda: recognizer.recognize_faces(
+                    frame, manager.snapshot, [keypoints]
+                ),
+                opts["iterations"] // 4,
+            )
+        )
+    return entries
+
+
+def bench_replay(opts: dict) -> dict:
+    from runtime_services.replay import Replay
+
+    _prepare(opts)
+    replay = Replay({"source": opts["clip"]}, realtime=False)
+    replay.warm_up()
+    try:
+        report = replay.run()
+    finally:
+        replay.close()
+    entries = {"replay": {"frames": report["frames"], "fps": report["fps"]}}
+    for stage, stats in report["stages"].items():
+        if stats["count"]:
+            stats["per_s"] = round(1000 / stats.pop("mean_ms"), 2)
+            entries[f"replay_{stage}"] = stats
+    return entries
+
+
+def bench_pipeline(opts: dict) -> dict:
+    """State's threaded pipeline on the looping clip with one MJPEG viewer attached"""
+    from hardware_integration.mock_arduino_handler import MockArduino
+    from runtime_services.state import State
+
+    _prepare(opts)
+
+    async def run() -> dict:
+        with MockArduino() as arduino:
+            runtime = State(arduino=arduino)
+            camera = runtime.camera("bench")
+            await runtime.start_video()
+            while not camera.broadcaster.stats()["open"]:
+                await asyncio.sleep(0.01)
+
+            arrivals = []
+            deadline = time.monotonic() + opts["duration"]
+            async for _ in camera.broadcaster.stream("bench"):
+                arrivals.append(time.perf_counter())
+                if time.monotonic() >= deadline:
+                    break
+            stats = camera.pipeline_stats()
+            await runtime.stop_video()
+
+        intervals = np.diff(arrivals)
+        entries = {
+            "pipeline": {
+                **_latency(intervals),
+                "fps": round(len(intervals) / max(intervals.sum(), 1e-9), 2),
+            }
+        }
+        for stage, stage_stats in stats["stages"].items():
+            entries[f"pipeline_{stage}"] = {
+                "count": stage_stats["processed"],
+                "per_s": round(stage_stats["processed"] / opts["duration"], 2),
+                "avg_ms": stage_stats["avg_ms"],
+            }
+        return entries
+
+    return asyncio.run(run())
+
+
+def bench_mjpeg(opts: dict) -> dict:
+    """Fan-out of ~60 KB chunks to several viewers, publish to delivery latency"""
+    from runtime_services.broadcaster import DEFAULT_VARIANT, FrameBroadcaster
+
+    _prepare(opts)
+    payload = np.random.default_rng(0).integers(0, 255, 60_000, dtype=np.uint8)
+    header = len(b"--frame\r\nContent-Type: image/jpeg\r\n\r\n")
+
+    async def run() -> dict:
+        broadcaster = FrameBroadcaster()
+        broadcaster.open()
+        published: dict[int, float] = {}
+        latencies: list[float] = []
+        delivered = 0
+        # the render thread publishes at roughly camera rate
+        interval = 1 / 60
+
+        def publisher():
+            for seq in range(opts["iterations"]):
+                jpeg = payload.copy()
+                jpeg[:8] = np.frombuffer(seq.to_bytes(8, "little"), dtype=np.uint8)
+                published[seq] = time.perf_counter()
+                broadcaster.publish({DEFAULT_VARIANT: jpeg})
+                time.sleep(interval)
+            loop.call_soon_threadsafe(broadcaster.close)
+
+        async def viewer(label: str):
+            nonlocal delivered
+            async for chunk in broadcaster.stream(label):
+                seq = int.from_bytes(chunk[header : header + 8], "little")
+                latencies.append(time.perf_counter() - published[seq])
+                delivered += 1
+                await asyncio.sleep(0)  # the socket write
+
+        loop = asyncio.get_running_loop()
+        viewers = [
+            asyncio.create_task(viewer(f"viewer-{i}")) for i in range(opts["viewers"])
+        ]
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await asyncio.to_thread(publisher)
+        await asyncio.gather(*viewers)
+        elapsed = time.perf_counter() - start
+        stats = _latency(latencies)
+        stats["per_s"] = round(delivered / elapsed, 2)
+        stats["delivered"] = round(
+            delivered / (opts["iterations"] * opts["viewers"]), 4
+        )
+        return {"mjpeg": stats}
+
+    return asyncio.run(run())
+
+
+def bench_enrollment(opts: dict) -> dict:
+    """POST /users/{id}/images and /images/batch, called on the route functions"""
+    import cv2
+    from fastapi import UploadFile
+
+    from api.users import add_image, add_images
+    from database.data_operations import db
+
+    _prepare(opts)
+    ok, encoded = cv2.imencode(".jpg", cv2.imread(str(sample_face_path())))
+    image = encoded.tobytes()
+    user_id = db.add_user("enrolled", "family")
+    batch = 8
+    names = iter(range(10**9))
+
+    def single():
+        upload = UploadFile(io.BytesIO(image), filename="single.jpg")
+        asyncio.run(add_image(user_id, f"single_{next(names)}", upload))
+
+    def batched():
+        uploads = [
+            UploadFile(io.BytesIO(image), filename=f"batch_{next(names)}.jpg")
+            for _ in range(batch)
+        ]
+        asyncio.run(add_images(user_id, uploads))
+
+    count = opts["enrollments"]
+    return {
+        "enroll_single": _latency(_timed(single, count)),
+        f"enroll_batch{batch}": _latency(_timed(batched, count // 2), batch),
+    }
+
+
+COMPONENTS = {
+    "blink": bench_blink,
+    "parallax": bench_parallax,
+    "overlay": bench_overlay,
+    "recognizer": bench_recognizer,
+    "replay": bench_replay,
+    "pipeline": bench_pipeline,
+    "mjpeg": bench_mjpeg,
+    "enrollment": bench_enrollment,
+}
+
+
+def _child(component: str, workdir: str, opts: dict, queue, verbose: bool):
+    """Fresh process, database and working directory per component, so memory is its own"""
+    sys.path.insert(0, str(ROOT))
+    os.chdir(workdir)
+    os.makedirs("database", exist_ok=True)
+    if not verbose:  # model loading and mediapipe are chatty, down to the C level
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+    try:
+        entries = COMPONENTS[component](opts)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        for metrics in entries.values():
+            metrics["peak_rss_mib"] = round(peak, 1)
+        queue.put((component, entries, None))
+    except Exception as e:
+        queue.put((component, {}, f"{type(e).__name__}: {e}"))
+
+
+def run(components: list[str], opts: dict, verbose: bool = False) -> dict:
+    ctx = mp.get_context("spawn")
+    results: dict[str, dict] = {}
+    errors: dict[str, str] = {}
+    for component in components:
+        with tempfile.TemporaryDirectory() as workdir:
+            queue = ctx.Queue()
+            proc = ctx.Process(
+                target=_child, args=(component, workdir, opts, queue, verbose)
+            )
+            start = time.perf_counter()
+            proc.start()
+            _, entries, error = queue.get()
+            proc.join()
+        if error:
+            errors[component] = error
+            print(f"{component:12s} failed: {error}")
+            continue
+        results.update(entries)
+        print(f"{component:12s} done in {time.perf_counter() - start:.1f} s")
+    return {"meta": _meta(opts), "components": results, "errors": errors}
+
+
+def _meta(opts: dict) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "options": {k: v for k, v in opts.items() if k != "clip"},
+    }
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[dict]:
+    """Gated metrics that moved past `tolerance` in the wrong direction"""
+    regressions = []
+    for entry, before_metrics in baseline["components"].items():
+        after_metrics = current["components"].get(entry)
+        if after_metrics is None:
+            continue
+        for metric in GATED:
+            before, after = before_metrics.get(metric), after_metrics.get(metric)
+            if not before or after is None:
+                continue
+            change = after / before - 1
+            worse = change > 0 if metric.endswith(LOWER_IS_BETTER) else change < 0
+            if worse and abs(change) > tolerance:
+                regressions.append(
+                    {
+                        "entry": entry,
+                        "metric": metric,
+                        "baseline": before,
+                        "current": after,
+                        "change": round(change, 4),
+                    }
+                )
+    return regressions
+
+
+def print_results(results: dict):
+    print(
+        f"\n{'component':22s} {'per_s':>10s} {'p50_ms':>10s} {'p95_ms':>10s}"
+        f" {'p99_ms':>10s} {'peak_mib':>9s}"
+    )
+    for entry, metrics in results["components"].items():
+        cells = [
+            metrics.get("fps", metrics.get("per_s")),
+            metrics.get("p50_ms", metrics.get("avg_ms")),
+            metrics.get("p95_ms"),
+            metrics.get("p99_ms"),
+        ]
+        row = "".join(
+            f" {'-' if value is None else f'{value:.3f}':>10s}" for value in cells
+        )
+        print(f"{entry:22s}{row} {metrics['peak_rss_mib']:9.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Offline end-to-end benchmarks on stub models, optionally against a baseline"
+    )
+    parser.add_argument(
+        "-c",
+        "--components",
+        nargs="+",
+        choices=list(COMPONENTS),
+        default=list(COMPONENTS),
+    )
+    parser.add_argument(
+        "--clip", help="recorded clip to use instead of a generated one"
+    )
+    parser.add_argument("--frames", type=int, default=180, help="generated clip length")
+    parser.add_argument("-i", "--iterations", type=int, default=1000)
+    parser.add_argument("-g", "--gallery", type=int, default=500)
+    parser.add_argument("-d", "--duration", type=float, default=5.0)
+    parser.add_argument("--viewers", type=int, default=4)
+    parser.add_argument("--enrollments", type=int, default=20)
+    parser.add_argument(
+        "-o", "--output", default=str(ROOT / "benchmarks" / "results" / "latest.json")
+    )
+    parser.add_argument("-b", "--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--save-baseline", help="also write these results as the baseline here"
+    )
+    parser.add_argument(
+        "-t", "--tolerance", type=float, default=0.15, help="allowed relative change"
+    )
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    from benchmarks.stub_pack import STUB_MODEL, build
+
+    build(STUB_MODEL)
+    with tempfile.TemporaryDirectory() as clip_dir:
+        clip = args.clip
+        if clip is None:
+            clip = str(Path(clip_dir) / "doorway.avi")
+            record_clip(Path(clip), args.frames, 720, 720)
+        opts = {
+            "model": STUB_MODEL,
+            "clip": str(Path(clip).resolve()),
+            "frames": args.frames,
+            "iterations": args.iterations,
+            "gallery": args.gallery,
+            "duration": args.duration,
+            "viewers": args.viewers,
+            "enrollments": args.enrollments,
+        }
+        results = run(args.components, opts, args.verbose)
+    print_results(results)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"\nresults written to {output}")
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(results, indent=2))
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        print(
+            f"\nagainst {args.baseline} ({baseline['meta'].get('commit') or 'unknown'}),"
+            f" tolerance {args.tolerance:.0%}: {len(regressions)} regressions"
+        )
+        for r in regressions:
+            print(
+                f"  REGRESSION {r['entry']}.{r['metric']}:"
+                f" {r['baseline']} -> {r['current']} ({r['change']:+.1%})"
+            )
+        if regressions or results["errors"]:
+            sys.exit(1)
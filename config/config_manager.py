@@ -6,7 +6,26 @@ from pathlib import Path
 
 CONFIG_PATH = Path(__file__).with_name("config.json")
 DEFAULT_CONFIG: dict[str, Any] = {
-    "face_recognition": {"model": "buffalo_s", "similarity_threshold": 0.6},
+    "face_recognition": {
+        "model": "buffalo_s",
+        "similarity_threshold": 0.6,
+        "providers": ["CPUExecutionProvider"],
+        "session_options": {},
+        "warmup_runs": 1,
+        "index": "auto",
+        "ivf_min_size": 20000,
+        "ivf_nprobe": 8,
+        "storage_dtype": "float32",
+        "matching": "centroid",
+        "template_prefilter": 16,
+        "recognition_workers": 0,
+        "modules": ["detection", "recognition"],
+        "alignment": "detector",
+        "track_max_age": 15,
+        "reverify_interval": 30,
+        "reverify_iou": 0.5,
+        "score_decay": 0.005,
+    },
     "notifications": {
         "enabled_services": ["email"],
         "config_objects": {
@@ -16,10 +35,32 @@ DEFAULT_CONFIG: dict[str, Any] = {
     },
     "blink_config": {
         "ear_threshold": 0.21,
-        "blink_consec_frames": 2,
+        "min_closed_ms": 60.0,
+        "smoothing_ms": 30.0,
         "blinks_to_verify": 2,
+        "reset_after_s": 10.0,
+    },
+    "parallax_config": {
+        "window_ms": 600.0,
+        "min_parallax": 0.03,
+        "min_depth_fit": 0.6,
+        "hits_to_verify": 2,
     },
+    "liveness": {"checks": ["blink"], "mode": "all"},
     "overlay": {"font_scale": 2, "font_thickness": 2, "mesh": False},
+    "video": {
+        "cameras": {
+            "front": {"source": 0, "width": 720, "height": 720, "lock": "front"},
+        },
+        "motion": {
+            "enabled": True,
+            "width": 160,
+            "pixel_threshold": 25,
+            "min_changed": 0.01,
+            "quiet_s": 5.0,
+            "watch_fps": 2.0,
+        },
+    },
 }
 
 
@@ -27,7 +68,7 @@ class _ConfigManager:
     def __init__(self):
         self._config_path = CONFIG_PATH
         self.config = self._load_initial_config()
-        self._listeners: dict[str, Callable] = {}
+        self._listeners: dict[str, list[Callable]] = {}
 
     def _load_initial_config(self) -> dict[str, Any]:
         if not self._config_path.exists():
@@ -35,10 +76,14 @@ class _ConfigManager:
             return copy.deepcopy(DEFAULT_CONFIG)
 
         try:
-            return json.loads(self._config_path.read_text())
+            config = json.loads(self._config_path.read_text())
         except (json.JSONDecodeError, OSError) as exc:
             # TODO: swap to structured logging once logger is wired
             raise RuntimeError(f"Failed to load config at {self._config_path}") from exc
+        # sections added since the file was written start out with their defaults
+        for section, default in DEFAULT_CONFIG.items():
+            config.setdefault(section, copy.deepcopy(default))
+        return config
 
     def _persist_config(self) -> None:
         tmp_path = self._config_path.with_suffix(".tmp")
@@ -53,16 +98,21 @@ class _ConfigManager:
             ) from exc
 
     def register_listener(self, section: str, listener: Callable) -> None:
-        self._listeners[section] = listener
+        self._listeners.setdefault(section, []).append(listener)
         listener(self.config[section])  # push the current config on registration
 
+    def unregister_listener(self, section: str, listener: Callable) -> None:
+        listeners = self._listeners.get(section, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
     def get_section(self, section: str) -> dict[str, Any]:
         return self.config[section]
 
     def replace_section(self, section: str, data: dict[str, Any]) -> dict[str, Any]:
         self.config[section] = data
-        if section in self._listeners:
-            self._listeners[section](data)  # call the listener for this change
+        for listener in self._listeners.get(section, []):
+            listener(data)  # call every listener for this change
         self._persist_config()
         return self.config[section]
 
@@ -1,6 +1,24 @@
+from typing import Literal
 from pydantic import BaseModel, Field, ConfigDict
 
 
+class SessionOptionsConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    intra_op_num_threads: int | None = Field(
+        default=None, ge=0, description="Threads inside one operator, 0 picks per core."
+    )
+    inter_op_num_threads: int | None = Field(
+        default=None, ge=0, description="Threads across operators in parallel mode."
+    )
+    graph_optimization_level: Literal["disable", "basic", "extended", "all"] | None = (
+        None
+    )
+    execution_mode: Literal["sequential", "parallel"] | None = None
+    enable_cpu_mem_arena: bool | None = None
+    enable_mem_pattern: bool | None = None
+
+
 class FaceRecognitionConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
@@ -10,6 +28,62 @@ class FaceRecognitionConfig(BaseModel):
         default_factory=lambda: ["CPUExecutionProvider"],
         description="Ordered ONNX Runtime providers to initialize InsightFace with.",
     )
+    session_options: dict[str, SessionOptionsConfig] = Field(
+        default_factory=dict,
+        description="Session tuning keyed by 'default' or a module name like 'detection'.",
+    )
+    warmup_runs: int = Field(
+        default=1, ge=0, description="Blank inferences per module right after loading."
+    )
+    index: Literal["auto", "brute_force", "ivf"] = Field(
+        default="auto",
+        description="Gallery search index, auto switches to IVF at ivf_min_size.",
+    )
+    ivf_min_size: int = Field(default=20000, ge=1)
+    ivf_nprobe: int = Field(default=8, ge=1)
+    storage_dtype: Literal["float32", "float16", "int8"] = Field(
+        default="float32",
+        description="In-memory gallery precision, float16 halves it and int8 quarters it.",
+    )
+    matching: Literal["centroid", "multi_template"] = Field(
+        default="centroid",
+        description="Match the averaged embedding, or each user's best enrolled image.",
+    )
+    template_prefilter: int = Field(
+        default=16,
+        ge=0,
+        description="Users shortlisted by centroid before their images are scored, 0 scores all.",
+    )
+    recognition_workers: int = Field(
+        default=0,
+        ge=0,
+        description="Recognition worker processes with their own model, 0 runs it in-process.",
+    )
+    modules: list[str] = Field(
+        default_factory=lambda: ["detection", "recognition"],
+        description="Model pack heads to load, anything else is inference we discard.",
+    )
+    alignment: Literal["detector", "mesh"] = Field(
+        default="detector",
+        description="Re-detect the frame, or align the crop from FaceMesh landmarks.",
+    )
+    track_max_age: int = Field(
+        default=15, ge=0, description="Frames a face track survives without a match."
+    )
+    reverify_interval: int = Field(
+        default=30, ge=1, description="Frames a recognized track is trusted for."
+    )
+    reverify_iou: float = Field(
+        default=0.5,
+        ge=0,
+        le=1,
+        description="Re-verify once the box overlaps its last verified box less than this.",
+    )
+    score_decay: float = Field(
+        default=0.005,
+        ge=0,
+        description="Per-frame drop of the cached score, re-verify below the threshold.",
+    )
 
 
 class OverlayConfig(BaseModel):
@@ -24,8 +98,54 @@ class BlinkConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     ear_threshold: float = Field(..., gt=0, lt=1)
-    blink_consec_frames: int = Field(..., ge=1)
+    min_closed_ms: float = Field(
+        default=60.0, gt=0, description="Shortest eye closure counted as a blink."
+    )
+    smoothing_ms: float = Field(
+        default=30.0, ge=0, description="EAR smoothing time constant, 0 turns it off."
+    )
     blinks_to_verify: int = Field(..., ge=1)
+    reset_after_s: float = Field(
+        default=10.0,
+        gt=0,
+        description="Blinks are forgotten after this long without one.",
+    )
+
+
+class ParallaxConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    window_ms: float = Field(
+        default=600.0,
+        gt=0,
+        description="Each frame is compared with the oldest this recent.",
+    )
+    min_parallax: float = Field(
+        default=0.03,
+        gt=0,
+        description="Head turn in radians the landmark depth must show.",
+    )
+    min_depth_fit: float = Field(
+        default=0.6,
+        ge=0,
+        le=1,
+        description="Share of non planar motion depth must explain.",
+    )
+    hits_to_verify: int = Field(
+        default=2, ge=1, description="Frames in the window that have to show it."
+    )
+
+
+class LivenessConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    checks: list[Literal["blink", "parallax"]] = Field(
+        default_factory=lambda: ["blink"],
+        description="Liveness checks per face, run cheapest first. Empty turns it off.",
+    )
+    mode: Literal["all", "any"] = Field(
+        default="all", description="Every check must pass, or any one of them."
+    )
 
 
 class NotificationsServiceConfig(BaseModel):
@@ -40,10 +160,77 @@ class NotificationsConfig(BaseModel):
     config_objects: dict[str, NotificationsServiceConfig] = Field(default_factory=dict)
 
 
+class CameraConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    source: int | str = Field(
+        default=0,
+        description="Device index, video file, image directory or stream URL.",
+    )
+    kind: Literal["auto", "camera", "video", "images", "synthetic"] = Field(
+        default="auto",
+        description="Frame source type, auto infers it from source.",
+    )
+    fps: float | None = Field(
+        default=None,
+        gt=0,
+        description="Playback rate of files, images and synthetic frames.",
+    )
+    loop: bool = Field(
+        default=False, description="Restart a clip or image directory at its end."
+    )
+    realtime: bool = Field(
+        default=True,
+        description="Pace recorded sources at their frame rate, False reads flat out.",
+    )
+    width: int = Field(default=720, ge=1)
+    height: int = Field(default=720, ge=1)
+    lock: str | None = Field(
+        default=None,
+        description="Lock opened by a verified and live face here, None only watches.",
+    )
+    max_faces: int = Field(
+        default=4, ge=1, description="Faces tracked and recognized per frame."
+    )
+
+
+class MotionConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = Field(
+        default=True, description="Idle the pipeline while nothing moves in view."
+    )
+    width: int = Field(default=160, ge=16, description="Width of the compared image.")
+    pixel_threshold: int = Field(
+        default=25, ge=1, le=255, description="Gray level change that counts a pixel."
+    )
+    min_changed: float = Field(
+        default=0.01, gt=0, le=1, description="Changed pixel fraction that is motion."
+    )
+    quiet_s: float = Field(
+        default=5.0, ge=0, description="Seconds without motion before watching again."
+    )
+    watch_fps: float = Field(
+        default=2.0, gt=0, description="Frames sampled per second while watching."
+    )
+
+
+class VideoConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    cameras: dict[str, CameraConfig] = Field(
+        default_factory=dict, description="Named video sources sharing one recognizer."
+    )
+    motion: MotionConfig = Field(default_factory=MotionConfig)
+
+
 class ApplicationConfig(BaseModel):
     model_config = ConfigDict(extra="allow")
 
     face_recognition: FaceRecognitionConfig
     blink_config: BlinkConfig
+    parallax_config: ParallaxConfig = Field(default_factory=ParallaxConfig)
+    liveness: LivenessConfig = Field(default_factory=LivenessConfig)
     overlay: OverlayConfig
     notifications: NotificationsConfig | None = None
+    video: VideoConfig | None = None
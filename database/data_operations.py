@@ -1,16 +1,54 @@
 import sqlite3
 from contextlib import contextmanager
+import functools
+import time
 import numpy as np
 import io
 
+from utils import metrics
 from utils.enums import AccessLevel
 
+DEFAULT_ACTIVE_MODEL = "buffalo_s"  # model every pre-namespace gallery was built with
+
+
+def _to_blob(embedding: np.ndarray) -> bytes:
+    """Serialize as float32, averaging math can drift to float64 and double the blob"""
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(embedding, dtype=np.float32), allow_pickle=False)
+    return buffer.getvalue()
+
+
+QUERY_SECONDS = metrics.histogram(
+    "lock_override_db_seconds",
+    "Time per Database call, including the listeners it notifies.",
+    ("method",),
+)
+
+
+def _timed(method):
+    series = QUERY_SECONDS.labels(method.__name__)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            series.observe(time.perf_counter() - start)
+
+    return wrapper
+
+
+class ModelMismatchError(Exception):
+    """Embedding was computed with a model that is no longer the active one"""
+
 
 class Database:
     def __init__(self, db_path="./database/faces.db"):
         self.db_path = db_path
         self._init_db()
         self._listener = None
+        self.active_model = self._load_active_model()
 
     def _init_db(self):
         users_query = """
@@ -36,15 +74,68 @@ class Database:
             )
         """
 
+        # embeddings of non-active models, images/users columns hold the active one
+        model_embeddings_query = """
+            CREATE TABLE IF NOT EXISTS model_embeddings (
+                model TEXT NOT NULL,
+                img_name TEXT NOT NULL,
+                user_id INTEGER NOT NULL,
+                embedding BLOB NOT NULL,
+                PRIMARY KEY (model, img_name, user_id),
+                FOREIGN KEY (img_name, user_id)
+                    REFERENCES images (img_name, user_id)
+                    ON DELETE CASCADE
+                    ON UPDATE NO ACTION
+            )
+        """
+
+        settings_query = """
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        """
+
         try:
             with sqlite3.connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute(users_query)
                 cursor.execute(images_query)
+                cursor.execute(model_embeddings_query)
+                cursor.execute(settings_query)
+                # source images are retained so the gallery can be re-embedded by a new model
+                columns = {
+                    row[1] for row in cursor.execute("PRAGMA table_info(images)")
+                }
+                if "source" not in columns:
+                    cursor.execute("ALTER TABLE images ADD COLUMN source BLOB")
                 conn.commit()
         except Exception as e:
             print("error creating database: ", e)
 
+    def _load_active_model(self) -> str:
+        try:
+            with self._get_connection() as conn:
+                row = conn.execute(
+                    "SELECT value FROM settings WHERE key = 'active_model'"
+                ).fetchone()
+        except Exception as e:
+            print("error loading active model: ", e)
+            return DEFAULT_ACTIVE_MODEL
+        return row[0] if row else DEFAULT_ACTIVE_MODEL
+
+    def _check_model(self, conn, model: str | None):
+        if model is None:
+            return
+        row = conn.execute(
+            "SELECT value FROM settings WHERE key = 'active_model'"
+        ).fetchone()
+        active = row[0] if row else DEFAULT_ACTIVE_MODEL
+        if model != active:
+            raise ModelMismatchError(
+                f"Embedding made with {model} but the active model is {active}"
+            )
+
     @contextmanager
     def _get_connection(self):
         conn = sqlite3.connect(self.db_path)
@@ -64,6 +155,10 @@ class Database:
         if self._listener:
             self._listener.on_embedding_update(user_id, embedding)
 
+    def _notify_gallery_reload(self):
+        if self._listener:
+            self._listener.on_gallery_reload()
+
     def _notify_user_listener(
         self,
         user_id: int,
@@ -75,6 +170,7 @@ class Database:
         if self._listener:
             self._listener.on_user_update(user_id, name, access, new_user, delete_user)
 
+    @_timed
     def add_user(self, name, access_level):
         with self._get_connection() as conn:
             cursor = conn.execute(
@@ -88,16 +184,19 @@ class Database:
         self._notify_user_listener(user_id, new_user=(name, access_enum))
         return user_id
 
+    @_timed
     def get_user(self, user_id):
         with self._get_connection() as conn:
             cursor = conn.execute("SELECT * FROM users WHERE id = ?", (user_id,))
             return cursor.fetchone()
 
+    @_timed
     def get_all_users(self):
         with self._get_connection() as conn:
             cursor = conn.execute("SELECT * FROM users ORDER BY name ASC")
             return cursor.fetchall()
 
+    @_timed
     def delete_user(self, user_id):
         with self._get_connection() as conn:
             cursor = conn.execute("DELETE FROM users WHERE id = ?", (user_id,))
@@ -109,6 +208,7 @@ class Database:
         else:
             raise ValueError(f"User {user_id} not found")
 
+    @_timed
     def update_name(self, user_id: int, name: str):
         with self._get_connection() as conn:
             cursor = conn.execute(
@@ -126,6 +226,7 @@ class Database:
         self._notify_user_listener(user_id, name=user_row["name"], access=access_enum)
         return user_row
 
+    @_timed
     def update_access_level(self, user_id, access_level: AccessLevel):
         with self._get_connection() as conn:
             cursor = conn.execute(
@@ -138,6 +239,7 @@ class Database:
         access_enum = AccessLevel(access_level)
         self._notify_user_listener(user_id, access=access_enum)
 
+    @_timed
     def get_images_for_user(self, user_id: int):
         with self._get_connection() as conn:
             cursor = conn.execute(
@@ -147,17 +249,44 @@ class Database:
                 raise ValueError(f"User {user_id} not found")
             return cursor.fetchall()
 
-    def add_image(self, img_name, user_id, normed_embedding: np.ndarray):
+    @_timed
+    def get_image_embeddings(self, user_id: int | None = None) -> dict[int, np.ndarray]:
+        """Per image embeddings stacked per user, for one user or everyone"""
+        query = "SELECT user_id, embedding FROM images"
+        params: tuple = ()
+        if user_id is not None:
+            query += " WHERE user_id = ?"
+            params = (user_id,)
+        embeddings: dict[int, list[np.ndarray]] = {}
+        with self._get_connection() as conn:
+            for row in conn.execute(query + " ORDER BY user_id, img_name", params):
+                try:
+                    embedding = np.load(io.BytesIO(row[1]), allow_pickle=False)
+                except (ValueError, OSError):
+                    continue
+                embeddings.setdefault(row[0], []).append(embedding)
+        return {
+            uid: np.stack(rows).astype(np.float32) for uid, rows in embeddings.items()
+        }
+
+    @_timed
+    def add_image(
+        self,
+        img_name,
+        user_id,
+        normed_embedding: np.ndarray,
+        source: bytes | None = None,
+        model: str | None = None,
+    ):
         """Creates an embedding for an image and updates the users avg embedding"""
-        buffer = io.BytesIO()
-        np.save(buffer, normed_embedding, allow_pickle=False)
-        blob = buffer.getvalue()
+        blob = _to_blob(normed_embedding)
 
         with self._get_connection() as conn:
+            self._check_model(conn, model)
             # first add to images table
             conn.execute(
-                "INSERT INTO images (img_name, user_id, embedding) VALUES (?, ?, ?)",
-                (img_name, user_id, blob),
+                "INSERT INTO images (img_name, user_id, embedding, source) VALUES (?, ?, ?, ?)",
+                (img_name, user_id, blob, source),
             )
 
             # then recompute average for user
@@ -183,17 +312,67 @@ class Database:
                 num_embeddings += 1
                 new_avg /= np.linalg.norm(new_avg)  # must renormalize after averaging
 
-            avg_buffer = io.BytesIO()
-            np.save(avg_buffer, new_avg, allow_pickle=False)
             conn.execute(
                 "UPDATE users SET num_embeddings = ?, embedding = ? WHERE id = ?",
-                (num_embeddings, avg_buffer.getvalue(), user_id),
+                (num_embeddings, _to_blob(new_avg), user_id),
             )
 
             # commit only if everything succeeds
             conn.commit()
             self._notify_embedding_listener(user_id, new_avg)
 
+    @_timed
+    def add_images(
+        self,
+        user_id: int,
+        images: list[tuple[str, np.ndarray, bytes | None]],
+        model: str | None = None,
+    ):
+        """Insert many (name, embedding, source) images and fold them into the users avg in one transaction"""
+        rows = []
+        for img_name, normed_embedding, source in images:
+            rows.append((img_name, user_id, _to_blob(normed_embedding), source))
+
+        with self._get_connection() as conn:
+            self._check_model(conn, model)
+            conn.executemany(
+                "INSERT INTO images (img_name, user_id, embedding, source) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+            cursor = conn.execute(
+                "SELECT name, num_embeddings, embedding FROM users WHERE id= ?",
+                (user_id,),
+            )
+            user_row = cursor.fetchone()
+            old_avg = (
+                np.load(io.BytesIO(user_row[2]), allow_pickle=False)
+                if user_row[2]
+                else None
+            )
+            num_embeddings = user_row[1] or 0
+
+            batch_sum = np.sum([embedding for _, embedding, _ in images], axis=0)
+            if old_avg is None or num_embeddings == 0:
+                new_avg = batch_sum / len(images)
+                num_embeddings = len(images)
+            else:
+                new_avg = (old_avg * num_embeddings + batch_sum) / (
+                    num_embeddings + len(images)
+                )
+                num_embeddings += len(images)
+            new_avg /= np.linalg.norm(new_avg)  # must renormalize after averaging
+
+            conn.execute(
+                "UPDATE users SET num_embeddings = ?, embedding = ? WHERE id = ?",
+                (num_embeddings, _to_blob(new_avg), user_id),
+            )
+
+            # commit only if everything succeeds, then notify once for the whole batch
+            conn.commit()
+            self._notify_embedding_listener(user_id, new_avg)
+
+    @_timed
     def delete_image(self, img_name, user_id):
         """Delete the image embedding then update the user info"""
         with self._get_connection() as conn:
@@ -228,11 +407,9 @@ class Database:
                 )
                 num_embeddings -= 1
                 new_avg /= np.linalg.norm(new_avg)
-                avg_buffer = io.BytesIO()
-                np.save(avg_buffer, new_avg, allow_pickle=False)
                 conn.execute(
                     "UPDATE users SET num_embeddings = ?, embedding = ? WHERE id = ?",
-                    (num_embeddings, avg_buffer.getvalue(), user_id),
+                    (num_embeddings, _to_blob(new_avg), user_id),
                 )
 
             # delete embedding from old table
@@ -245,5 +422,121 @@ class Database:
             conn.commit()
             self._notify_embedding_listener(user_id, new_avg)
 
+    @_timed
+    def get_pending_images(self, model: str) -> list[tuple[str, int]]:
+        """Images with a retained source that have no embedding for `model` yet"""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """SELECT img_name, user_id FROM images
+                WHERE source IS NOT NULL AND NOT EXISTS (
+                    SELECT 1 FROM model_embeddings m
+                    WHERE m.model = ? AND m.img_name = images.img_name
+                        AND m.user_id = images.user_id
+                )
+                ORDER BY user_id, img_name""",
+                (model,),
+            )
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+
+    @_timed
+    def count_images_without_source(self, model: str) -> int:
+        """Images that can never be re-embedded for `model` because no source was kept"""
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                """SELECT COUNT(*) FROM images
+                WHERE source IS NULL AND NOT EXISTS (
+                    SELECT 1 FROM model_embeddings m
+                    WHERE m.model = ? AND m.img_name = images.img_name
+                        AND m.user_id = images.user_id
+                )""",
+                (model,),
+            )
+            return cursor.fetchone()[0]
+
+    @_timed
+    def get_image_source(self, img_name: str, user_id: int) -> bytes | None:
+        with self._get_connection() as conn:
+            row = conn.execute(
+                "SELECT source FROM images WHERE img_name = ? AND user_id = ?",
+                (img_name, user_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    @_timed
+    def add_model_embeddings(self, model: str, rows: list[tuple[str, int, np.ndarray]]):
+        """Store (img_name, user_id, embedding) rows in the namespace of a non-active model"""
+        blobs = []
+        for img_name, user_id, normed_embedding in rows:
+            blobs.append((model, img_name, user_id, _to_blob(normed_embedding)))
+        with self._get_connection() as conn:
+            # images deleted mid re-embed would fail the fk, skip them instead
+            conn.executemany(
+                """INSERT OR REPLACE INTO model_embeddings (model, img_name, user_id, embedding)
+                SELECT ?, ?, ?, ? WHERE EXISTS (
+                    SELECT 1 FROM images WHERE img_name = ?2 AND user_id = ?3
+                )""",
+                blobs,
+            )
+            conn.commit()
+
+    @_timed
+    def switch_model(self, model: str) -> int:
+        """
+        Atomically make `model` the active namespace, the old one is kept for switching back.
+        Returns how many images still lack a `model` embedding, nothing changes unless 0
+        """
+        with self._get_connection() as conn:
+            old_model = self.active_model
+            missing = conn.execute(
+                """SELECT COUNT(*) FROM images WHERE NOT EXISTS (
+                    SELECT 1 FROM model_embeddings m
+                    WHERE m.model = ? AND m.img_name = images.img_name
+                        AND m.user_id = images.user_id
+                )""",
+                (model,),
+            ).fetchone()[0]
+            if missing:
+                return missing
+
+            # park the active embeddings under the old model, then promote the new ones
+            conn.execute(
+                """INSERT OR REPLACE INTO model_embeddings (model, img_name, user_id, embedding)
+                SELECT ?, img_name, user_id, embedding FROM images""",
+                (old_model,),
+            )
+            conn.execute(
+                """UPDATE images SET embedding = (
+                    SELECT m.embedding FROM model_embeddings m
+                    WHERE m.model = ? AND m.img_name = images.img_name
+                        AND m.user_id = images.user_id
+                )""",
+                (model,),
+            )
+            conn.execute("DELETE FROM model_embeddings WHERE model = ?", (model,))
+
+            # averages are rebuilt from the per image embeddings of the new model
+            embeddings: dict[int, list[np.ndarray]] = {}
+            for row in conn.execute("SELECT user_id, embedding FROM images"):
+                embeddings.setdefault(row[0], []).append(
+                    np.load(io.BytesIO(row[1]), allow_pickle=False)
+                )
+            conn.execute("UPDATE users SET num_embeddings = 0, embedding = NULL")
+            for user_id, user_embeddings in embeddings.items():
+                new_avg = np.mean(user_embeddings, axis=0)
+                new_avg /= np.linalg.norm(new_avg)
+                conn.execute(
+                    "UPDATE users SET num_embeddings = ?, embedding = ? WHERE id = ?",
+                    (len(user_embeddings), _to_blob(new_avg), user_id),
+                )
+
+            conn.execute(
+                "INSERT OR REPLACE INTO settings (key, value) VALUES ('active_model', ?)",
+                (model,),
+            )
+            conn.commit()
+            self.active_model = model
+        self._notify_gallery_reload()
+        return 0
+
 
 db = Database()  # another singleton to be used around the project
@@ -0,0 +1,71 @@
+import numpy as np
+from insightface.utils import face_align
+
+# FaceMesh indices for the five ArcFace alignment points, in image-left to image-right order
+_EYE_CORNERS = ((33, 133), (362, 263))
+_IRIS_CENTERS = (468, 473)  # only present with refine_landmarks=True
+_NOSE_TIP = 1
+_MOUTH_CORNERS = (61, 291)
+
+
+def _normalized(face_landmarks) -> np.ndarray:
+    """(N, 3) normalized x, y, z of every landmark, through the public message fields"""
+    return np.array([(lm.x, lm.y, lm.z) for lm in face_landmarks.landmark])
+
+
+def mesh_points(face_landmarks, width: int, height: int) -> np.ndarray:
+    """
+    (N, 2) int32 pixel coordinates of one MediaPipe face, converted once per frame.
+    Everything downstream slices this array
+    """
+    return (_normalized(face_landmarks)[:, :2] * (width, height)).astype(np.int32)
+
+
+def mesh_xyz(face_landmarks, width: int, height: int) -> np.ndarray:
+    """
+    (N, 3) float64 landmarks, x and y in pixels and z in the same scale as x. FaceMesh's
+    z is depth relative to the face's centre, smaller is closer to the camera.
+    `mesh_xyz(...)[:, :2].astype(np.int32)` equals mesh_points
+    """
+    return _normalized(face_landmarks) * (width, height, width)
+
+
+def mesh_bbox(
+    points: np.ndarray, width: int, height: int, margin: int = 15
+) -> tuple[int, int, int, int]:
+    """Landmark bounds grown by `margin` and clipped to the frame, as plain ints for cv2"""
+    x1, y1 = points.min(axis=0) - margin
+    x2, y2 = points.max(axis=0) + margin
+    return max(int(x1), 0), max(int(y1), 0), min(int(x2), width), min(int(y2), height)
+
+
+def mesh_keypoints(points: np.ndarray) -> np.ndarray:
+    """
+    Five point (eyes, nose, mouth corners) landmarks for norm_crop from FaceMesh pixels.
+    Iris centres are used when refined landmarks exist, otherwise eye corner midpoints.
+    Pass float pixels, `mesh_xyz(...)[:, :2]`, rounded ones cost the crop subpixel accuracy
+    """
+    if len(points) > max(_IRIS_CENTERS):
+        eyes = points[list(_IRIS_CENTERS)]
+    else:
+        eyes = points[np.array(_EYE_CORNERS)].mean(axis=1)
+    rest = points[[_NOSE_TIP, *_MOUTH_CORNERS]]
+    return np.concatenate((eyes, rest)).astype(np.float32)
+
+
+def largest_face_crop(app, img) -> np.ndarray | None:
+    """Detect with the app's detector and norm_crop the largest face, None if there is none"""
+    bboxes, kpss = app.det_model.detect(img, max_num=0, metric="default")
+    if bboxes.shape[0] == 0:
+        return None
+    areas = (bboxes[:, 2] - bboxes[:, 0]) * (bboxes[:, 3] - bboxes[:, 1])
+    rec_model = app.models["recognition"]
+    return face_align.norm_crop(
+        img, landmark=kpss[int(np.argmax(areas))], image_size=rec_model.input_size[0]
+    )
+
+
+def embed_crops(app, crops: list[np.ndarray]) -> np.ndarray:
+    """One batched recognition call, rows come back L2 normalized"""
+    embeddings = app.models["recognition"].get_feat(crops)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
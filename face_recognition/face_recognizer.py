@@ -1,52 +1,153 @@
+import time
+
 import numpy as np
 from insightface.app import FaceAnalysis
+from insightface.utils import face_align
 
+from face_recognition.alignment import embed_crops
+from face_recognition.model_registry import (
+    DEFAULT_MODEL,
+    DEFAULT_MODULES,
+    DEFAULT_PROVIDERS,
+    model_for_config,
+)
+from runtime_services.embedding_manager import GallerySnapshot
+from utils import metrics
 from utils.enums import AccessLevel
 
+STAGE_SECONDS = metrics.histogram(
+    "lock_override_recognizer_stage_seconds",
+    "Detection, embedding and gallery matching time per recognition.",
+    ("stage",),
+)
+_DETECT = STAGE_SECONDS.labels("detect")
+_EMBED = STAGE_SECONDS.labels("embed")
+_MATCH = STAGE_SECONDS.labels("match")
+RECOGNITIONS = metrics.counter(
+    "lock_override_recognitions_total",
+    "Recognitions by outcome: match, unknown or no_face.",
+    ("result",),
+)
+_RESULTS = {
+    result: RECOGNITIONS.labels(result) for result in ("match", "unknown", "no_face")
+}
+Result = tuple[str, float, AccessLevel]
+NO_MATCH: Result = ("Unknown", -1.0, AccessLevel.STRANGER)
+# a detection belongs to a mesh face when their five points are on average closer
+# than this fraction of the mesh face's eye distance
+MAX_KEYPOINT_SHIFT = 0.5
+
 
 class FaceRecognizer:
     def __init__(self):
-        self.model = "buffalo_s"
-        self.providers = ["CPUExecutionProvider"]
+        self.model = DEFAULT_MODEL
+        self.providers = list(DEFAULT_PROVIDERS)
         self.similarity_threshold = None
-        self.verified = False
-
-        self.app = FaceAnalysis(name=self.model, providers=["CPUExecutionProvider"])
-        self.app.prepare(ctx_id=0, det_size=(640, 640))
-
-    def run_facial_recognition(
-        self,
-        frame,
-        face_db: dict[int, np.ndarray],
-        user_db: dict[int, tuple[str, AccessLevel]],
-    ) -> tuple[str, float, AccessLevel]:
-        faces = self.app.get(frame)
-        best_match = "Unknown"
-        best_score = -1
-        access = AccessLevel.STRANGER
-
-        for face in faces:
-            embedding = face.normed_embedding
-            for user_id, db_embedding in face_db.items():
-                # simple dot product for cosine similarity since vectors are normalized
-                score = np.dot(embedding, db_embedding)
-                if score > self.similarity_threshold:
-                    if score > best_score:
-                        user_tuple = user_db[user_id]
-                        best_match = user_tuple[0]
-                        best_score = score
-                        access = user_tuple[1]
-        # changed, now multiple faces will not overwrite the verified check
-        self.verified = best_score > self.similarity_threshold
-        return (best_match, best_score, access)
+        # "detector" re-detects the full frame, "mesh" aligns straight from FaceMesh points
+        self.alignment = "detector"
+
+        self.modules = list(DEFAULT_MODULES)
+        self.model_config = {}
+
+    def _app(self, model: str) -> FaceAnalysis:
+        # shared with enrollment, loaded on first use unless warmed up at startup
+        return model_for_config(self.model_config, model)
+
+    def recognize_faces(
+        self, frame, gallery: GallerySnapshot, keypoints: list[np.ndarray]
+    ) -> list[Result]:
+        """
+        One pass for every face FaceMesh found in `frame`: at most one detection, one
+        batched embedding and one gallery search, then a result per entry of `keypoints`
+        """
+        app = self._app(gallery.model)
+        if self.alignment == "mesh":
+            aligned = list(keypoints)
+            faces = list(range(len(keypoints)))
+        else:
+            start = time.perf_counter()
+            _, kpss = app.det_model.detect(frame, max_num=0, metric="default")
+            _DETECT.observe(time.perf_counter() - start)
+            detections = self._assign(keypoints, kpss)
+            # a face the detector missed has nothing to embed, it stays Unknown
+            faces = [f for f, d in enumerate(detections) if d is not None]
+            aligned = [kpss[detections[f]] for f in faces]
+
+        results = [NO_MATCH] * len(keypoints)
+        if aligned:
+            start = time.perf_counter()
+            embeddings = self._embed_aligned(app, frame, aligned)
+            _EMBED.observe(time.perf_counter() - start)
+            start = time.perf_counter()
+            for f, result in zip(faces, self._match_each(embeddings, gallery)):
+                results[f] = result
+            _MATCH.observe(time.perf_counter() - start)
+        _RESULTS["no_face"].inc(len(keypoints) - len(faces))
+        for f in faces:
+            matched = results[f][1] > self.similarity_threshold
+            _RESULTS["match" if matched else "unknown"].inc()
+        return results
+
+    @staticmethod
+    def _assign(
+        keypoints: list[np.ndarray], kpss: np.ndarray | None
+    ) -> list[int | None]:
+        """Index of the detection matching each mesh face, greedily by keypoint shift"""
+        assigned: list[int | None] = [None] * len(keypoints)
+        if kpss is None or not len(kpss) or not keypoints:
+            return assigned
+        mesh = np.asarray(keypoints, np.float32)  # (F, 5, 2)
+        eyes = np.linalg.norm(mesh[:, 0] - mesh[:, 1], axis=1)
+        # (F, D) mean point distance, relative to each mesh face's eye distance
+        shift = np.linalg.norm(mesh[:, None] - kpss[None], axis=3).mean(axis=2)
+        shift /= np.maximum(eyes, 1.0)[:, None]
+        used = set()
+        for flat in np.argsort(shift, axis=None):
+            f, d = divmod(int(flat), shift.shape[1])
+            if shift[f, d] > MAX_KEYPOINT_SHIFT:
+                break
+            if assigned[f] is None and d not in used:
+                assigned[f] = d
+                used.add(d)
+        return assigned
+
+    def _embed_aligned(
+        self, app: FaceAnalysis, frame, keypoints: list[np.ndarray]
+    ) -> np.ndarray:
+        """Skip the detector, crop with the given five points and embed in one batch"""
+        size = app.models["recognition"].input_size[0]
+        crops = [
+            face_align.norm_crop(frame, landmark=kps, image_size=size)
+            for kps in keypoints
+        ]
+        return embed_crops(app, crops)
+
+    def _match_each(
+        self, embeddings: np.ndarray, gallery: GallerySnapshot
+    ) -> list[Result]:
+        """The best gallery user of every embedding row, one batched search"""
+        if not len(gallery):
+            return [NO_MATCH] * len(embeddings)
+        rows, scores = gallery.search(embeddings, k=1)
+        results = []
+        for row, score in zip(rows[:, 0].tolist(), scores[:, 0].tolist()):
+            user_tuple = gallery.users.get(int(gallery.ids[row])) if row >= 0 else None
+            if score > self.similarity_threshold and user_tuple is not None:
+                name, access = user_tuple
+                results.append((name, score, access))
+            else:
+                results.append(NO_MATCH)
+        return results
 
     def update_config(self, config):
         self.model = config["model"]
         self.similarity_threshold = config["similarity_threshold"]
+        self.alignment = config.get("alignment", "detector")
+        self.modules = list(config.get("modules", DEFAULT_MODULES))
+        self.providers = list(config.get("providers", DEFAULT_PROVIDERS))
+        # providers, modules and session options decide which registry entry is used
+        self.model_config = dict(config)
+        # a new model only takes over once ModelMigration has re-embedded the gallery
         print(
-            f"FaceRecognizer update - Model {self.model}, Threshold {self.similarity_threshold}"
+            f"FaceRecognizer update - Model {self.model}, Threshold {self.similarity_threshold}, Providers {self.providers}, Modules {self.modules}, Alignment {self.alignment}"
         )
-        # TODO: configure model to actually change. requires adjustment to db as well
-
-    def reset(self):
-        self.verified = False
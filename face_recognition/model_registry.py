@@ -0,0 +1,240 @@
+import glob
+import json
+import os.path as osp
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import numpy as np
+import onnxruntime as ort
+from insightface.app import FaceAnalysis
+from insightface.model_zoo.model_zoo import ModelRouter
+from insightface.utils import ensure_available
+
+DEFAULT_MODEL = "buffalo_s"
+DEFAULT_PROVIDERS = ["CPUExecutionProvider"]  # change to gpu later
+# the only model pack heads recognition reads, landmark and genderage output is thrown away
+DEFAULT_MODULES = ["detection", "recognition"]
+
+# 0 threads lets ONNX Runtime pick, which is one per physical core
+DEFAULT_SESSION_OPTIONS: dict[str, Any] = {
+    "intra_op_num_threads": 0,
+    "inter_op_num_threads": 0,
+    "graph_optimization_level": "all",
+    "execution_mode": "sequential",
+    "enable_cpu_mem_arena": True,
+    "enable_mem_pattern": True,
+}
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+
+def module_session_options(
+    module: str, session_options: dict[str, dict[str, Any]] | None
+) -> dict[str, Any]:
+    """Defaults, then the config's "default" entry, then the entry for this module"""
+    session_options = session_options or {}
+    options = dict(DEFAULT_SESSION_OPTIONS)
+    for scope in ("default", module):
+        # unset fields come through the config API as None and mean "inherit"
+        overrides = session_options.get(scope) or {}
+        options.update({k: v for k, v in overrides.items() if v is not None})
+    return options
+
+
+def build_session_options(options: dict[str, Any]) -> ort.SessionOptions:
+    session_options = ort.SessionOptions()
+    session_options.intra_op_num_threads = options["intra_op_num_threads"]
+    session_options.inter_op_num_threads = options["inter_op_num_threads"]
+    session_options.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS[
+        options["graph_optimization_level"]
+    ]
+    session_options.execution_mode = _EXECUTION_MODES[options["execution_mode"]]
+    session_options.enable_cpu_mem_arena = options["enable_cpu_mem_arena"]
+    session_options.enable_mem_pattern = options["enable_mem_pattern"]
+    session_options.log_severity_level = 3
+    return session_options
+
+
+class SessionFaceAnalysis(FaceAnalysis):
+    """
+    FaceAnalysis that builds every kept module's session with its own SessionOptions.
+    FaceAnalysis only forwards providers to ONNX Runtime, so the pack is routed here
+    instead, each file once with the "default" options. A module whose own entry
+    changes them is the only one built a second time
+    """
+
+    def __init__(
+        self,
+        name: str,
+        providers: list[str],
+        modules: list[str],
+        session_options: dict[str, dict[str, Any]] | None,
+        root: str = "~/.insightface",
+    ):
+        ort.set_default_logger_severity(3)
+        self.model_dir = ensure_available("models", name, root=root)
+        self.models = {}
+        self.session_options: dict[str, dict[str, Any]] = {}
+        default = module_session_options("default", session_options)
+        for onnx_file in sorted(glob.glob(osp.join(self.model_dir, "*.onnx"))):
+            head = self._route(onnx_file, providers, default)
+            # unrecognized files, modules nobody reads and duplicates are skipped
+            if (
+                head is None
+                or head.taskname not in modules
+                or head.taskname in self.models
+            ):
+                continue
+            options = module_session_options(head.taskname, session_options)
+            if options != default:
+                head = self._route(onnx_file, providers, options)
+            self.models[head.taskname] = head
+            self.session_options[head.taskname] = options
+        assert "detection" in self.models, f"{name} has no detection model"
+        self.det_model = self.models["detection"]
+
+    @staticmethod
+    def _route(onnx_file: str, providers: list[str], options: dict[str, Any]):
+        return ModelRouter(onnx_file).get_model(
+            sess_options=build_session_options(options), providers=list(providers)
+        )
+
+
+class ModelRegistry:
+    """
+    Loads each (model, providers, modules, session options) combination once and shares
+    it process wide. Models are prepared once at load and only read afterwards, ONNX
+    Runtime sessions are safe to run from several threads so callers need no extra locking.
+    Loading a model with new settings drops the registry's copy with the old ones
+    """
+
+    def __init__(self):
+        self._models: dict[tuple, FaceAnalysis] = {}
+        self._status: dict[tuple, dict[str, Any]] = {}
+        self._load_locks: dict[tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, providers, modules, session_options) -> tuple:
+        return (
+            name,
+            tuple(providers),
+            tuple(sorted(modules)),
+            json.dumps(session_options or {}, sort_keys=True),
+        )
+
+    def get(
+        self,
+        name: str = DEFAULT_MODEL,
+        providers: list[str] = DEFAULT_PROVIDERS,
+        modules: list[str] = DEFAULT_MODULES,
+        session_options: dict[str, dict[str, Any]] | None = None,
+        warmup_runs: int = 1,
+    ) -> FaceAnalysis:
+        key = self._key(name, providers, modules, session_options)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        # per key lock so one combination loads once while others load in parallel
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._models.get(key)
+            if model is None:
+                start = time.perf_counter()
+                model = SessionFaceAnalysis(name, providers, modules, session_options)
+                model.prepare(ctx_id=0, det_size=(640, 640))
+                load_s = time.perf_counter() - start
+                warmup_ms = self._warmup(model, warmup_runs)
+                applied = {
+                    module: {
+                        **model.session_options[module],
+                        "applied_providers": head.session.get_providers(),
+                    }
+                    for module, head in model.models.items()
+                }
+                with self._lock:
+                    self._evict(name, key)
+                    self._status[key] = {
+                        "model": name,
+                        "providers": list(providers),
+                        "modules": applied,
+                        "load_s": round(load_s, 3),
+                        "warmup_runs": warmup_runs,
+                        "warmup_ms": warmup_ms,
+                    }
+                    self._models[key] = model
+                print(f"ModelRegistry loaded {name} {list(applied)} in {load_s:.2f}s")
+        return model
+
+    def _evict(self, name: str, keep: tuple):
+        """
+        Forget `name` loaded with other settings, callers still holding it keep a working
+        model until their next get(). Called under self._lock
+        """
+        for key in [key for key in self._models if key[0] == name and key != keep]:
+            del self._models[key]
+            self._status.pop(key, None)
+            self._load_locks.pop(key, None)
+
+    @staticmethod
+    def _warmup(model: FaceAnalysis, runs: int) -> dict[str, float]:
+        """Blank inferences so lazy allocations and kernel selection happen before the first visitor"""
+        if runs <= 0:
+            return {}
+        timings = {}
+        for module, head in model.models.items():
+            if module == "detection":
+                blank = np.zeros((*model.det_size[::-1], 3), dtype=np.uint8)
+                run = lambda: head.detect(blank, max_num=0, metric="default")
+            else:
+                model_input = head.session.get_inputs()[0]
+                shape = [
+                    dim if isinstance(dim, int) else 1 for dim in model_input.shape
+                ]
+                feed = {model_input.name: np.zeros(shape, dtype=np.float32)}
+                run = lambda: head.session.run(None, feed)
+            start = time.perf_counter()
+            for _ in range(runs):
+                run()
+            timings[module] = round((time.perf_counter() - start) * 1000 / runs, 2)
+        return timings
+
+    def warmup(self, specs: list[tuple]):
+        """Load get() argument tuples in parallel, e.g. before serving"""
+        with ThreadPoolExecutor(max_workers=max(1, len(specs))) as pool:
+            list(pool.map(lambda spec: self.get(*spec), specs))
+
+    def loaded(self) -> list[tuple]:
+        return list(self._models.keys())
+
+    def status(self) -> list[dict[str, Any]]:
+        """Load time, warmup time and the session options applied to every loaded model"""
+        return list(self._status.values())
+
+
+def model_for_config(config: dict[str, Any], name: str | None = None) -> FaceAnalysis:
+    """Shared model for a face_recognition config section, `name` overrides its model"""
+    return model_registry.get(
+        name or config["model"],
+        config.get("providers", DEFAULT_PROVIDERS),
+        config.get("modules", DEFAULT_MODULES),
+        config.get("session_options"),
+        config.get("warmup_runs", 1),
+    )
+
+
+# singleton so the API and the runtime share the same sessions
+model_registry = ModelRegistry()
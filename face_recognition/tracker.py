@@ -0,0 +1,127 @@
+from typing import Any
+import time
+import numpy as np
+
+from utils.enums import AccessLevel
+
+
+def box_iou(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> float:
+    """IoU of two (x1, y1, x2, y2) boxes"""
+    ix1, iy1 = max(a[0], b[0]), max(a[1], b[1])
+    ix2, iy2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, ix2 - ix1) * max(0, iy2 - iy1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+class Track:
+    def __init__(self, track_id: int, bbox, keypoints: np.ndarray):
+        self.id = track_id
+        self.bbox = bbox
+        self.keypoints = keypoints
+        self.missed = 0  # frames since this track was last matched
+        self.created = time.monotonic()  # only for time-to-unlock metrics
+
+        # cached recognition result, only trusted while verified
+        self.verified = False
+        self.name = "Unknown"
+        self.score = -1.0
+        self.access = AccessLevel.STRANGER
+        self.verified_bbox = bbox
+        self.frames_since_verify = 0
+
+
+class FaceTracker:
+    """
+    Associates FaceMesh faces across frames by box IoU and keypoint continuity so a
+    recognized identity can be reused instead of re-embedding the same face every frame
+    """
+
+    def __init__(self):
+        # overwritten by config manager
+        self.max_age = 15
+        self.reverify_interval = 30
+        self.reverify_iou = 0.5
+        self.match_iou = 0.3
+        self.max_shift = 0.25
+        self.score_decay = 0.005
+        self.similarity_threshold = 0.6
+
+        self.tracks: list[Track] = []
+        self._next_id = 0
+
+    def _shift(self, track: Track, bbox, keypoints: np.ndarray) -> float:
+        """Mean keypoint motion relative to the face size"""
+        diagonal = np.hypot(bbox[2] - bbox[0], bbox[3] - bbox[1])
+        motion = np.linalg.norm(keypoints - track.keypoints, axis=1).mean()
+        return motion / diagonal if diagonal > 0 else np.inf
+
+    def update(self, faces: list[tuple[tuple[int, int, int, int], np.ndarray]]):
+        """Match this frame's (bbox, keypoints) faces to tracks, returns one track per face"""
+        pairs = []
+        for t, track in enumerate(self.tracks):
+            for f, (bbox, keypoints) in enumerate(faces):
+                iou = box_iou(track.bbox, bbox)
+                if iou >= self.match_iou and (
+                    self._shift(track, bbox, keypoints) <= self.max_shift
+                ):
+                    pairs.append((iou, t, f))
+
+        # greedy, best overlap first, fine for the handful of faces at a door
+        matched: list[Track | None] = [None] * len(faces)
+        used_tracks = set()
+        for _, t, f in sorted(pairs, reverse=True):
+            if t in used_tracks or matched[f] is not None:
+                continue
+            used_tracks.add(t)
+            matched[f] = self.tracks[t]
+
+        for t, track in enumerate(self.tracks):
+            if t not in used_tracks:
+                track.missed += 1
+        self.tracks = [track for track in self.tracks if track.missed <= self.max_age]
+
+        for f, (bbox, keypoints) in enumerate(faces):
+            track = matched[f]
+            if track is None:
+                track = Track(self._next_id, bbox, keypoints)
+                self._next_id += 1
+                self.tracks.append(track)
+                matched[f] = track
+            else:
+                track.bbox = bbox
+                track.keypoints = keypoints
+                track.missed = 0
+                track.frames_since_verify += 1
+                track.score -= self.score_decay
+        return matched
+
+    def needs_recognition(self, track: Track) -> bool:
+        if not track.verified:
+            return True
+        return (
+            track.frames_since_verify >= self.reverify_interval
+            or track.score <= self.similarity_threshold
+            or box_iou(track.verified_bbox, track.bbox) < self.reverify_iou
+        )
+
+    def record(self, track: Track, name: str, score: float, access: AccessLevel):
+        track.verified = score > self.similarity_threshold
+        track.name = name
+        track.score = score
+        track.access = access
+        track.verified_bbox = track.bbox
+        track.frames_since_verify = 0
+
+    def reset(self):
+        self.tracks = []
+
+    def update_config(self, config: dict[str, Any]):
+        self.similarity_threshold = config["similarity_threshold"]
+        self.max_age = config.get("track_max_age", 15)
+        self.reverify_interval = config.get("reverify_interval", 30)
+        self.reverify_iou = config.get("reverify_iou", 0.5)
+        self.score_decay = config.get("score_decay", 0.005)
+        print(
+            f"FaceTracker update - max age {self.max_age}, reverify every {self.reverify_interval} frames, iou {self.reverify_iou}, decay {self.score_decay}"
+        )
@@ -1,17 +1,21 @@
 const streamButton = document.getElementById("toggle-stream-btn");
 const streamView = document.getElementById("stream-view");
+const cameraSelect = document.getElementById("camera-select");
 
 const VIDEO_API_BASE = "http://127.0.0.1:8000/video";
-const STREAM_ENDPOINT = `${VIDEO_API_BASE}/stream`;
 let isStreaming = false;
 
+// every video endpoint is scoped to the camera picked in the dropdown
+const cameraEndpoint = (path) =>
+  `${VIDEO_API_BASE}/${encodeURIComponent(cameraSelect.value)}/${path}`;
+
 const setUiForStreaming = (running) => {
   isStreaming = running;
   streamButton.textContent = running ? "Stop Stream" : "Start Stream";
 
   if (running) {
     // force a new MJPEG connection on restart with ?t=....
-    streamView.src = `${STREAM_ENDPOINT}?t=${Date.now()}`;
+    streamView.src = `${cameraEndpoint("stream")}?t=${Date.now()}`;
   } else {
     streamView.removeAttribute("src");
   }
@@ -26,7 +30,7 @@ const brieflyDisableButton = () => {
 
 const refreshStatus = async () => {
   try {
-    const response = await fetch(`${VIDEO_API_BASE}/status`);
+    const response = await fetch(cameraEndpoint("status"));
     if (!response.ok) {
       throw new Error(`${response.status} ${response.statusText}`);
     }
@@ -44,11 +48,30 @@ streamButton.addEventListener("click", async () => {
   brieflyDisableButton();
   const nextAction = isStreaming ? "stop" : "start";
   try {
-    const response = await fetch(`${VIDEO_API_BASE}/${nextAction}`);
+    const response = await fetch(cameraEndpoint(nextAction));
+    if (!response.ok) {
+      throw new Error(`${response.status} ${response.statusText}`);
+    }
+    await const loadCameras = async () => {
+  try {
+    const response = await fetch(`${VIDEO_API_BASE}/cameras`);
     if (!response.ok) {
       throw new Error(`${response.status} ${response.statusText}`);
     }
+    const cameras = await response.json();
+    cameraSelect.replaceChildren(
+      ...Object.keys(cameras).map((name) => new Option(name, name))
+    );
     await refreshStatus();
+  } catch (error) {
+    console.error("Failed to load cameras:", error);
+    setUiForStreaming(false);
+  }
+};
+
+cameraSelect.addEventListener("change", refreshStatus);
+
+loadCameras();
   } catch (error) {
     console.error(`Failed to ${nextAction} stream:`, error);
     setUiForStreaming(false);
@@ -1,3 +1,15 @@
 from liveness.blink import Blink
+from liveness.check import LIVE, PENDING, SPOOF, LivenessCheck
+from liveness.liveness_manager import LivenessManager, register_check
+from liveness.parallax import Parallax
 
-__all__ = ["Blink"]
+__all__ = [
+    "Blink",
+    "LivenessCheck",
+    "LivenessManager",
+    "Parallax",
+    "register_check",
+    "LIVE",
+    "PENDING",
+    "SPOOF",
+]
@@ -1,107 +1,156 @@
+import math
 import numpy as np
 import time
 from typing import Any
+
+from liveness.check import LIVE, PENDING, LivenessCheck
+
 # modified code from https://github.com/Pushtogithub23/Eye-Blink-Detection-using-MediaPipe-and-OpenCV
 
 
-class Blink:
+class Blink(LivenessCheck):
+    """
+    Counts blinks from the eye aspect ratio. Everything is measured on frame timestamps:
+    a blink is the eyes staying closed for at least `min_closed_ms`, and the EAR is
+    smoothed with a `smoothing_ms` time constant, so the same settings hold whether the
+    pipeline sees 10 fps or 30 fps, or drops frames in between
+    """
+
+    name = "blink"
+    section = "blink_config"
+    cost = 40.0
+    # blinks are forgotten after reset_after_s, and so is the face being live
+    time_bounded = True
+
     def __init__(self):
         # blink detection parameters, these will be overwritten by config immediately
         self.ear_threshold = 0.21  # eye aspect ratio threshold for blink detection
-        self.blink_consec_frames = 2
+        self.min_closed_ms = 60.0  # shortest eye closure that counts as a blink
+        self.smoothing_ms = 30.0  # EAR smoothing time constant, 0 turns it off
         self.blinks_to_verify = 2
-        self.closed_eye_frames_counter = (
-            0  # counter for consecutive frames with EAR below threshold
-        )
+        self.reset_after_s = 10.0  # blinks are forgotten after this long without one
         self.total_blinks = 0  # total number of blinks
         self.live = False
 
-        # store previous EAR values for smoothing
-        self.prev_left_ear = 0.0
-        self.prev_right_ear = 0.0
+        # smoothed (right, left) EAR, None until the first frame
+        self.smoothed_ears: np.ndarray | None = None
+        # timestamp of the previous frame, and when the eyes closed, None while open
+        self._last_frame: float | None = None
+        self._closed_since: float | None = None
 
         # landmark indices to calculate EAR for right and left eye
         self._RIGHT_EYE = [33, 159, 158, 133, 153, 145]
         self._LEFT_EYE = [362, 380, 374, 263, 386, 385]
+        self._EYES = np.array([self._RIGHT_EYE, self._LEFT_EYE])
 
-        # store last blink time to reset in case of inactivity
-        self.last_blink_time = time.time()
+        # store last blink time to reset in case of inactivity, set by the first frame
+        self.last_blink_time: float | None = None
 
-    def eye_aspect_ratio(self, is_right: bool, mesh_landmarks):
+    @staticmethod
+    def _ears(eyes: np.ndarray) -> np.ndarray:
         """
-        Calculate the Eye Aspect Ratio (EAR) for blink detection.
+        Eye Aspect Ratio of every eye in an (E, 6, 2) stack of eye landmarks.
         EAR = (|p2-p6| + |p3-p5|) / (2 * |p1-p4|)
         """
+        eyes = eyes.astype(np.float64)
+        vertical = np.linalg.norm(eyes[:, [1, 2]] - eyes[:, [5, 4]], axis=2).sum(axis=1)
+        horizontal = np.linalg.norm(eyes[:, 0] - eyes[:, 3], axis=1)
+        return vertical / (2.0 * horizontal)
 
+    def eye_aspect_ratio(self, is_right: bool, mesh_landmarks: np.ndarray) -> float:
+        """Eye Aspect Ratio (EAR) for blink detection from (N, 2) landmarks"""
         eye_landmarks = self._RIGHT_EYE if is_right else self._LEFT_EYE
+        return float(self._ears(mesh_landmarks[eye_landmarks][None])[0])
 
-        A = np.linalg.norm(
-            np.array(mesh_landmarks[eye_landmarks[1]])
-            - np.array(mesh_landmarks[eye_landmarks[5]])
-        )
-        B = np.linalg.norm(
-            np.array(mesh_landmarks[eye_landmarks[2]])
-            - np.array(mesh_landmarks[eye_landmarks[4]])
-        )
-        C = np.linalg.norm(
-            np.array(mesh_landmarks[eye_landmarks[0]])
-            - np.array(mesh_landmarks[eye_landmarks[3]])
-        )
-        return (A + B) / (2.0 * C)
-
-    def update_blink_count(self, ear: float):
+    def update_blink_count(self, ear: float, now: float | None = None):
+        """
+        Feed one frame's EAR. The eyes changed state somewhere between the previous
+        frame and this one, so each edge is placed halfway between them
+        """
         blink_detected = False
+        now = time.monotonic() if now is None else now
+        if self.last_blink_time is None:
+            self.last_blink_time = now
+
+        # reset blink count if no blink in the last reset_after_s seconds
+        if now - self.last_blink_time > self.reset_after_s:
+            self.reset(now)
 
-        # reset blink count if no blink in last 10 seconds
-        if time.time() - self.last_blink_time > 10:
-            self.reset()
+        previous = now if self._last_frame is None else self._last_frame
+        self._last_frame = now
+        edge = (previous + now) / 2
 
-        # if mid-blink, add another closed eye frame
         if ear < self.ear_threshold:
-            self.closed_eye_frames_counter += 1
+            if self._closed_since is None:
+                self._closed_since = edge
 
-        # if eyes open, check if blink is confirmed
-        else:
-            if self.closed_eye_frames_counter >= self.blink_consec_frames:
+        # eyes open again, a long enough closure was a blink
+        elif self._closed_since is not None:
+            if (edge - self._closed_since) * 1000 >= self.min_closed_ms:
                 self.total_blinks += 1
                 blink_detected = True
-                self.last_blink_time = time.time()
-            self.closed_eye_frames_counter = 0
+                self.last_blink_time = now
+            self._closed_since = None
 
         return blink_detected
 
-    def calculate_liveness(self, mesh_landmarks):
-        right_ear = self.eye_aspect_ratio(True, mesh_landmarks)
-        left_ear = self.eye_aspect_ratio(False, mesh_landmarks)
-
-        # Smooth the EAR values
-        if right_ear != 0.0 and left_ear != 0.0:
-            right_ear = 0.7 * right_ear + 0.3 * self.prev_right_ear
-            left_ear = 0.7 * left_ear + 0.3 * self.prev_left_ear
-        self.prev_right_ear = right_ear
-        self.prev_left_ear = left_ear
+    def _smooth(self, ears: np.ndarray, now: float) -> np.ndarray:
+        """Exponential smoothing over time, a long gap between frames forgets more"""
+        if self.smoothed_ears is None or self._last_frame is None:
+            self.smoothed_ears = ears
+        else:
+            elapsed_ms = max(now - self._last_frame, 0.0) * 1000
+            weight = (
+                1.0
+                if self.smoothing_ms <= 0
+                else 1.0 - math.exp(-elapsed_ms / self.smoothing_ms)
+            )
+            self.smoothed_ears = self.smoothed_ears + weight * (
+                ears - self.smoothed_ears
+            )
+        return self.smoothed_ears
+
+    def calculate_liveness(self, mesh_landmarks: np.ndarray, now: float | None = None):
+        """`now` is the frame's timestamp, a replayed clip runs on its own clock"""
+        now = time.monotonic() if now is None else now
+        # both eyes in one vectorized pass over the (N, 2) landmark array
+        right_ear, left_ear = self._smooth(
+            self._ears(mesh_landmarks[self._EYES]), now
+        ).tolist()
 
         # calculate average EAR
         overall_ear = (right_ear + left_ear) / 2
 
         # update blink count
-        self.update_blink_count(overall_ear)
+        self.update_blink_count(overall_ear, now)
 
         self.live = self.total_blinks >= self.blinks_to_verify
         return self.live
 
-    def reset(self):
+    def update(self, mesh_landmarks: np.ndarray, now: float) -> str:
+        # blinks only ever add evidence, a face without them is still pending
+        return LIVE if self.calculate_liveness(mesh_landmarks, now) else PENDING
+
+    def evidence(self) -> dict[str, float]:
+        return {"blinks": self.total_blinks}
+
+    def reset(self, now: float | None = None):
         self.live = False
         self.total_blinks = 0
-        self.closed_eye_frames_counter = 0
-        self.prev_left_ear = 0.0
-        self.prev_right_ear = 0.0
-        self.last_blink_time = time.time()
+        self.smoothed_ears = None
+        self._last_frame = None
+        self._closed_since = None
+        self.last_blink_time = time.monotonic() if now is None else now
 
-    def update_config(self, config: dict[str, Any]):
+    def configure(self, config: dict[str, Any]):
         self.ear_threshold = config["ear_threshold"]
-        self.blink_consec_frames = config["blink_consec_frames"]
+        self.min_closed_ms = config.get("min_closed_ms", 60.0)
+        self.smoothing_ms = config.get("smoothing_ms", 30.0)
         self.blinks_to_verify = config["blinks_to_verify"]
+        self.reset_after_s = config.get("reset_after_s", 10.0)
+
+    def update_config(self, config: dict[str, Any]):
+        self.configure(config)
         print(
-            f"[BlinkDetector] ear={self.ear_threshold}, frames={self.blink_consec_frames}, blinks={self.blinks_to_verify}"
+            f"[BlinkDetector] ear={self.ear_threshold}, closed={self.min_closed_ms}ms, smoothing={self.smoothing_ms}ms, blinks={self.blinks_to_verify}"
         )
@@ -0,0 +1,43 @@
+from abc import ABC, abstractmethod
+from typing import Any, ClassVar
+
+import numpy as np
+
+# what a check says about one face so far
+LIVE = "live"
+SPOOF = "spoof"
+PENDING = "pending"  # not enough evidence yet
+
+
+class LivenessCheck(ABC):
+    """
+    One liveness test of one tracked face, fed that face's (N, 2) landmark array every
+    frame it runs, or its (N, 3) landmarks with depth when `uses_depth` is set.
+    Instances hold per-face state, LivenessManager creates one per check and face and
+    orders them by `cost`
+    """
+
+    name: ClassVar[str]
+    # config section holding this check's settings
+    section: ClassVar[str]
+    # rough µs per frame, cheaper checks run first
+    cost: ClassVar[float] = 100.0
+    # fed mesh_xyz's float (N, 3) pixels and depth instead of mesh_points
+    uses_depth: ClassVar[bool] = False
+    # a LIVE verdict only holds while update() keeps confirming it, so the check keeps
+    # running on a live face and the face stops being live once its evidence is too old
+    time_bounded: ClassVar[bool] = False
+
+    @abstractmethod
+    def update(self, mesh_landmarks: np.ndarray, now: float) -> str:
+        """LIVE, SPOOF or PENDING after this frame, `now` is the frame's timestamp"""
+
+    @abstractmethod
+    def reset(self, now: float | None = None): ...
+
+    @abstractmethod
+    def configure(self, config: dict[str, Any]): ...
+
+    def evidence(self) -> dict[str, float]:
+        """What the check has seen so far, logged with each liveness decision"""
+        return {}
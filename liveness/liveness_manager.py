@@ -1,17 +1,260 @@
+import functools
+import time
+from collections import deque
+from typing import Any, Callable
+
+import numpy as np
+
 from liveness.blink import Blink
+from liveness.check import LIVE, PENDING, SPOOF, LivenessCheck
+from liveness.parallax import Parallax
+from utils import metrics
+
+CHECK_SECONDS = metrics.histogram(
+    "lock_override_liveness_check_seconds",
+    "Time one liveness check spends on one face and frame.",
+    ("check",),
+)
+DECISION_SECONDS = metrics.histogram(
+    "lock_override_liveness_decision_seconds",
+    "Time from a face being recognized to its liveness verdict.",
+    ("verdict", "check"),
+)
+# recent verdicts kept for GET /video/{camera}/pipeline
+DECISION_LOG = 20
+
+# checks the liveness config section can enable, by name
+CHECKS: dict[str, type[LivenessCheck]] = {}
+
+
+def register_check(check: type[LivenessCheck]) -> type[LivenessCheck]:
+    CHECKS[check.name] = check
+    return check
+
+
+register_check(Blink)
+register_check(Parallax)
+
+
+class FaceLiveness:
+    """One tracked face's checks, cheapest first, and where each of them stands"""
+
+    __slots__ = ("checks", "verdicts", "live", "spoof", "generation", "started")
+
+    def __init__(self, checks: list[LivenessCheck], generation: int, now: float):
+        self.checks = checks
+        self.verdicts = {check.name: PENDING for check in checks}
+        self.live = not checks  # no checks enabled, liveness is off
+        self.spoof = False
+        self.generation = generation
+        self.started = now  # when the checks started, verdicts are timed from it
+
+    @property
+    def blinks(self) -> int:
+        for check in self.checks:
+            if isinstance(check, Blink):
+                return check.total_blinks
+        return 0
+
+    def reset(self, now: float):
+        for check in self.checks:
+            check.reset(now)
+        self.verdicts = dict.fromkeys(self.verdicts, PENDING)
+        self.live = not self.checks
+        self.spoof = False
+        self.started = now
 
 
 class LivenessManager:
-    def __init__(self, enabled_types: list, blink_config=None, audio_config=None):
-        self.liveness_objects = self.create_objects([blink_config, audio_config])
-        self.live = False
-
-    def create_objects(self, blink_config, audio_config):
-        objects = {}
-        if blink_config:
-            objects["blink"] = Blink(**blink_config)
-        if audio_config:
-            raise NotImplementedError
-
-    def check_liveness():
-        pass
+    """
+    Runs the checks the liveness config section enables on every tracked face, sharing
+    the face's landmark array. Checks run cheapest first and stop early: in "all" mode
+    at the first check still pending, in "any" mode at the first that passes, and a
+    spoof stops them in either. A check that passed isn't run again for that face unless
+    it is `time_bounded`, those keep running so a live face whose evidence got too old,
+    no blink for reset_after_s say, stops being live. Checks with `uses_depth` get the
+    face's landmarks with depth instead. Every verdict is printed with how long it took
+    and what each check had seen, for tuning their thresholds
+    """
+
+    def __init__(self):
+        # overwritten by config manager
+        self.checks: list[str] = [Blink.name]
+        self.mode = "all"
+
+        self._configs: dict[str, dict[str, Any]] = {}
+        # bumped on a new check list, faces rebuild their checks on their next frame
+        self._generation = 0
+        self._faces: dict[int, FaceLiveness] = {}
+        self._timings: dict[str, metrics.HistogramSeries] = {}
+        self._stats: dict[str, dict[str, float]] = {}
+        self._decisions: deque[dict[str, Any]] = deque(maxlen=DECISION_LOG)
+
+    def listeners(self) -> list[tuple[str, Callable]]:
+        """(section, listener) pairs for the liveness section and every check's settings"""
+        sections = sorted({check.section for check in CHECKS.values()})
+        return [("liveness", self.update_config)] + [
+            (section, functools.partial(self.update_check_config, section))
+            for section in sections
+        ]
+
+    def update_config(self, config: dict[str, Any]):
+        unknown = [name for name in config["checks"] if name not in CHECKS]
+        if unknown:
+            print(f"LivenessManager - ignoring unknown checks {unknown}")
+        self.checks = [name for name in config["checks"] if name in CHECKS]
+        self.mode = config.get("mode", "all")
+        self._generation += 1
+        print(
+            f"LivenessManager update - checks {self._ordered(self.checks)}, mode {self.mode}"
+        )
+
+    def update_check_config(self, section: str, config: dict[str, Any]):
+        self._configs[section] = dict(config)
+        for face in list(self._faces.values()):
+            for check in face.checks:
+                if check.section == section:
+                    check.configure(config)
+
+    @staticmethod
+    def _ordered(names: list[str]) -> list[str]:
+        # sorted is stable, equally cheap checks keep their config order
+        return sorted(names, key=lambda name: CHECKS[name].cost)
+
+    def _new_face(self, now: float) -> FaceLiveness:
+        checks = []
+        for name in self._ordered(self.checks):
+            check = CHECKS[name]()
+            check.configure(self._configs.get(check.section, {}))
+            check.reset(now)
+            checks.append(check)
+        return FaceLiveness(checks, self._generation, now)
+
+    def face(self, track_id: int, now: float) -> FaceLiveness:
+        face = self._faces.get(track_id)
+        if face is None or face.generation != self._generation:
+            face = self._faces[track_id] = self._new_face(now)
+        return face
+
+    def check(
+        self,
+        track_id: int,
+        mesh_landmarks: np.ndarray,
+        now: float,
+        mesh_xyz: np.ndarray | None = None,
+    ):
+        """
+        Run this face's undecided checks on one frame, returns its FaceLiveness.
+        `mesh_xyz` is the face's mesh_xyz, needed when a check uses depth
+        """
+        face = self.face(track_id, now)
+        if face.spoof:
+            return face
+
+        was_live = face.live
+        decided_by = None
+        remaining = [
+            c for c in face.checks if face.verdicts[c.name] != LIVE or c.time_bounded
+        ]
+        for index, check in enumerate(remaining):
+            start = time.perf_counter()
+            verdict = check.update(
+                mesh_xyz if check.uses_depth else mesh_landmarks, now
+            )
+            self._record(check.name, time.perf_counter() - start)
+            face.verdicts[check.name] = verdict
+            if verdict != PENDING:
+                decided_by = check.name
+            if (
+                verdict == SPOOF
+                or (self.mode == "any" and verdict == LIVE)
+                or (self.mode == "all" and verdict == PENDING)
+            ):
+                for skipped in remaining[index + 1 :]:
+                    self._entry(skipped.name)["skipped"] += 1
+                break
+
+        verdicts = face.verdicts.values()
+        face.spoof = SPOOF in verdicts
+        face.live = not face.spoof and (
+            all(v == LIVE for v in verdicts)
+            if self.mode == "all"
+            else any(v == LIVE for v in verdicts)
+        )
+        if was_live and not face.live and not face.spoof:
+            # the next verdict is timed from when this one lapsed
+            face.started = now
+            print(
+                f"LivenessManager - track {track_id} liveness expired, {self._evidence(face)}"
+            )
+        elif face.spoof or (face.live and not was_live):
+            self._decided(track_id, face, decided_by, now)
+        return face
+
+    def _decided(self, track_id: int, face: FaceLiveness, check: str, now: float):
+        verdict = SPOOF if face.spoof else LIVE
+        seconds = max(now - face.started, 0.0)
+        DECISION_SECONDS.labels(verdict, check).observe(seconds)
+        evidence = self._evidence(face)
+        self._decisions.append(
+            {
+                "track": track_id,
+                "verdict": verdict,
+                "check": check,
+                "after_ms": round(seconds * 1000, 1),
+                "evidence": evidence,
+            }
+        )
+        print(
+            f"LivenessManager - track {track_id} {verdict} by {check} after"
+            f" {seconds * 1000:.0f} ms, {evidence}"
+        )
+
+    @staticmethod
+    def _evidence(face: FaceLiveness) -> dict[str, dict[str, float]]:
+        return {c.name: c.evidence() for c in face.checks}
+
+    def _entry(self, name: str) -> dict[str, float]:
+        if name not in self._stats:
+            self._timings[name] = CHECK_SECONDS.labels(name)
+            self._stats[name] = {"runs": 0, "skipped": 0, "seconds": 0.0}
+        return self._stats[name]
+
+    def _record(self, name: str, seconds: float):
+        stats = self._entry(name)
+        self._timings[name].observe(seconds)
+        stats["runs"] += 1
+        stats["seconds"] += seconds
+
+    def reset(self, track_id: int, now: float) -> FaceLiveness:
+        face = self.face(track_id, now)
+        face.reset(now)
+        return face
+
+    def retain(self, track_ids: set[int]):
+        """Forget the faces whose tracks expired"""
+        for track_id in self._faces.keys() - track_ids:
+            del self._faces[track_id]
+
+    def clear(self):
+        self._faces = {}
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "checks": self._ordered(self.checks),
+            "faces": len(self._faces),
+            "cost": {
+                name: {
+                    "runs": stats["runs"],
+                    "skipped": stats["skipped"],
+                    "avg_ms": (
+                        round(stats["seconds"] / stats["runs"] * 1000, 4)
+                        if stats["runs"]
+                        else 0.0
+                    ),
+                }
+                for name, stats in self._stats.items()
+            },
+            "decisions": list(self._decisions),
+        }
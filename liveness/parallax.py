@@ -0,0 +1,124 @@
+from collections import deque
+from typing import Any
+
+import cv2
+import numpy as np
+
+from liveness.check import LIVE, PENDING, LivenessCheck
+
+# FaceMesh points that move with the skull: nose ridge and wings, forehead, eye corners
+# and cheeks. Lips, jaw, eyelids and brows move on their own, and points on the face's
+# outline slide along it as the head turns, so those are left out
+_RIGID = np.array(
+    [
+        *(1, 4, 5, 195, 197, 6, 168, 98, 327, 129, 358),  # nose
+        *(10, 151, 9, 108, 337, 67, 297, 109, 338),  # forehead
+        *(33, 133, 362, 263),  # eye corners
+        *(116, 345, 50, 280, 123, 352, 36, 266, 205, 425),  # cheeks
+    ]
+)
+
+
+class Parallax(LivenessCheck):
+    """
+    Passive liveness from the head's own small movements, no blink needed. A photo or a
+    screen is flat, so however it is held or moved its landmarks follow a homography
+    between two frames. A head isn't: when it turns slightly the nose shifts against the
+    cheeks and forehead. Each frame is compared with the oldest one in the last
+    `window_ms`. A homography takes out everything a flat picture could do, and what is
+    left over must look like FaceMesh's own depth of each point times a single shift,
+    which is the head turning. The check passes after `hits_to_verify` frames in the
+    window show at least `min_parallax` radians of turn, with the depth explaining at
+    least `min_depth_fit` of the leftover motion. A face standing perfectly still stays
+    pending, and blinks still verify it
+    """
+
+    name = "parallax"
+    section = "parallax_config"
+    cost = 300.0
+    uses_depth = True
+    # live only while the last window_ms showed enough turn
+    time_bounded = True
+
+    def __init__(self):
+        # overwritten by config immediately
+        self.window_ms = 600.0  # frames are compared with the oldest this recent
+        self.min_parallax = 0.03  # radians of head turn the depth has to show
+        self.min_depth_fit = 0.6  # share of the non planar motion depth explains
+        self.hits_to_verify = 2  # frames in the window that have to show it
+        self.live = False
+
+        # the latest comparison, and the largest turn any well fitting one showed
+        self.parallax = 0.0
+        self.depth_fit = 0.0
+        self.peak_parallax = 0.0
+        self._frames: deque[tuple[float, np.ndarray]] = deque()
+        self._hits: deque[float] = deque()
+
+    @staticmethod
+    def measure(reference: np.ndarray, current: np.ndarray) -> tuple[float, float]:
+        """
+        (parallax, depth fit) between two (K, 3) sets of the same landmarks. Parallax
+        is the turn in radians that each point's depth off the face's plane explains,
+        depth fit the share of the non planar motion it explains
+        """
+        homography, _ = cv2.findHomography(reference[:, :2], current[:, :2], 0)
+        if homography is None:
+            return 0.0, 0.0
+        planar = cv2.perspectiveTransform(reference[None, :, :2], homography)[0]
+        residual = current[:, :2] - planar
+
+        # depth off the best plane through the points, a flat picture has none
+        design = np.column_stack((reference[:, :2], np.ones(len(reference))))
+        plane, *_ = np.linalg.lstsq(design, reference[:, 2], rcond=None)
+        depth = reference[:, 2] - design @ plane
+
+        # small turns move each point by its depth times the turn, in any direction
+        spread = depth @ depth
+        total = float((residual**2).sum())
+        if spread <= 0 or total <= 0:
+            return 0.0, 0.0
+        shift = depth @ residual / spread
+        unexplained = float(((residual - np.outer(depth, shift)) ** 2).sum())
+        return float(np.hypot(*shift)), 1.0 - unexplained / total
+
+    def update(self, mesh_landmarks: np.ndarray, now: float) -> str:
+        current = mesh_landmarks[_RIGID].astype(np.float32)
+        frames = self._frames
+        while frames and (now - frames[0][0]) * 1000 > self.window_ms:
+            frames.popleft()
+        if frames:
+            self.parallax, self.depth_fit = self.measure(frames[0][1], current)
+            if self.depth_fit >= self.min_depth_fit:
+                self.peak_parallax = max(self.peak_parallax, self.parallax)
+                if self.parallax >= self.min_parallax:
+                    self._hits.append(now)
+        frames.append((now, current))
+
+        while self._hits and (now - self._hits[0]) * 1000 > self.window_ms:
+            self._hits.popleft()
+        self.live = len(self._hits) >= self.hits_to_verify
+        # a still face says nothing either way, it is pending rather than a spoof
+        return LIVE if self.live else PENDING
+
+    def reset(self, now: float | None = None):
+        self.live = False
+        self.parallax = 0.0
+        self.depth_fit = 0.0
+        self.peak_parallax = 0.0
+        self._frames.clear()
+        self._hits.clear()
+
+    def configure(self, config: dict[str, Any]):
+        self.window_ms = config.get("window_ms", 600.0)
+        self.min_parallax = config.get("min_parallax", 0.03)
+        self.min_depth_fit = config.get("min_depth_fit", 0.6)
+        self.hits_to_verify = config.get("hits_to_verify", 2)
+
+    def evidence(self) -> dict[str, float]:
+        return {
+            "parallax": round(self.parallax, 4),
+            "depth_fit": round(self.depth_fit, 3),
+            "peak_parallax": round(self.peak_parallax, 4),
+            "hits": len(self._hits),
+        }
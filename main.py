@@ -1,5 +1,6 @@
 from __future__ import annotations
 from contextlib import asynccontextmanager
+import asyncio
 
 import uvicorn
 from fastapi import FastAPI
@@ -7,9 +8,14 @@ from fastapi.middleware.cors import CORSMiddleware
 import os
 
 from api.config import router as config_router
+from api.metrics import router as metrics_router
+from api.models import router as models_router
 from api.users import router as users_router
 from api.video import router as video_router
 from runtime_services.state import State
+from config import config_manager
+from database.data_operations import db
+from face_recognition.model_registry import model_for_config
 from hardware_integration.arduino_handler import Arduino
 from hardware_integration.mock_arduino_handler import MockArduino
 
@@ -20,6 +26,13 @@ load_dotenv()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     use_arduino = os.getenv("USE_ARDUINO")
+
+    # load the shared models up front so the first visitor or upload doesn't pay for it
+    await asyncio.to_thread(
+        model_for_config,
+        config_manager.get_section("face_recognition"),
+        db.active_model,
+    )
     
     # if use_arduino if yes then we have to fail fast if we cannot find it
     if use_arduino == "YES":
@@ -28,11 +41,8 @@ async def lifespan(app: FastAPI):
             app.state.runtime = runtime
             try:
                 yield
-            finally: # release the video and wait for it to shut down
-                video_task = runtime._video_task
-                if video_task and not video_task.done():
-                    runtime._stop_signal.set()
-                    await video_task
+            finally: # release every camera and wait for them to shut down
+                await runtime.stop_video()
     
     # otherwise use the mock, this is only used for testing when i don't have my setup
     else:
@@ -42,10 +52,7 @@ async def lifespan(app: FastAPI):
             try:
                 yield
             finally:
-                video_task = runtime._video_task
-                if video_task and not video_task.done():
-                    runtime._stop_signal.set()
-                    await video_task
+                await runtime.stop_video()
 
 
 app = FastAPI(title="Face Recognition Service", lifespan=lifespan)
@@ -69,6 +76,8 @@ app.add_middleware(
 app.include_router(users_router, prefix="/users")
 app.include_router(config_router, prefix="/config")
 app.include_router(video_router, prefix="/video")
+app.include_router(models_router, prefix="/models")
+app.include_router(metrics_router, prefix="/metrics")
 
 
 @app.get("/")
@@ -1,11 +1,18 @@
 from typing import Any
 import time
 
+from utils import metrics
 from utils.enums import AccessLevel
 from notifications.notification_util import build_message
 from notifications.email import EmailService
 from notifications.sms import SMSService
 
+SENT = metrics.counter(
+    "lock_override_notifications_total",
+    "Notifications sent, by service and delivery status.",
+    ("service", "status"),
+)
+
 
 class NotificationManager:
     def __init__(self):
@@ -20,7 +27,8 @@ class NotificationManager:
         if not message:
             message = build_message(name, access_level)
         for service in self.enabled_services:
-            self.noti_objects[service].send(message)
+            status = self.noti_objects[service].send(message)
+            SENT.labels(service, getattr(status, "value", status)).inc()
 
     def update_config(self, config: dict[str, Any]):
         enabled_set = set(config["enabled_services"])
@@ -0,0 +1,198 @@
+import asyncio
+import itertools
+import threading
+import time
+from typing import Any, AsyncIterator
+
+import numpy as np
+
+from utils import metrics
+
+# (JPEG quality, scale), viewers asking for the same one share its encoding
+Variant = tuple[int, float]
+DEFAULT_VARIANT: Variant = (95, 1.0)
+
+SEND_SECONDS = metrics.histogram(
+    "lock_override_mjpeg_send_seconds",
+    "Time to hand one MJPEG chunk to a viewer's connection.",
+    ("camera",),
+)
+SENT = metrics.counter(
+    "lock_override_mjpeg_frames_sent_total", "MJPEG chunks sent.", ("camera",)
+)
+DROPPED = metrics.counter(
+    "lock_override_mjpeg_frames_dropped_total",
+    "Frames a viewer skipped because its previous send was still in flight.",
+    ("camera",),
+)
+
+
+class _Subscriber:
+    __slots__ = (
+        "label",
+        "variant",
+        "max_fps",
+        "since",
+        "sent",
+        "dropped",
+        "throttled",
+        "seq",
+    )
+
+    def __init__(self, label: str, variant: Variant, max_fps: float | None, seq: int):
+        self.label = label
+        self.variant = variant
+        self.max_fps = max_fps
+        self.since = time.time()
+        self.sent = 0
+        self.dropped = 0  # frames published while this client was still sending
+        self.throttled = 0  # frames skipped to stay under max_fps
+        self.seq = seq
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "client": self.label,
+            "quality": self.variant[0],
+            "scale": self.variant[1],
+            "max_fps": self.max_fps,
+            "connected_s": round(time.time() - self.since, 1),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "throttled": self.throttled,
+        }
+
+
+class FrameBroadcaster:
+    """
+    Builds each multipart MJPEG chunk once per variant and fans it out to every viewer.
+    Viewers wait on an event that is swapped for every frame instead of polling, and a
+    slow viewer jumps to the newest frame rather than working through a backlog
+    """
+
+    def __init__(self, name: str = ""):
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._changed = asyncio.Event()
+        self._frames: dict[Variant, tuple[int, bytes]] = {}  # variant -> (seq, chunk)
+        self._seq = 0
+        self._closed = True
+        self._subscribers: dict[int, _Subscriber] = {}
+        self._ids = itertools.count()
+        # read by the render thread, so kept apart from the loop-only subscriber dict
+        self._variants: dict[Variant, int] = {}
+        self._variants_lock = threading.Lock()
+        self._send_seconds = SEND_SECONDS.labels(name)
+        self._sent = SENT.labels(name)
+        self._dropped = DROPPED.labels(name)
+
+    def open(self):
+        """Start accepting frames, called on the event loop viewers run on"""
+        self._loop = asyncio.get_running_loop()
+        self._frames = {}
+        self._closed = False
+
+    def close(self):
+        """Ends every stream, called on the event loop"""
+        self._closed = True
+        self._frames = {}
+        self._wake()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def variants(self) -> list[Variant]:
+        """Encodings somebody is watching, empty means nothing needs rendering"""
+        with self._variants_lock:
+            return list(self._variants)
+
+    def publish(self, jpegs: dict[Variant, np.ndarray]):
+        """Called from the render thread, the only copy of each frame happens here"""
+        chunks = {
+            variant: b"--frame\r\nContent-Type: image/jpeg\r\n\r\n"
+            + jpeg.tobytes()
+            + b"\r\n"
+            for variant, jpeg in jpegs.items()
+        }
+        if self._loop is not None and not self._closed:
+            self._loop.call_soon_threadsafe(self._set_frames, chunks)
+
+    def _set_frames(self, chunks: dict[Variant, bytes]):
+        if self._closed:
+            return
+        self._seq += 1
+        for variant, chunk in chunks.items():
+            self._frames[variant] = (self._seq, chunk)
+        self._wake()
+
+    def _wake(self):
+        # waiters hold the old event, the next frame gets a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def _add(self, subscriber: _Subscriber) -> int:
+        subscriber_id = next(self._ids)
+        self._subscribers[subscriber_id] = subscriber
+        with self._variants_lock:
+            self._variants[subscriber.variant] = (
+                self._variants.get(subscriber.variant, 0) + 1
+            )
+        return subscriber_id
+
+    def _remove(self, subscriber_id: int):
+        subscriber = self._subscribers.pop(subscriber_id)
+        with self._variants_lock:
+            self._variants[subscriber.variant] -= 1
+            if not self._variants[subscriber.variant]:
+                del self._variants[subscriber.variant]
+
+    async def stream(
+        self,
+        label: str,
+        variant: Variant = DEFAULT_VARIANT,
+        max_fps: float | None = None,
+    ) -> AsyncIterator[bytes]:
+        """Multipart chunks for one viewer, ends once the broadcaster is closed"""
+        # a new viewer gets the current frame of its variant if there is one
+        seq = self._frames[variant][0] - 1 if variant in self._frames else self._seq
+        subscriber = _Subscriber(label, variant, max_fps, seq)
+        subscriber_id = self._add(subscriber)
+        last_sent = 0.0
+        try:
+            while not self._closed:
+                frame_seq, chunk = self._frames.get(variant, (subscriber.seq, b""))
+                if frame_seq == subscriber.seq:
+                    await self._changed.wait()
+                    continue
+                if max_fps:
+                    wait = last_sent + 1 / max_fps - time.monotonic()
+                    if wait > 0:
+                        # frames published during the pause are skipped on purpose
+                        await asyncio.sleep(wait)
+                        subscriber.dropped += frame_seq - subscriber.seq - 1
+                        self._dropped.inc(frame_seq - subscriber.seq - 1)
+                        latest_seq = self._frames.get(variant, (frame_seq,))[0]
+                        subscriber.throttled += latest_seq - frame_seq
+                        subscriber.seq = latest_seq - 1
+                        continue
+                # everything published while the last send was in flight is skipped
+                subscriber.dropped += frame_seq - subscriber.seq - 1
+                self._dropped.inc(frame_seq - subscriber.seq - 1)
+                subscriber.seq = frame_seq
+                subscriber.sent += 1
+                last_sent = time.monotonic()
+                start = time.perf_counter()
+                yield chunk
+                # resumed once the response wrote the chunk out
+                self._send_seconds.observe(time.perf_counter() - start)
+                self._sent.inc()
+        finally:
+            self._remove(subscriber_id)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "open": not self._closed,
+            "frames": self._seq,
+            "subscribers": self.subscribers,
+            "variants": len(self._variants),
+            "clients": [s.stats() for s in self._subscribers.values()],
+        }
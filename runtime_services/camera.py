@@ -0,0 +1,334 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import time
+from typing import TYPE_CHECKING, Any
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from config import config_manager
+from face_recognition import Overlay
+from face_recognition.alignment import mesh_bbox, mesh_keypoints, mesh_xyz
+from face_recognition.tracker import FaceTracker
+from liveness import LivenessManager
+from runtime_services.broadcaster import FrameBroadcaster, Variant
+from runtime_services.frame_source import FrameSource, open_frame_source
+from runtime_services.motion import MotionGate
+from runtime_services.pipeline import Pipeline
+from utils import metrics
+from utils.enums import AccessLevel
+
+if TYPE_CHECKING:
+    from runtime_services.state import State
+
+STAGE_SECONDS = metrics.histogram(
+    "lock_override_frame_stage_seconds",
+    "Time one frame spends in each video stage.",
+    ("camera", "stage"),
+)
+FRAMES = metrics.counter(
+    "lock_override_frames_total",
+    "Frames read from the source, decoded or only grabbed.",
+    ("camera",),
+)
+# FaceMesh faces per frame unless the camera's config says otherwise
+MAX_FACES = 4
+FRAMES_PROCESSED = metrics.counter(
+    "lock_override_frames_processed_total",
+    "Frames that made it past the motion gate.",
+    ("camera",),
+)
+
+
+class Camera:
+    """
+    One named video source. Tracking, liveness, overlay and the lock it opens are its
+    own, recognition and the gallery are shared with every other camera through State.
+    Every tracked face keeps its own liveness checks, and all faces needing recognition
+    in a frame go to the recognizer together
+    """
+
+    def __init__(self, name: str, config: dict[str, Any], runtime: State):
+        self.name = name
+        self.config = config
+        self.runtime = runtime
+        self.tracker = FaceTracker()
+        # each track's liveness checks, dropped with its track
+        self.liveness = LivenessManager()
+        self.overlay = Overlay()
+
+        self._video_task: asyncio.Task | None = None
+        self._stop_signal = asyncio.Event()
+        # every viewer of this camera shares one encoded frame
+        self.broadcaster = FrameBroadcaster(name)
+        # idles the pipeline while nothing moves in front of the camera
+        self.gate = MotionGate()
+        self._pipeline: Pipeline | None = None
+        self._recognition_results: queue.SimpleQueue = queue.SimpleQueue()
+        self._recognition_inflight: set[int] = set()
+        # series looked up once, recording a stage is then one observe call
+        self._timings = {
+            stage: STAGE_SECONDS.labels(name, stage)
+            for stage in ("capture", "mesh", "track", "render", "encode")
+        }
+        self._frames = FRAMES.labels(name)
+        self._frames_processed = FRAMES_PROCESSED.labels(name)
+
+        self._listeners = [
+            ("face_recognition", self.tracker.update_config),
+            *self.liveness.listeners(),
+            ("overlay", self.overlay.update_config),
+        ]
+        for section, listener in self._listeners:
+            config_manager.register_listener(section, listener)
+
+    @property
+    def lock(self) -> str | None:
+        return self.config.get("lock")
+
+    def close(self):
+        """Stop following config changes, the camera is gone from the config"""
+        for section, listener in self._listeners:
+            config_manager.unregister_listener(section, listener)
+
+    def is_running(self) -> bool:
+        return self._video_task is not None
+
+    async def start(self) -> str:
+        if self._video_task and not self._video_task.done():
+            return "Video already running"
+
+        self._stop_signal.clear()
+        self._video_task = asyncio.create_task(self._run())
+        return "Started Video"
+
+    async def stop(self) -> str:
+        if not self._video_task or self._video_task.done():
+            return "Video not running"
+        self._stop_signal.set()
+        await self._video_task
+        self._video_task = None
+        return "Stopped Video"
+
+    def pipeline_stats(self) -> dict:
+        stats = (
+            {"running": False, "stages": {}, "queues": {}}
+            if self._pipeline is None
+            else self._pipeline.stats()
+        )
+        stats["gate"] = self.gate.stats()
+        stats["liveness"] = self.liveness.stats()
+        return stats
+
+    def deliver_recognition(self, track_ids: list[int], results: list):
+        """Called from the recognition thread, applied on our landmark thread"""
+        self._recognition_results.put((track_ids, results))
+
+    def face_mesh(self):
+        return mp.solutions.face_mesh.FaceMesh(
+            max_num_faces=self.config.get("max_faces", MAX_FACES),
+            refine_landmarks=True,
+            min_detection_confidence=0.7,
+            min_tracking_confidence=0.7,
+        )
+
+    def capture(self, source: FrameSource) -> tuple[np.ndarray, float] | None:
+        """
+        Capture stage: the next frame worth processing and its timestamp, None while
+        the motion gate skips frames or once the source has ended
+        """
+        start = time.perf_counter()
+        item = None
+        if not self.gate.sample_due(source.clock()):
+            # watching between samples, keep the device buffer fresh without decoding
+            if source.grab() is not None:
+                self._frames.inc()
+        elif (read := source.read()) is not None:
+            self._frames.inc()
+            frame, now = read
+            active = self.gate.observe(frame, bool(self.tracker.tracks), now)
+            # viewers still see the doorway at the watch rate while it's idle
+            if active or self.broadcaster.subscribers:
+                item = read
+                self._frames_processed.inc()
+        self._timings["capture"].observe(time.perf_counter() - start)
+        return item
+
+    def landmarks(self, face_mesh, item: tuple[np.ndarray, float]):
+        frame, now = item
+        start = time.perf_counter()
+        results = face_mesh.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        tracked = time.perf_counter()
+        rendered = self._process_frame(frame, results, now)
+        self._timings["mesh"].observe(tracked - start)
+        self._timings["track"].observe(time.perf_counter() - tracked)
+        return rendered
+
+    def _process_frame(self, frame, results, now: float):
+        """
+        Landmark stage: tracking, liveness, notifications and the door. It is the only
+        thread touching the tracker, so recognition results are applied here too
+        """
+        self._apply_recognition_results()
+        draws = []
+        if results.multi_face_landmarks:
+            img_height, img_width, _ = frame.shape
+            faces = []
+            for landmarks in results.multi_face_landmarks:
+                # converted once, bbox, EAR, alignment points and depth are slices of it
+                xyz = mesh_xyz(landmarks, img_width, img_height)
+                points = xyz[:, :2].astype(np.int32)
+                bbox = mesh_bbox(points, img_width, img_height)
+                # alignment keeps the subpixel coordinates, the rest uses whole pixels
+                faces.append((xyz, points, bbox, mesh_keypoints(xyz[:, :2])))
+
+            tracks = self.tracker.update(
+                [(bbox, keypoints) for _, _, bbox, keypoints in faces]
+            )
+            pending = []
+            for (xyz, points, bbox, keypoints), track in zip(faces, tracks):
+                # a recognized track reuses its identity until it needs re-verifying,
+                # recognition runs on the shared stage and lands on a later frame
+                if (
+                    track.id not in self._recognition_inflight
+                    and self.tracker.needs_recognition(track)
+                ):
+                    pending.append((track.id, keypoints))
+                name, access, verified = track.name, track.access, track.verified
+
+                if name == "Unknown":
+                    liveness = self.liveness.reset(track.id, now)
+                else:
+                    liveness = self.liveness.check(track.id, points, now, xyz)
+
+                draws.append((verified, liveness.live, name, liveness.blinks, bbox))
+
+                # TODO: these single services should not be doing checks, move that here
+                self.runtime.notification_manager.check_and_send(
+                    verified,
+                    liveness.live,
+                    name,
+                    access_level=access,
+                )
+
+                if (
+                    self.lock is not None
+                    and verified
+                    and liveness.live
+                    and (access == AccessLevel.ADMIN or access == AccessLevel.FAMILY)
+                ):
+                    self.runtime.request_unlock(self.lock, track.created)
+
+            if pending:
+                # every face in the frame in one request, one detector and embed pass
+                track_ids = [track_id for track_id, _ in pending]
+                self._recognition_inflight.update(track_ids)
+                dropped = self.runtime.submit_recognition(
+                    self, track_ids, frame, [keypoints for _, keypoints in pending]
+                )
+                if dropped is not None:
+                    # a request pushed out never runs, let its tracks ask again
+                    self._recognition_inflight.difference_update(dropped)
+
+        else:  # no face landmarks recognized
+            self.tracker.update([])
+
+        # a face keeps its liveness through short dropouts, until its track expires
+        self.liveness.retain({track.id for track in self.tracker.tracks})
+        return frame, draws
+
+    def _apply_recognition_results(self):
+        tracks = {track.id: track for track in self.tracker.tracks}
+        while True:
+            try:
+                track_ids, results = self._recognition_results.get_nowait()
+            except queue.Empty:
+                return
+            for track_id, (name, score, access) in zip(track_ids, results):
+                self._recognition_inflight.discard(track_id)
+                # the face may have left while it was being recognized
+                if track_id in tracks:
+                    self.tracker.record(tracks[track_id], name, score, access)
+
+    def _render(self, item):
+        variants = self.broadcaster.variants()
+        if not variants:  # the last viewer left while this frame was queued
+            return
+        self.broadcaster.publish(self.encode(item, variants))
+
+    def encode(self, item, variants: list[Variant]) -> dict[Variant, np.ndarray]:
+        """Render stage: overlay drawn on a copy, then one JPEG per variant"""
+        frame, draws = item
+        start = time.perf_counter()
+        # recognition may still be cropping the original frame
+        frame = frame.copy()
+        for verified, live, name, blinks, (x1, y1, x2, y2) in draws:
+            self.overlay.draw(verified, live, name, blinks, frame, x1, x2, y1, y2)
+        encoding = time.perf_counter()
+
+        # one encode per distinct quality and scale, however many viewers share it
+        jpegs = {}
+        for quality, scale in variants:
+            image = frame
+            if scale != 1:
+                image = cv2.resize(
+                    frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+                )
+            ok, jpeg = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok:
+                jpegs[(quality, scale)] = jpeg
+        self._timings["render"].observe(encoding - start)
+        self._timings["encode"].observe(time.perf_counter() - encoding)
+        return jpegs
+
+    async def _run(self):
+        face_mesh = self.face_mesh()
+        source = await asyncio.to_thread(open_frame_source, self.config)
+        print(f"Camera {self.name} - {source.describe()}")
+
+        # capture, landmarks and render are ours, recognition is shared by all cameras
+        await self.runtime.recognition_started()
+        pipeline = Pipeline()
+        frames = pipeline.queue("frames")
+        render = pipeline.queue("render")
+        self._recognition_results = queue.SimpleQueue()
+        self._recognition_inflight = set()
+        self.liveness.clear()
+        self.gate.reset(source.clock())
+
+        def capture(_):
+            item = self.capture(source)
+            if source.ended:
+                print(f"Camera {self.name} - Failed to read frame")
+                pipeline.stop()
+            return item
+
+        def landmarks(item):
+            rendered = self.landmarks(face_mesh, item)
+            # nobody watching, the render stage and its encode are skipped entirely
+            return rendered if self.broadcaster.subscribers else None
+
+        pipeline.stage("capture", capture, sink=frames)
+        pipeline.stage("landmarks", landmarks, source=frames, sink=render)
+        pipeline.stage("render", self._render, source=render)
+        self._pipeline = pipeline
+        self.broadcaster.open()
+        pipeline.start()
+
+        try:
+            while not self._stop_signal.is_set() and source.is_opened():
+                if not pipeline.running() or not self.runtime.recognition_running():
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            pipeline.stop()
+            await asyncio.to_thread(pipeline.join)
+            await self.runtime.recognition_stopped(self)
+            source.close()
+            face_mesh.close()
+            self._stop_signal.set()
+            self._video_task = None
+            self.broadcaster.close()
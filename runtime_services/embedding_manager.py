@@ -1,43 +1,307 @@
 import io
+import threading
+from typing import Any
 import numpy as np
 
+from runtime_services.gallery_index import (
+    BruteForceIndex,
+    GalleryIndex,
+    IndexView,
+    IVFIndex,
+    create_index,
+    top_k,
+)
+from runtime_services.quantization import STORAGE_DTYPES, QuantizedMatrix, quantize
+from runtime_services.templates import TemplateStore, TemplateView
 from utils.enums import AccessLevel
 
 
+class GallerySnapshot:
+    """Read-only view of the gallery handed to the video thread.
+    Rows of `matrix` line up with `ids`, a new snapshot is published on every change"""
+
+    __slots__ = ("ids", "matrix", "users", "index", "model", "templates", "prefilter")
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        matrix: QuantizedMatrix,
+        users: dict[int, tuple[str, AccessLevel]],
+        index: IndexView,
+        model: str,
+        templates: TemplateView | None = None,
+        prefilter: int = 0,
+    ):
+        ids.flags.writeable = False
+        self.ids = ids
+        self.matrix = matrix
+        self.users = users
+        self.index = index
+        self.model = model  # embeddings are only comparable with this model's output
+        # multi-template mode scores each user by their best matching image
+        self.templates = templates
+        self.prefilter = prefilter
+
+    def __len__(self) -> int:
+        return self.ids.shape[0]
+
+    def search(self, queries: np.ndarray, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Top-k gallery rows and cosine scores for each normalized query"""
+        # a float64 query would silently upcast the whole gallery on every call
+        queries = np.asarray(queries, dtype=np.float32)
+        if self.templates is None:
+            return self.index.search(queries, self.matrix, k)
+        if not self.prefilter:
+            return top_k(self.templates.max_scores_all(queries), k)
+
+        # centroids shortlist the users cheaply, their individual images decide
+        rows, _ = self.index.search(queries, self.matrix, max(k, self.prefilter))
+        scores = self.templates.max_scores(queries, rows)
+        order = np.argsort(-scores, axis=1)[:, :k]
+        rows = np.take_along_axis(rows, order, axis=1)
+        scores = np.take_along_axis(scores, order, axis=1)
+        rows[scores == -np.inf] = -1
+        return rows, scores
+
+
 class EmebeddingManager:
-    def __init__(self, db):
+    def __init__(self, db, dim: int = 512):
         self._db = db
-        self.embeddings: dict[int, np.ndarray] = {}
+        self._dim = dim
+        self._lock = threading.Lock()
         self.users: dict[int, tuple[str, AccessLevel]] = {}
+
+        # contiguous (capacity, dim) store in the configured dtype, int8 rows carry a
+        # scale each. Only the first _size rows are valid
+        self._storage_dtype = "float32"
+        self._matrix = np.empty((16, dim), dtype=np.float32)
+        self._scales = np.ones(16, dtype=np.float32)
+        self._ids = np.empty(16, dtype=np.int64)
+        self._rows: dict[int, int] = {}  # user id -> row in _matrix
+        self._size = 0
+
+        # overwritten by config manager once State registers us
+        self._index_kind = "auto"
+        self._ivf_min_size = 20000
+        self._ivf_nprobe = 8
+        self._index: GalleryIndex = BruteForceIndex()
+        self._matching = "centroid"
+        self._prefilter = 16
+        self._templates: TemplateStore | None = None
+        # e.g. recognition worker processes keeping their own copy of the gallery
+        self._listeners: list = []
+
+        self.snapshot = GallerySnapshot(
+            np.empty(0, dtype=np.int64),
+            QuantizedMatrix(np.empty((0, dim), dtype=np.float32)),
+            {},
+            self._index.view(),
+            db.active_model,
+        )
         self._load()
 
     def _load(self):
-        for row in self._db.get_all_users():
-            # user always gets added
-            access = AccessLevel(row["access_level"])
-            self.users[row["id"]] = (row["name"], access)
-
-            # process embeddings separately
-            blob = row["embedding"]
-            if blob is None:
-                continue
-            try:
-                embedding = np.load(io.BytesIO(blob), allow_pickle=False)
-            except (ValueError, OSError):
-                # Skip corrupt or truncated blobs; they will be regenerated on next update.
-                continue
-            self.embeddings[row["id"]] = embedding
+        with self._lock:
+            # fresh buffers so published snapshots keep the previous rows intact
+            self._matrix = np.empty(
+                self._matrix.shape, dtype=STORAGE_DTYPES[self._storage_dtype]
+            )
+            self._scales = np.ones_like(self._scales)
+            self._ids = np.empty_like(self._ids)
+            self.users = {}
+            self._rows = {}
+            self._size = 0
+            self._model = self._db.active_model
+            templates = {}
+            self._templates = None
+            if self._matching == "multi_template":
+                templates = self._db.get_image_embeddings()
+                self._templates = TemplateStore(self._dim, self._storage_dtype)
+            for row in self._db.get_all_users():
+                # user always gets added
+                access = AccessLevel(row["access_level"])
+                self.users[row["id"]] = (row["name"], access)
 
-    # listener callback to update embeddings on database changes
-    def on_embedding_update(self, user_id: int, embedding: np.ndarray | None):
-        if embedding is not None:
-            self.embeddings[user_id] = embedding
+                # process embeddings separately
+                blob = row["embedding"]
+                if blob is None:
+                    continue
+                try:
+                    embedding = np.load(io.BytesIO(blob), allow_pickle=False)
+                except (ValueError, OSError):
+                    # Skip corrupt or truncated blobs; they will be regenerated on next update.
+                    continue
+                self._upsert_row(row["id"], embedding, templates.get(row["id"]))
+            self._rebuild_index()
+            self._publish()
+
+    def _upsert_row(
+        self,
+        user_id: int,
+        embedding: np.ndarray,
+        templates: np.ndarray | None = None,
+    ):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        codes, scales = quantize(embedding, self._storage_dtype)
+        row = self._rows.get(user_id)
+        if row is None:
+            if self._size == self._matrix.shape[0]:
+                # grow geometrically so appends stay amortized O(dim)
+                capacity = self._matrix.shape[0] * 2
+                matrix = np.empty((capacity, self._dim), dtype=self._matrix.dtype)
+                matrix[: self._size] = self._matrix[: self._size]
+                row_scales = np.ones(capacity, dtype=np.float32)
+                row_scales[: self._size] = self._scales[: self._size]
+                ids = np.empty(capacity, dtype=np.int64)
+                ids[: self._size] = self._ids[: self._size]
+                self._matrix, self._scales, self._ids = matrix, row_scales, ids
+            row = self._size
+            self._size += 1
+            self._rows[user_id] = row
+            self._ids[row] = user_id
+            self._store_row(row, codes, scales)
+            self._index.add(row, embedding)
         else:
-            self.embeddings.pop(user_id, None)
+            self._store_row(row, codes, scales)
+            self._index.update(row, embedding)
+        if self._templates is not None:
+            # a user without stored images still matches on their centroid
+            self._templates.set(
+                row, embedding[None] if templates is None else templates
+            )
+
+    def _store_row(self, row: int, codes: np.ndarray, scales: np.ndarray | None):
+        # like the float rows, an in-place rewrite only ever mixes the same user's vectors
+        self._matrix[row] = codes[0]
+        if scales is not None:
+            self._scales[row] = scales[0]
+
+    def _delete_row(self, user_id: int):
+        row = self._rows.pop(user_id, None)
+        if row is None:
+            return
+        # swap the last row into the hole so the valid rows stay contiguous
+        last = self._size - 1
+        self._index.remove(row, last)
+        if self._templates is not None:
+            self._templates.remove(row, last)
+        # published snapshots must never see a row change owner. Both a move into the hole
+        # and the next append into the freed tail row would, so every delete moves to a
+        # fresh buffer
+        self._matrix = self._matrix.copy()
+        self._scales = self._scales.copy()
+        self._ids = self._ids.copy()
+        if row != last:
+            moved_id = int(self._ids[last])
+            self._matrix[row] = self._matrix[last]
+            self._scales[row] = self._scales[last]
+            self._ids[row] = moved_id
+            self._rows[moved_id] = row
+        self._size = last
+
+    def register_listener(self, listener):
+        """`listener` gets the same callbacks as we do, after we applied them"""
+        self._listeners.append(listener)
+
+    def _rebuild_index(self):
+        self._index = create_index(
+            self._index_kind, self._size, self._ivf_min_size, self._ivf_nprobe
+        )
+        self._index.build(self._view())
+
+    def _maybe_rebuild_index(self):
+        """Swap index type when auto crosses the size threshold, retrain IVF as the gallery doubles"""
+        is_ivf = isinstance(self._index, IVFIndex)
+        if self._index_kind == "auto" and is_ivf != (self._size >= self._ivf_min_size):
+            self._rebuild_index()
+        elif is_ivf and self._size > 2 * max(self._index.trained_size, 1):
+            self._rebuild_index()
+
+    def _view(self) -> QuantizedMatrix:
+        scales = self._scales[: self._size] if self._storage_dtype == "int8" else None
+        return QuantizedMatrix(self._matrix[: self._size], scales)
+
+    def _publish(self):
+        # Snapshots are views, not copies. Until the next delete, appends only write rows
+        # past every size published from this buffer, and an in-place overwrite only
+        # refreshes the same user's vector. A delete shrinks the size, so _delete_row
+        # switches to a fresh buffer first. A reader can never attribute a row to the
+        # wrong person.
+        self.snapshot = GallerySnapshot(
+            self._ids[: self._size],
+            self._view(),
+            dict(self.users),
+            self._index.view(),
+            self._model,
+            None if self._templates is None else self._templates.view(),
+            self._prefilter,
+        )
+
+    def update_config(self, config: dict[str, Any]):
+        storage_dtype = config.get("storage_dtype", "float32")
+        matching = config.get("matching", "centroid")
+        prefilter = config.get("template_prefilter", 16)
+        if prefilter != self._prefilter:
+            with self._lock:
+                self._prefilter = prefilter
+                self._publish()
+        if (storage_dtype, matching) != (self._storage_dtype, self._matching):
+            # requantize from the database, int8 codes can't be converted losslessly
+            self._storage_dtype, self._matching = storage_dtype, matching
+            self._load()
+            snapshot = self.snapshot
+            nbytes = snapshot.matrix.nbytes
+            if snapshot.templates is not None:
+                nbytes += snapshot.templates.matrix.nbytes
+            print(
+                f"EmbeddingManager storage - {storage_dtype} {matching}, "
+                f"{nbytes / 2**20:.1f} MiB for {self._size} users"
+            )
+
+        kind = config.get("index", "auto")
+        min_size = config.get("ivf_min_size", 20000)
+        nprobe = config.get("ivf_nprobe", 8)
+        if (kind, min_size, nprobe) == (
+            self._index_kind,
+            self._ivf_min_size,
+            self._ivf_nprobe,
+        ):
+            return
+        with self._lock:
+            self._index_kind, self._ivf_min_size, self._ivf_nprobe = (
+                kind,
+                min_size,
+                nprobe,
+            )
+            self._rebuild_index()
+            self._publish()
         print(
-            f"Updated embeddings for {user_id}. Total embeddings: {len(self.embeddings)}"
+            f"EmbeddingManager index - {type(self._index).__name__}, size {self._size}"
         )
 
+    def on_gallery_reload(self):
+        """The active model switched, every embedding changed at once"""
+        self._load()
+        print(f"Reloaded gallery for {self._model}. Total embeddings: {self._size}")
+        for listener in self._listeners:
+            listener.on_gallery_reload()
+
+    # listener callback to update embeddings on database changes
+    def on_embedding_update(self, user_id: int, embedding: np.ndarray | None):
+        templates = None
+        if self._matching == "multi_template" and embedding is not None:
+            templates = self._db.get_image_embeddings(user_id).get(user_id)
+        with self._lock:
+            if embedding is not None:
+                self._upsert_row(user_id, embedding, templates)
+            else:
+                self._delete_row(user_id)
+            self._maybe_rebuild_index()
+            self._publish()
+        print(f"Updated embeddings for {user_id}. Total embeddings: {self._size}")
+        for listener in self._listeners:
+            listener.on_embedding_update(user_id, embedding)
+
     def on_user_update(
         self,
         user_id: int,
@@ -46,19 +310,24 @@ class EmebeddingManager:
         new_user: tuple[str, AccessLevel] | None = None,
         delete_user: bool = False,
     ):
-        if delete_user:
-            self.users.pop(user_id, None)
-            self.embeddings.pop(user_id, None)
-        elif new_user:
-            self.users[user_id] = new_user
-        else:
-            old = self.users.get(user_id)
-            if old is None:
-                # Cache miss; fetch from DB to stay in sync
-                row = self._db.get_user(user_id)
-                if row is None:
-                    return
-                old = (row["name"], row["access_level"])
-            new_name = name if name is not None else old[0]
-            new_access = access if access is not None else old[1]
-            self.users[user_id] = (new_name, new_access)
+        with self._lock:
+            if delete_user:
+                self.users.pop(user_id, None)
+                self._delete_row(user_id)
+                self._maybe_rebuild_index()
+            elif new_user:
+                self.users[user_id] = new_user
+            else:
+                old = self.users.get(user_id)
+                if old is None:
+                    # Cache miss; fetch from DB to stay in sync
+                    row = self._db.get_user(user_id)
+                    if row is None:
+                        return
+                    old = (row["name"], AccessLevel(row["access_level"]))
+                new_name = name if name is not None else old[0]
+                new_access = access if access is not None else old[1]
+                self.users[user_id] = (new_name, new_access)
+            self._publish()
+        for listener in self._listeners:
+            listener.on_user_update(user_id, name, access, new_user, delete_user)
@@ -0,0 +1,343 @@
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+import cv2
+import numpy as np
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+
+class FrameSource(ABC):
+    """
+    Where a camera's frames come from. Every frame carries a timestamp in seconds, the
+    time it was captured for a live device and its offset into the recording otherwise.
+    Recorded sources replay at their recorded rate when `realtime`, or as fast as they
+    can be read
+    """
+
+    recorded = True
+
+    def __init__(self, realtime: bool = True):
+        self.realtime = realtime
+        self.frames = 0
+        self.ended = False
+        self._started: float | None = None
+
+    @abstractmethod
+    def _read(self) -> np.ndarray | None:
+        """Decode the next frame, None at the end of the source"""
+
+    def _skip(self) -> bool:
+        """Move past the next frame without decoding it if the source allows"""
+        return self._read() is not None
+
+    @abstractmethod
+    def _timestamp(self, index: int) -> float:
+        """Timestamp of the `index`th frame"""
+
+    @abstractmethod
+    def is_opened(self) -> bool: ...
+
+    @abstractmethod
+    def close(self): ...
+
+    def clock(self) -> float:
+        """Timestamp the next frame will carry"""
+        return self._timestamp(self.frames)
+
+    def read(self) -> tuple[np.ndarray, float] | None:
+        self.wait()
+        frame = self._read()
+        if frame is None:
+            self.ended = True
+            return None
+        timestamp = self._timestamp(self.frames)
+        self.frames += 1
+        return frame, timestamp
+
+    def grab(self) -> float | None:
+        """Skip a frame, returns its timestamp or None at the end of the source"""
+        self.wait()
+        if not self._skip():
+            self.ended = True
+            return None
+        timestamp = self._timestamp(self.frames)
+        self.frames += 1
+        return timestamp
+
+    def wait(self):
+        """In realtime, sleep until the next recorded frame is due"""
+        if not (self.recorded and self.realtime):
+            return
+        now = time.monotonic()
+        if self._started is None:
+            self._started = now - self._timestamp(self.frames)
+        delay = self._started + self._timestamp(self.frames) - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def describe(self) -> str:
+        return type(self).__name__
+
+
+class CameraSource(FrameSource):
+    """A live device or stream, paced by the device and stamped with time.monotonic"""
+
+    recorded = False
+
+    def __init__(self, device: int | str, width: int = 720, height: int = 720):
+        super().__init__(realtime=True)
+        self.device = device
+        self._cap = cv2.VideoCapture(device)
+        self._cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self._cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def _read(self) -> np.ndarray | None:
+        ret, frame = self._cap.read()
+        return frame if ret else None
+
+    def _skip(self) -> bool:
+        return self._cap.grab()
+
+    def _timestamp(self, index: int) -> float:
+        return time.monotonic()
+
+    def is_opened(self) -> bool:
+        return self._cap.isOpened()
+
+    def close(self):
+        self._cap.release()
+
+    def describe(self) -> str:
+        width = self._cap.get(cv2.CAP_PROP_FRAME_WIDTH)
+        height = self._cap.get(cv2.CAP_PROP_FRAME_HEIGHT)
+        return f"camera {self.device} {width:.0f}x{height:.0f}"
+
+
+class VideoFileSource(FrameSource):
+    """
+    A recorded clip. Timestamps come from the frame index and the clip's frame rate
+    rather than the container's clock, so every replay sees the same times
+    """
+
+    def __init__(
+        self,
+        path: str | Path,
+        fps: float | None = None,
+        loop: bool = False,
+        realtime: bool = True,
+    ):
+        super().__init__(realtime=realtime)
+        self.path = str(path)
+        self.loop = loop
+        self._cap = cv2.VideoCapture(self.path)
+        self.fps = fps or self._cap.get(cv2.CAP_PROP_FPS) or 15.0
+
+    def _next(self, decode: bool) -> np.ndarray | bool | None:
+        for _ in range(2):
+            if decode:
+                ret, frame = self._cap.read()
+            else:
+                ret, frame = self._cap.grab(), True
+            if ret:
+                return frame
+            if not self.loop:
+                return None
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return None
+
+    def _read(self) -> np.ndarray | None:
+        return self._next(decode=True)
+
+    def _skip(self) -> bool:
+        return self._next(decode=False) is not None
+
+    def _timestamp(self, index: int) -> float:
+        return index / self.fps
+
+    def is_opened(self) -> bool:
+        return self._cap.isOpened()
+
+    def close(self):
+        self._cap.release()
+
+    def describe(self) -> str:
+        return f"video {self.path} @ {self.fps:g} fps"
+
+
+class ImageDirectorySource(FrameSource):
+    """Every image in a directory in name order, played back at `fps`"""
+
+    def __init__(
+        self,
+        path: str | Path,
+        fps: float = 15.0,
+        loop: bool = False,
+        realtime: bool = True,
+    ):
+        super().__init__(realtime=realtime)
+        self.path = Path(path)
+        self.fps = fps
+        self.loop = loop
+        self.files = sorted(
+            p for p in self.path.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES
+        )
+        self._closed = False
+
+    def _file(self, index: int) -> Path | None:
+        if self.loop and self.files:
+            return self.files[index % len(self.files)]
+        return self.files[index] if index < len(self.files) else None
+
+    def _read(self) -> np.ndarray | None:
+        path = self._file(self.frames)
+        return None if path is None else cv2.imread(str(path))
+
+    def _skip(self) -> bool:
+        return self._file(self.frames) is not None
+
+    def _timestamp(self, index: int) -> float:
+        return index / self.fps
+
+    def is_opened(self) -> bool:
+        return not self._closed and bool(self.files)
+
+    def close(self):
+        self._closed = True
+
+    def describe(self) -> str:
+        return f"images {self.path} ({len(self.files)}) @ {self.fps:g} fps"
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames for exercising the pipeline without a camera. A fixed noisy
+    background with a subject that walks in, stands still and leaves every `period`
+    seconds. The subject is an image when one is given (a face photo makes FaceMesh and
+    recognition run too) or a plain ellipse otherwise. Frames depend only on the seed
+    and the frame index
+    """
+
+    def __init__(
+        self,
+        width: int = 720,
+        height: int = 720,
+        fps: float = 15.0,
+        frames: int | None = None,
+        image: str | Path | None = None,
+        period: float = 12.0,
+        seed: int = 0,
+        realtime: bool = True,
+    ):
+        super().__init__(realtime=realtime)
+        self.width, self.height = width, height
+        self.fps = fps
+        self.limit = frames
+        self.period = period
+        rng = np.random.default_rng(seed)
+        self._background = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+        self._background = cv2.GaussianBlur(self._background, (0, 0), 3)
+
+        size = min(width, height) // 2
+        sprite = cv2.imread(str(image)) if image else None
+        if sprite is None:
+            sprite = np.full((size, size * 3 // 4, 3), 60, dtype=np.uint8)
+            center = (sprite.shape[1] // 2, size // 2)
+            axes = (sprite.shape[1] // 2 - 4, size // 2 - 4)
+            cv2.ellipse(sprite, center, axes, 0, 0, 360, (140, 170, 210), -1)
+        scale = size / max(sprite.shape[:2])
+        self._sprite = cv2.resize(sprite, None, fx=scale, fy=scale)
+        self._closed = False
+
+    def _position(self, t: float) -> int | None:
+        """Left edge of the subject at time t, None while the frame is empty"""
+        phase = (t % self.period) / self.period
+        span = self.width + self._sprite.shape[1]
+        center = (self.width - self._sprite.shape[1]) // 2
+        if phase < 0.25:
+            return None
+        if phase < 0.4:  # walking in from the left
+            return int(-self._sprite.shape[1] + (phase - 0.25) / 0.15 * (span // 2))
+        if phase < 0.8:  # standing at the door, swaying a little
+            return center + int(4 * np.sin(2 * np.pi * phase * 8))
+        if phase < 0.95:  # leaving to the right
+            return int(center + (phase - 0.8) / 0.15 * (span // 2))
+        return None
+
+    def _read(self) -> np.ndarray | None:
+        if not self._skip():
+            return None
+        frame = self._background.copy()
+        left = self._position(self._timestamp(self.frames))
+        if left is None:
+            return frame
+        height, width = self._sprite.shape[:2]
+        top = (self.height - height) // 2
+        x1, x2 = max(left, 0), min(left + width, self.width)
+        if x1 < x2:
+            frame[top : top + height, x1:x2] = self._sprite[:, x1 - left : x2 - left]
+        return frame
+
+    def _skip(self) -> bool:
+        return not self._closed and (self.limit is None or self.frames < self.limit)
+
+    def _timestamp(self, index: int) -> float:
+        return index / self.fps
+
+    def is_opened(self) -> bool:
+        return not self._closed
+
+    def close(self):
+        self._closed = True
+
+    def describe(self) -> str:
+        return f"synthetic {self.width}x{self.height} @ {self.fps:g} fps"
+
+
+def open_frame_source(
+    config: dict[str, Any], realtime: bool | None = None
+) -> FrameSource:
+    """
+    Build the source a camera config describes. With kind "auto" an int is a device,
+    a directory holds images, an existing file is a clip, "synthetic" generates frames
+    and anything else is handed to OpenCV as a stream URL. `realtime` overrides the
+    config's pacing of recorded sources
+    """
+    if realtime is None:
+        realtime = config.get("realtime", True)
+    source = config.get("source", 0)
+    kind = config.get("kind", "auto")
+    width, height = config.get("width", 720), config.get("height", 720)
+    fps = config.get("fps")
+    loop = config.get("loop", False)
+
+    if kind == "auto":
+        path = Path(str(source))
+        if isinstance(source, int):
+            kind = "camera"
+        elif source == "synthetic":
+            kind = "synthetic"
+        elif path.is_dir():
+            kind = "images"
+        elif path.is_file():
+            kind = "video"
+        else:
+            kind = "camera"
+
+    match kind:
+        case "camera":
+            return CameraSource(source, width, height)
+        case "video":
+            return VideoFileSource(source, fps, loop, realtime)
+        case "images":
+            return ImageDirectorySource(source, fps or 15.0, loop, realtime)
+        case "synthetic":
+            # any other source names the image that plays the subject
+            image = None if source == "synthetic" else source
+            return SyntheticSource(
+                width, height, fps or 15.0, image=image, realtime=realtime
+            )
+        case _:
+            raise ValueError(f"Unknown frame source kind '{kind}'")
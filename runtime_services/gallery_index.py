@@ -0,0 +1,250 @@
+from abc import ABC, abstractmethod
+import math
+import numpy as np
+
+from runtime_services.quantization import QuantizedMatrix
+
+
+class IndexView(ABC):
+    """Immutable search structure published alongside a gallery snapshot"""
+
+    @abstractmethod
+    def search(
+        self, queries: np.ndarray, matrix: QuantizedMatrix, k: int = 1
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Return (rows, scores), both (Q, k), best first. Missing entries have row -1"""
+
+
+class GalleryIndex(ABC):
+    """
+    Mutable index owned by EmebeddingManager and only touched under its lock.
+    Indexes address gallery rows, and mirror the manager's append / swap-delete moves
+    """
+
+    @abstractmethod
+    def build(self, matrix: QuantizedMatrix):
+        pass
+
+    @abstractmethod
+    def add(self, row: int, embedding: np.ndarray):
+        pass
+
+    @abstractmethod
+    def update(self, row: int, embedding: np.ndarray):
+        pass
+
+    @abstractmethod
+    def remove(self, row: int, last: int):
+        """Drop `row`, the entry that lived at `last` now lives at `row`"""
+
+    @abstractmethod
+    def view(self) -> IndexView:
+        pass
+
+
+def top_k(scores: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    """Sorted top-k along the last axis, padded with -1 / -inf when there are fewer than k"""
+    n = scores.shape[1]
+    if n == 0:
+        q = scores.shape[0]
+        return np.full((q, k), -1, dtype=np.int64), np.full((q, k), -np.inf, np.float32)
+    kk = min(k, n)
+    if kk < n:
+        part = np.argpartition(-scores, kk - 1, axis=1)[:, :kk]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    order = np.argsort(-part_scores, axis=1)
+    rows = np.take_along_axis(part, order, axis=1)
+    top = np.take_along_axis(part_scores, order, axis=1)
+    if kk < k:
+        rows = np.pad(rows, ((0, 0), (0, k - kk)), constant_values=-1)
+        top = np.pad(top, ((0, 0), (0, k - kk)), constant_values=-np.inf)
+    return rows, top
+
+
+class _BruteForceView(IndexView):
+    def search(self, queries, matrix, k=1):
+        return top_k(matrix.dot(queries), k)
+
+
+class BruteForceIndex(GalleryIndex):
+    """Exact linear scan, a single matmul over the whole gallery"""
+
+    _VIEW = _BruteForceView()
+
+    def build(self, matrix):
+        pass
+
+    def add(self, row, embedding):
+        pass
+
+    def update(self, row, embedding):
+        pass
+
+    def remove(self, row, last):
+        pass
+
+    def view(self):
+        return self._VIEW
+
+
+class _IVFView(IndexView):
+    def __init__(
+        self, centroids: np.ndarray, lists: tuple[np.ndarray, ...], nprobe: int
+    ):
+        self.centroids = centroids
+        self.lists = lists
+        self.nprobe = nprobe
+
+    def search(self, queries, matrix, k=1):
+        nprobe = min(self.nprobe, self.centroids.shape[0])
+        probes = top_k(queries @ self.centroids.T, nprobe)[0]
+
+        rows_out = np.full((queries.shape[0], k), -1, dtype=np.int64)
+        scores_out = np.full((queries.shape[0], k), -np.inf, dtype=np.float32)
+        for q, query in enumerate(queries):
+            candidates = np.concatenate([self.lists[p] for p in probes[q]])
+            if candidates.size == 0:
+                continue
+            # candidates are scored exactly against the gallery rows they point to
+            scores = matrix.dot(query[None, :], candidates)
+            rows, top = top_k(scores, k)
+            valid = rows[0] >= 0
+            rows_out[q, valid] = candidates[rows[0, valid]]
+            scores_out[q] = top[0]
+        return rows_out, scores_out
+
+
+class IVFIndex(GalleryIndex):
+    """
+    Inverted file index with a spherical k-means coarse quantizer.
+    Search probes the `nprobe` nearest lists and exactly scores the rows they hold.
+    Lists are replaced rather than mutated so published views stay valid
+    """
+
+    def __init__(
+        self,
+        nlist: int | None = None,
+        nprobe: int = 8,
+        train_sample: int = 50_000,
+        iterations: int = 15,
+        seed: int = 0,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_sample = train_sample
+        self.iterations = iterations
+        self._rng = np.random.default_rng(seed)
+
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self._lists: list[np.ndarray] = []
+        self._assign = np.empty(0, dtype=np.int64)  # row -> list number
+        self.trained_size = 0
+
+    def _train(self, matrix: QuantizedMatrix):
+        n = len(matrix)
+        nlist = self.nlist or max(1, int(math.sqrt(n)))
+        nlist = min(nlist, n)
+        if n > self.train_sample:
+            sample = matrix.dequantize(
+                np.sort(self._rng.choice(n, self.train_sample, replace=False))
+            )
+        else:
+            sample = matrix.dequantize()
+        centroids = sample[
+            self._rng.choice(sample.shape[0], nlist, replace=False)
+        ].copy()
+
+        for _ in range(self.iterations):
+            assign = self._assign_rows(sample, centroids)
+            counts = np.bincount(assign, minlength=nlist)
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            sums[filled] = np.add.reduceat(sample[order], starts[filled], axis=0)
+            empty = ~filled
+            # reseed empty lists from random samples rather than letting them die
+            sums[empty] = sample[self._rng.choice(sample.shape[0], int(empty.sum()))]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = (sums / np.maximum(norms, 1e-12)).astype(np.float32)
+        return centroids
+
+    @staticmethod
+    def _assign_rows(
+        matrix: np.ndarray | QuantizedMatrix, centroids: np.ndarray, chunk: int = 16384
+    ) -> np.ndarray:
+        assign = np.empty(len(matrix), dtype=np.int64)
+        for start in range(0, len(matrix), chunk):
+            if isinstance(matrix, QuantizedMatrix):
+                block = matrix.dequantize(slice(start, start + chunk))
+            else:
+                block = matrix[start : start + chunk]
+            assign[start : start + chunk] = np.argmax(block @ centroids.T, axis=1)
+        return assign
+
+    def build(self, matrix):
+        n, dim = matrix.shape
+        if n == 0:
+            self.centroids = np.empty((0, dim), dtype=np.float32)
+            self._lists = []
+            self._assign = np.empty(0, dtype=np.int64)
+            self.trained_size = 0
+            return
+        self.centroids = self._train(matrix)
+        assign = self._assign_rows(matrix, self.centroids)
+        order = np.argsort(assign, kind="stable")
+        bounds = np.searchsorted(assign[order], np.arange(self.centroids.shape[0] + 1))
+        self._lists = [
+            order[bounds[i] : bounds[i + 1]] for i in range(self.centroids.shape[0])
+        ]
+        self._assign = assign
+        self.trained_size = n
+
+    def _nearest_list(self, embedding: np.ndarray) -> int:
+        return int(np.argmax(self.centroids @ embedding))
+
+    def add(self, row, embedding):
+        if self.centroids.shape[0] == 0:
+            # nothing trained yet, a single list around the first vector
+            self.centroids = (embedding / np.linalg.norm(embedding))[None, :].astype(
+                np.float32
+            )
+            self._lists = [np.empty(0, dtype=np.int64)]
+        if row >= self._assign.shape[0]:
+            grown = np.empty(max(16, self._assign.shape[0] * 2), dtype=np.int64)
+            grown[: self._assign.shape[0]] = self._assign
+            self._assign = grown
+        list_no = self._nearest_list(embedding)
+        self._assign[row] = list_no
+        self._lists[list_no] = np.append(self._lists[list_no], row)
+
+    def update(self, row, embedding):
+        list_no = self._nearest_list(embedding)
+        old = int(self._assign[row])
+        if list_no == old:
+            return
+        self._lists[old] = self._lists[old][self._lists[old] != row]
+        self._lists[list_no] = np.append(self._lists[list_no], row)
+        self._assign[row] = list_no
+
+    def remove(self, row, last):
+        old = int(self._assign[row])
+        self._lists[old] = self._lists[old][self._lists[old] != row]
+        if row != last:
+            moved = int(self._assign[last])
+            entries = self._lists[moved].copy()
+            entries[entries == last] = row
+            self._lists[moved] = entries
+            self._assign[row] = moved
+
+    def view(self):
+        return _IVFView(self.centroids, tuple(self._lists), self.nprobe)
+
+
+def create_index(kind: str, size: int, min_ivf_size: int, nprobe: int) -> GalleryIndex:
+    """Pick the index implementation, `auto` only pays for IVF once the gallery is large"""
+    if kind == "ivf" or (kind == "auto" and size >= min_ivf_size):
+        return IVFIndex(nprobe=nprobe)
+    return BruteForceIndex()
@@ -0,0 +1,173 @@
+import threading
+import time
+from typing import Any
+
+import cv2
+import numpy as np
+
+from database.data_operations import Database
+from face_recognition.alignment import embed_crops, largest_face_crop
+from face_recognition.model_registry import model_for_config
+
+
+class ModelMigration:
+    """
+    Re-embeds the gallery with a new model on a background thread while the live
+    loop keeps recognizing with the active one, then switches the database over atomically
+    """
+
+    def __init__(self, db: Database, batch_size: int = 16, max_passes: int = 3):
+        self._db = db
+        self.batch_size = batch_size
+        self.max_passes = max_passes
+
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._cancel = threading.Event()
+        self._status: dict[str, Any] = {"state": "idle", "model": db.active_model}
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def progress(self) -> dict[str, Any]:
+        with self._lock:
+            status = dict(self._status)
+        if "failed" in status:
+            status["failed"] = list(status["failed"])
+        return status
+
+    def _set(self, status: dict[str, Any], **fields):
+        """Update a run's status, a superseded run writes to a dict nobody reads anymore"""
+        with self._lock:
+            status.update(fields)
+
+    def start(self, model: str, config: dict[str, Any]) -> bool:
+        """Start migrating to `model`, a running migration to another model is cancelled"""
+        if self.is_running():
+            if self.progress().get("model") == model:
+                return False
+            self.cancel()
+        # every run gets its own event and status, a cancelled run winding down in the
+        # background can't touch the one replacing it
+        cancel = self._cancel = threading.Event()
+        status = {
+            "state": "loading",
+            "model": model,
+            "from_model": self._db.active_model,
+            "total": 0,
+            "done": 0,
+            "failed": [],
+            "missing_source": 0,
+            "images_per_sec": 0.0,
+            "error": None,
+        }
+        with self._lock:
+            self._status = status
+        self._thread = threading.Thread(
+            target=self._run, args=(model, dict(config), status, cancel), daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def cancel(self):
+        """
+        Ask a running migration to stop and return without waiting, it finishes its
+        current batch and marks itself cancelled. Embeddings already stored are reused
+        next time
+        """
+        if not self.is_running():
+            return
+        self._cancel.set()
+        self._set(self._status, state="cancelling")
+
+    def _run(
+        self,
+        model: str,
+        config: dict[str, Any],
+        status: dict[str, Any],
+        cancel: threading.Event,
+    ):
+        try:
+            app = model_for_config(config, model)
+            for _ in range(self.max_passes):
+                if not self._embed_pending(app, model, status, cancel):
+                    return
+                if cancel.is_set():
+                    self._set(status, state="cancelled")
+                    return
+                missing = self._db.switch_model(model)
+                if missing == 0:
+                    self._set(status, state="done")
+                    print(f"ModelMigration - switched gallery to {model}")
+                    return
+                # images were enrolled with the old model while we ran, pick them up
+            self._set(
+                status,
+                state="failed",
+                error=f"{missing} images still missing after retries",
+            )
+        except Exception as e:
+            self._set(status, state="failed", error=str(e))
+            print(f"ModelMigration - failed to migrate to {model}: {e}")
+
+    def _embed_pending(
+        self, app, model: str, status: dict[str, Any], cancel: threading.Event
+    ) -> bool:
+        """Embed every pending image, False if cancelled or something can't be migrated"""
+        pending = self._db.get_pending_images(model)
+        missing_source = self._db.count_images_without_source(model)
+        with self._lock:
+            status["state"] = "embedding"
+            status["total"] = status["done"] + len(pending)
+            status["missing_source"] = missing_source
+
+        started = time.perf_counter()
+        embedded = 0
+        for start in range(0, len(pending), self.batch_size):
+            if cancel.is_set():
+                self._set(status, state="cancelled")
+                return False
+            names, crops = [], []
+            for img_name, user_id in pending[start : start + self.batch_size]:
+                source = self._db.get_image_source(img_name, user_id)
+                img = None
+                if source is not None:
+                    img = cv2.imdecode(
+                        np.frombuffer(source, np.uint8), cv2.IMREAD_COLOR
+                    )
+                crop = largest_face_crop(app, img) if img is not None else None
+                if crop is None:
+                    with self._lock:
+                        status["failed"].append(f"{user_id}/{img_name}")
+                    continue
+                names.append((img_name, user_id))
+                crops.append(crop)
+
+            if crops:
+                embeddings = embed_crops(app, crops)
+                self._db.add_model_embeddings(
+                    model,
+                    [
+                        (img_name, user_id, embedding)
+                        for (img_name, user_id), embedding in zip(names, embeddings)
+                    ],
+                )
+            embedded += len(pending[start : start + self.batch_size])
+            with self._lock:
+                status["done"] += len(pending[start : start + self.batch_size])
+                status["images_per_sec"] = round(
+                    embedded / (time.perf_counter() - started), 2
+                )
+
+        with self._lock:
+            failed = list(status["failed"])
+        if missing_source or failed:
+            # switching now would silently drop these images from the gallery
+            self._set(
+                status,
+                state="blocked",
+                error=f"{missing_source} images have no stored source and {len(failed)} "
+                f"had no face for {model}, re-enroll or delete them and retry",
+            )
+            return False
+        return True
@@ -0,0 +1,135 @@
+import threading
+from typing import Any
+
+import cv2
+import numpy as np
+
+WATCH = "watch"
+ACTIVE = "active"
+
+
+class MotionGate:
+    """
+    Decides per captured frame whether the rest of the pipeline runs. While the doorway
+    is empty the camera sits in watch mode, sampling a few frames a second and comparing
+    a small blurred grayscale copy with the previous sample. Motion, or a face that is
+    still being tracked, switches to active mode at the full frame rate until nothing
+    has moved for quiet_s. All timing is on the frame source's clock, a replayed clip
+    reports the seconds of the clip
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.width = 160
+        self.pixel_threshold = 25
+        self.min_changed = 0.01
+        self.quiet_s = 5.0
+        self.watch_fps = 2.0
+
+        self.mode = WATCH
+        self._previous: np.ndarray | None = None
+        self._last_sample = float("-inf")
+        self._last_motion: float | None = None
+        # source timestamps of the mode's start and of the latest frame, set by the first
+        self._mode_since: float | None = None
+        self._clock: float | None = None
+        self._lock = threading.Lock()
+        self.motion_score = 0.0
+        self.transitions = 0
+        self.frames = {WATCH: 0, ACTIVE: 0}
+        self.seconds = {WATCH: 0.0, ACTIVE: 0.0}
+
+    def update_config(self, config: dict[str, Any]):
+        self.enabled = config.get("enabled", True)
+        self.width = config.get("width", 160)
+        self.pixel_threshold = config.get("pixel_threshold", 25)
+        self.min_changed = config.get("min_changed", 0.01)
+        self.quiet_s = config.get("quiet_s", 5.0)
+        self.watch_fps = config.get("watch_fps", 2.0)
+        # a different sample size can't be compared with the old one
+        self._previous = None
+
+    def reset(self, now: float):
+        """
+        `now` on the clock of the frames that follow, the source's timestamps. A new
+        source may have a new clock, so the current mode is closed at the last frame of
+        the old one
+        """
+        with self._lock:
+            self._previous = None
+            self._last_sample = float("-inf")
+            self._last_motion = None
+            if self._mode_since is not None:
+                self.seconds[self.mode] += self._clock - self._mode_since
+            if self.mode != WATCH:
+                self.mode = WATCH
+                self.transitions += 1
+            self._mode_since = self._clock = now
+
+    def sample_due(self, now: float) -> bool:
+        """False while watching between samples, the frame can be grabbed without decoding"""
+        # a zero rate can't be spaced out, sample every frame rather than divide by it
+        if not self.enabled or self.mode == ACTIVE or self.watch_fps <= 0:
+            return True
+        return now - self._last_sample >= 1 / self.watch_fps
+
+    def observe(self, frame: np.ndarray, present: bool, now: float) -> bool:
+        """Feed a decoded frame, True when the pipeline should process it"""
+        if not self.enabled:
+            return True
+        with self._lock:
+            if self._mode_since is None:
+                self._mode_since = now
+            self._clock = now
+            self._last_sample = now
+            if self._moved(frame) or present:
+                self._last_motion = now
+                self._set_mode(ACTIVE, now)
+            elif self.mode == ACTIVE and now - self._last_motion >= self.quiet_s:
+                self._set_mode(WATCH, now)
+            self.frames[self.mode] += 1
+            return self.mode == ACTIVE
+
+    def _moved(self, frame: np.ndarray) -> bool:
+        height, width = frame.shape[:2]
+        small = cv2.resize(
+            frame,
+            (self.width, max(1, height * self.width // width)),
+            interpolation=cv2.INTER_AREA,
+        )
+        gray = cv2.GaussianBlur(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY), (5, 5), 0)
+        previous, self._previous = self._previous, gray
+        if previous is None:
+            return False
+        changed = cv2.absdiff(gray, previous) > self.pixel_threshold
+        self.motion_score = float(np.count_nonzero(changed)) / changed.size
+        return self.motion_score >= self.min_changed
+
+    def _set_mode(self, mode: str, now: float):
+        if mode == self.mode:
+            return
+        self.seconds[self.mode] += now - self._mode_since
+        self._mode_since = now
+        self.mode = mode
+        self.transitions += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            # up to the latest frame, the source's clock doesn't run between frames
+            now = self._clock
+            seconds = dict(self.seconds)
+            if self._mode_since is not None:
+                seconds[self.mode] += now - self._mode_since
+            return {
+                "enabled": self.enabled,
+                "mode": self.mode if self.enabled else ACTIVE,
+                "motion_score": round(self.motion_score, 4),
+                "since_motion_s": (
+                    None
+                    if self._last_motion is None
+                    else round(now - self._last_motion, 1)
+                ),
+                "transitions": self.transitions,
+                "frames": dict(self.frames),
+                "seconds": {mode: round(s, 1) for mode, s in seconds.items()},
+            }
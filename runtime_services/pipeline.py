@@ -0,0 +1,260 @@
+import collections
+import threading
+import time
+from typing import Any, Callable
+
+
+class LatestQueue:
+    """
+    Bounded hand-off between two stages. A full queue drops its oldest item, so a slow
+    consumer always gets the freshest frame instead of working through a backlog
+    """
+
+    def __init__(self, name: str, maxsize: int = 1):
+        self.name = name
+        self.maxsize = maxsize
+        self._items: collections.deque = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self.puts = 0
+        self.dropped = 0
+
+    def put(self, item) -> Any | None:
+        """Enqueue, returns the item that was dropped to make room, if any"""
+        with self._cond:
+            dropped = None
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self.puts += 1
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: float | None = None) -> Any | None:
+        """Oldest item, or None on timeout / once closed"""
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._items or self._closed, timeout=timeout
+            ):
+                return None
+            return self._items.popleft() if self._items else None
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "depth": len(self._items),
+                "capacity": self.maxsize,
+                "put": self.puts,
+                "dropped": self.dropped,
+            }
+
+
+class FairQueue:
+    """
+    Latest-wins lanes, one per producer, served round robin so a busy producer can't
+    starve the others. Behaves like a LatestQueue for the consuming stage
+    """
+
+    def __init__(self, name: str, maxsize: int = 1):
+        self.name = name
+        self.maxsize = maxsize
+        self._lanes: dict[str, collections.deque] = {}
+        self._order: collections.deque[str] = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+        self._puts: dict[str, int] = {}
+        self._dropped: dict[str, int] = {}
+
+    def put(self, lane: str, item) -> Any | None:
+        """Enqueue on `lane`, returns the item that was dropped to make room, if any"""
+        with self._cond:
+            if lane not in self._lanes:
+                self._lanes[lane] = collections.deque()
+                self._order.append(lane)
+                self._puts[lane] = self._dropped[lane] = 0
+            items = self._lanes[lane]
+            dropped = None
+            if len(items) >= self.maxsize:
+                dropped = items.popleft()
+                self._dropped[lane] += 1
+            items.append(item)
+            self._puts[lane] += 1
+            self._cond.notify()
+            return dropped
+
+    def get(self, timeout: float | None = None) -> Any | None:
+        """Oldest item of the next non-empty lane, or None on timeout / once closed"""
+        with self._cond:
+            if not self._cond.wait_for(
+                lambda: self._closed or any(self._lanes.values()), timeout=timeout
+            ):
+                return None
+            for _ in range(len(self._order)):
+                lane = self._order[0]
+                self._order.rotate(-1)
+                if self._lanes[lane]:
+                    return self._lanes[lane].popleft()
+            return None
+
+    def remove_lane(self, lane: str) -> list:
+        """Forget a producer, returns whatever it still had queued"""
+        with self._cond:
+            if lane not in self._lanes:
+                return []
+            self._order.remove(lane)
+            self._puts.pop(lane)
+            self._dropped.pop(lane)
+            return list(self._lanes.pop(lane))
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "capacity": self.maxsize,
+                "lanes": {
+                    lane: {
+                        "depth": len(items),
+                        "put": self._puts[lane],
+                        "dropped": self._dropped[lane],
+                    }
+                    for lane, items in self._lanes.items()
+                },
+            }
+
+
+class StageStats:
+    """Throughput over a sliding window plus per item latency"""
+
+    def __init__(self, window: float = 2.0):
+        self.window = window
+        self.processed = 0
+        self.total_s = 0.0
+        self.last_ms = 0.0
+        self._done: collections.deque = collections.deque()
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        now = time.monotonic()
+        with self._lock:
+            self.processed += 1
+            self.total_s += seconds
+            self.last_ms = seconds * 1000
+            self._done.append(now)
+            while self._done and now - self._done[0] > self.window:
+                self._done.popleft()
+
+    def snapshot(self) -> dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            while self._done and now - self._done[0] > self.window:
+                self._done.popleft()
+            return {
+                "fps": round(len(self._done) / self.window, 2),
+                "processed": self.processed,
+                "avg_ms": round(self.total_s * 1000 / max(self.processed, 1), 2),
+                "last_ms": round(self.last_ms, 2),
+            }
+
+
+class Stage(threading.Thread):
+    """
+    Worker thread that pulls from `source` (or produces on its own when None), runs
+    `work` and pushes non-None results into `sink`. Any error stops the whole pipeline
+    """
+
+    def __init__(
+        self,
+        name: str,
+        work: Callable[[Any], Any],
+        stop: threading.Event,
+        source: LatestQueue | FairQueue | None = None,
+        sink: LatestQueue | None = None,
+        on_drop: Callable[[Any], None] | None = None,
+    ):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.stage_name = name
+        self.work = work
+        self.stop = stop
+        self.source = source
+        self.sink = sink
+        self.on_drop = on_drop
+        self.stats = StageStats()
+
+    def run(self):
+        try:
+            while not self.stop.is_set():
+                item = None
+                if self.source is not None:
+                    item = self.source.get(timeout=0.1)
+                    if item is None:
+                        continue
+                start = time.perf_counter()
+                result = self.work(item)
+                self.stats.record(time.perf_counter() - start)
+                if result is not None and self.sink is not None:
+                    dropped = self.sink.put(result)
+                    if dropped is not None and self.on_drop is not None:
+                        self.on_drop(dropped)
+        except Exception as e:
+            print(f"Pipeline stage {self.stage_name} failed: {e}")
+        finally:
+            self.stop.set()
+
+
+class Pipeline:
+    """A set of stages and the queues between them, started and stopped together"""
+
+    def __init__(self):
+        self.stop_event = threading.Event()
+        self.stages: list[Stage] = []
+        self.queues: list[LatestQueue | FairQueue] = []
+
+    def queue(self, name: str, maxsize: int = 1) -> LatestQueue:
+        q = LatestQueue(name, maxsize)
+        self.queues.append(q)
+        return q
+
+    def fair_queue(self, name: str, maxsize: int = 1) -> FairQueue:
+        q = FairQueue(name, maxsize)
+        self.queues.append(q)
+        return q
+
+    def stage(self, name: str, work: Callable[[Any], Any], **kwargs) -> Stage:
+        stage = Stage(name, work, self.stop_event, **kwargs)
+        self.stages.append(stage)
+        return stage
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def running(self) -> bool:
+        return not self.stop_event.is_set()
+
+    def stop(self):
+        self.stop_event.set()
+        for q in self.queues:
+            q.close()
+
+    def join(self, timeout: float | None = None):
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "running": self.running(),
+            "stages": {
+                stage.stage_name: stage.stats.snapshot() for stage in self.stages
+            },
+            "queues": {q.name: q.stats() for q in self.queues},
+        }
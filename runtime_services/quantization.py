@@ -0,0 +1,75 @@
+import numpy as np
+
+STORAGE_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def quantize(
+    embeddings: np.ndarray, dtype: str
+) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Encode (n, dim) unit vectors as `dtype` codes. int8 gets one symmetric scale per
+    row so every vector uses the full [-127, 127] range, float types need no scale
+    """
+    embeddings = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+    if dtype != "int8":
+        return embeddings.astype(STORAGE_DTYPES[dtype]), None
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.rint(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    Read-only (n, dim) gallery rows stored as float32, float16 or per-row scaled int8.
+    Queries stay float32 and rows are upcast chunk by chunk, so every score is a float32
+    dot product against the dequantized row while the full matrix stays compact
+    """
+
+    __slots__ = ("codes", "scales", "chunk")
+
+    def __init__(
+        self, codes: np.ndarray, scales: np.ndarray | None = None, chunk: int = 4096
+    ):
+        codes.flags.writeable = False
+        if scales is not None:
+            scales.flags.writeable = False
+        self.codes = codes
+        self.scales = scales
+        self.chunk = chunk
+
+    @classmethod
+    def from_float(cls, embeddings: np.ndarray, dtype: str = "float32"):
+        return cls(*quantize(embeddings, dtype))
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.codes.shape
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (0 if self.scales is None else self.scales.nbytes)
+
+    def dequantize(self, rows: slice | np.ndarray = slice(None)) -> np.ndarray:
+        codes = self.codes[rows].astype(np.float32, copy=False)
+        if self.scales is not None:
+            codes *= self.scales[rows][:, None]
+        return codes
+
+    def dot(self, queries: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """(Q, n) float32 scores of the queries against all rows, or just `rows`"""
+        codes = self.codes if rows is None else self.codes[rows]
+        if codes.dtype == np.float32:
+            return queries @ codes.T
+
+        # numpy has no BLAS kernel for float16 / int8, upcast a cache sized block at a time
+        scores = np.empty((queries.shape[0], codes.shape[0]), dtype=np.float32)
+        for start in range(0, codes.shape[0], self.chunk):
+            block = codes[start : start + self.chunk].astype(np.float32)
+            scores[:, start : start + self.chunk] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
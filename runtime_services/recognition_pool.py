@@ -0,0 +1,394 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable
+
+import numpy as np
+
+from utils.enums import AccessLevel
+
+Result = tuple[str, float, AccessLevel]
+# what each face of a request resolves to when its worker fails, its track asks again
+_NO_MATCH: Result = ("Unknown", -1.0, AccessLevel.STRANGER)
+# how often the collector checks that every worker is still alive
+_LIVENESS_INTERVAL_S = 1.0
+
+
+class FrameRing:
+    """
+    Fixed size frame slots in one shared memory block. The parent writes a frame into a
+    free slot and only sends the slot offset, workers map the block once by name
+    """
+
+    def __init__(self, slots: int, slot_bytes: int):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def write(self, slot: int, frame: np.ndarray) -> int:
+        offset = slot * self.slot_bytes
+        view = np.ndarray(frame.shape, frame.dtype, buffer=self.shm.buf, offset=offset)
+        view[...] = frame
+        return offset
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _worker_config(config: dict[str, Any], workers: int) -> dict[str, Any]:
+    """Split the cores between workers unless the config already pins thread counts"""
+    config = dict(config)
+    session_options = {
+        k: dict(v or {}) for k, v in config.get("session_options", {}).items()
+    }
+    default = session_options.setdefault("default", {})
+    if not default.get("intra_op_num_threads"):
+        default["intra_op_num_threads"] = max(1, (os.cpu_count() or 1) // workers)
+    config["session_options"] = session_options
+    return config
+
+
+def _apply_update(message: tuple, recognizer, gallery, db):
+    kind, *args = message
+    if kind == "config":
+        recognizer.update_config(args[0])
+        gallery.update_config(args[0])
+    elif kind == "embedding":
+        gallery.on_embedding_update(*args)
+    elif kind == "user":
+        gallery.on_user_update(*args)
+    elif kind == "reload":
+        # this process' Database caches the active model, take the parent's
+        db.active_model = args[0]
+        gallery.on_gallery_reload()
+
+
+def _worker_main(config: dict[str, Any], tasks, control, results):
+    """Worker process: its own model and gallery copy, fed frames through the ring"""
+    from database.data_operations import db
+    from face_recognition import FaceRecognizer
+    from face_recognition.model_registry import model_for_config
+    from runtime_services.embedding_manager import EmebeddingManager
+
+    recognizer = FaceRecognizer()
+    recognizer.update_config(config)
+    gallery = EmebeddingManager(db)
+    gallery.update_config(config)
+    # load before taking work so the first request isn't stuck behind the model
+    model_for_config(config, db.active_model)
+
+    rings: dict[str, shared_memory.SharedMemory] = {}
+    while True:
+        task = tasks.get()
+        # gallery changes that landed while idle apply before the next frame
+        while True:
+            try:
+                _apply_update(control.get_nowait(), recognizer, gallery, db)
+            except queue.Empty:
+                break
+        if task is None:
+            break
+
+        request_id, ring_name, offset, shape, keypoints = task
+        if ring_name not in rings:
+            # the parent replaced the ring, the old block is never written again
+            for old in rings.values():
+                old.close()
+            rings = {ring_name: shared_memory.SharedMemory(name=ring_name)}
+        frame = np.ndarray(shape, np.uint8, buffer=rings[ring_name].buf, offset=offset)
+        try:
+            result = recognizer.recognize_faces(frame, gallery.snapshot, keypoints)
+            results.put((request_id, result, None))
+        except Exception as e:
+            results.put((request_id, None, f"{type(e).__name__}: {e}"))
+        # the slot goes back to the parent with the result, drop the view first
+        del frame
+
+    for ring in rings.values():
+        ring.close()
+
+
+class RecognitionPool:
+    """
+    Runs recognition in worker processes, each with its own model, so it doesn't share
+    the GIL with the event loop and MediaPipe. Off (in-process recognition) while
+    recognition_workers is 0. Gallery changes reach the workers incrementally as an
+    EmebeddingManager listener instead of re-sending the gallery. Every worker has its own
+    task queue, so when one dies only the requests it held are failed. Processes, queues,
+    slots and the ring are only swapped under one lock, and a frame submitted while the
+    pool is stopped or restarting resolves to no match, its track asks again
+    """
+
+    def __init__(self, db, slots_per_worker: int = 2):
+        self._db = db
+        self._ctx = mp.get_context("spawn")  # forking a threaded process isn't safe
+        self._slots_per_worker = slots_per_worker
+        self._config: dict[str, Any] = {}
+        self._workers = 0
+        # reentrant so a restart can stop and start as one step
+        self._lock = threading.RLock()
+
+        self._processes: list = []
+        self._controls: list = []
+        self._tasks: list = []
+        self._results = None
+        self._collector: threading.Thread | None = None
+        self._ring: FrameRing | None = None
+        self._slots = 0
+        self._free: queue.Queue[int] = queue.Queue()
+        # request id -> (worker index, slot, face count, callback)
+        self._pending: dict[
+            int, tuple[int, int, int, Callable[[list[Result]], None]]
+        ] = {}
+        self._ids = itertools.count()
+        self.completed = 0
+        self.failed = 0
+
+    def running(self) -> bool:
+        return bool(self._processes)
+
+    def _spawn(self, index: int, workers: int):
+        tasks, control = self._ctx.Queue(), self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(
+                _worker_config(self._config, workers),
+                tasks,
+                control,
+                self._results,
+            ),
+            name=f"recognition-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process, tasks, control
+
+    def start(self):
+        with self._lock:
+            if self.running() or self._workers <= 0:
+                return
+            self._results = self._ctx.Queue()
+            self._processes, self._tasks, self._controls = [], [], []
+            for index in range(self._workers):
+                process, tasks, control = self._spawn(index, self._workers)
+                self._processes.append(process)
+                self._tasks.append(tasks)
+                self._controls.append(control)
+            self._slots = self._workers * self._slots_per_worker
+            self._free = queue.Queue()
+            for slot in range(self._slots):
+                self._free.put(slot)
+            self._collector = threading.Thread(
+                target=self._collect, name="recognition-pool", daemon=True
+            )
+            self._collector.start()
+        print(f"RecognitionPool started {self._workers} workers")
+
+    def stop(self):
+        with self._lock:
+            if not self.running():
+                return
+            for tasks in self._tasks:
+                tasks.put(None)
+            for process in self._processes:
+                process.join(timeout=5)
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+            self._results.put(None)
+            self._collector.join()
+            for process in self._processes:
+                process.close()
+            self._processes, self._tasks, self._controls = [], [], []
+            # nothing answers these anymore, their tracks ask again
+            self._fail(list(self._pending))
+            if self._ring is not None:
+                self._ring.close()
+                self._ring = None
+
+    def submit(
+        self,
+        frame: np.ndarray,
+        keypoints: list[np.ndarray],
+        callback: Callable[[list[Result]], None],
+    ):
+        """
+        Queue a frame and its faces' keypoints, `callback` gets one result per face on
+        the pool's collector thread. While the pool is stopped it gets no match at once
+        """
+        with self._lock:
+            free = self._free if self.running() else None
+        if free is None or not self._ensure_ring(free, frame.nbytes):
+            callback([_NO_MATCH] * len(keypoints))
+            return
+        slot = free.get()  # blocks while every slot is being recognized
+        with self._lock:
+            # a stop frees every slot, and a slot of the previous pool isn't this one's
+            queued = free is self._free and self.running()
+            if queued:
+                offset = self._ring.write(slot, frame)
+                request_id = next(self._ids)
+                worker = self._least_busy()
+                self._pending[request_id] = (worker, slot, len(keypoints), callback)
+                self._tasks[worker].put(
+                    (request_id, self._ring.name, offset, frame.shape, keypoints)
+                )
+        if not queued:
+            callback([_NO_MATCH] * len(keypoints))
+
+    def _least_busy(self) -> int:
+        """Worker with the fewest requests, called under self._lock while running"""
+        load = [0] * len(self._processes)
+        for worker, *_ in list(self._pending.values()):
+            load[worker] += 1
+        return load.index(min(load))
+
+    def _ensure_ring(self, free: queue.Queue, nbytes: int) -> bool:
+        """Make the ring fit `nbytes` frames, False if the pool stopped meanwhile"""
+        with self._lock:
+            if free is not self._free or not self.running():
+                return False
+            if self._ring is not None and nbytes <= self._ring.slot_bytes:
+                return True
+            slots = self._slots
+        # a bigger frame needs a new ring, wait for every slot so none is being read
+        held = [free.get() for _ in range(slots)]
+        with self._lock:
+            resized = free is self._free and self.running()
+            if resized:
+                if self._ring is not None:
+                    self._ring.close()
+                self._ring = FrameRing(slots, nbytes)
+        for slot in held:
+            free.put(slot)
+        return resized
+
+    def _collect(self):
+        # liveness runs on a timer, a steady stream of results must not hide a dead worker
+        next_check = time.monotonic() + _LIVENESS_INTERVAL_S
+        while True:
+            try:
+                message = self._results.get(
+                    timeout=max(next_check - time.monotonic(), 0.0)
+                )
+            except queue.Empty:
+                message = ()
+            if time.monotonic() >= next_check:
+                self._replace_dead_workers()
+                next_check = time.monotonic() + _LIVENESS_INTERVAL_S
+            if message is None:
+                return
+            if not message:
+                continue
+            request_id, result, error = message
+            # a request already failed with its worker may still answer, it's ignored
+            request = self._pending.pop(request_id, None)
+            if request is None:
+                continue
+            _, slot, faces, callback = request
+            self._free.put(slot)
+            if error is not None:
+                self.failed += 1
+                print(f"Recognition worker failed: {error}")
+                result = [_NO_MATCH] * faces
+            else:
+                self.completed += 1
+            callback(result)
+
+    def _fail(self, request_ids: list[int]):
+        for request_id in request_ids:
+            request = self._pending.pop(request_id, None)
+            if request is None:
+                continue
+            _, slot, faces, callback = request
+            self._free.put(slot)
+            self.failed += 1
+            callback([_NO_MATCH] * faces)
+
+    def _replace_dead_workers(self):
+        # a stop or restart holding the lock is joining the workers, and this thread
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._replace_dead_workers_locked()
+        finally:
+            self._lock.release()
+
+    def _replace_dead_workers_locked(self):
+        dead = {i for i, p in enumerate(self._processes) if not p.is_alive()}
+        if not dead:
+            return
+        # only what the dead workers held, queued or in progress, is lost
+        self._fail(
+            [
+                request_id
+                for request_id, (worker, *_) in list(self._pending.items())
+                if worker in dead
+            ]
+        )
+        for index in sorted(dead):
+            print(f"Recognition worker {index} exited, restarting it")
+            # the old queues aren't closed, a submit racing this may still put to them
+            self._processes[index].close()
+            (
+                self._processes[index],
+                self._tasks[index],
+                self._controls[index],
+            ) = self._spawn(index, len(self._processes))
+
+    def _broadcast(self, message: tuple):
+        for control in self._controls:
+            control.put(message)
+
+    def update_config(self, config: dict[str, Any]):
+        workers = config.get("recognition_workers", 0)
+        self._config = dict(config)
+        if workers != self._workers:
+            # workers are sized from the config, a new count means a new pool. Joining
+            # the old workers takes seconds, so that is kept off the caller, often the
+            # config API on the event loop. A start() from now on uses the new count
+            self._workers = workers
+            threading.Thread(
+                target=self._resize, name="recognition-pool-resize", daemon=True
+            ).start()
+        elif self.running():
+            self._broadcast(("config", self._config))
+
+    def _resize(self):
+        with self._lock:
+            if not self.running() or len(self._processes) == self._workers:
+                return
+            self.stop()
+            self.start()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "workers": self._workers,
+            "alive": sum(p.is_alive() for p in self._processes),
+            "in_flight": len(self._pending),
+            "completed": self.completed,
+            "failed": self.failed,
+            "slot_bytes": 0 if self._ring is None else self._ring.slot_bytes,
+        }
+
+    # EmebeddingManager listener callbacks, forwarded so workers stay in sync
+    def on_embedding_update(self, user_id: int, embedding: np.ndarray | None):
+        if self.running():
+            self._broadcast(("embedding", user_id, embedding))
+
+    def on_user_update(self, user_id: int, *args):
+        if self.running():
+            self._broadcast(("user", user_id, *args))
+
+    def on_gallery_reload(self):
+        if self.running():
+            self._broadcast(("reload", self._db.active_model))
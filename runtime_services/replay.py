@@ -0,0 +1,217 @@
+import time
+from typing import Any
+
+import numpy as np
+
+from config import config_manager
+from database.data_operations import db
+from face_recognition import FaceRecognizer
+from face_recognition.model_registry import model_for_config
+from runtime_services.broadcaster import DEFAULT_VARIANT
+from runtime_services.camera import Camera
+from runtime_services.embedding_manager import EmebeddingManager
+from runtime_services.frame_source import open_frame_source
+from utils.enums import AccessLevel
+
+STAGES = ("capture", "landmarks", "recognition", "render")
+# State.cycle_lock holds a lock open and cooling down for this long
+LOCK_CYCLE_S = 15.0
+
+
+class _DecisionLog:
+    """Takes NotificationManager's place, records each face's outcome per frame"""
+
+    def __init__(self):
+        self.frame = 0
+        self.timestamp = 0.0
+        self.faces: list[tuple[str, bool, bool, str]] = []
+
+    def check_and_send(
+        self, recognized: bool, live: bool, name: str, access_level: AccessLevel
+    ):
+        self.faces.append((name, recognized, live, str(access_level)))
+
+
+class Replay:
+    """
+    Drives one Camera over a frame source in lockstep, standing in for State. Each frame
+    goes through capture, landmarks, recognition and render before the next is read,
+    recognition results land on the following frame, doors and notifications are only
+    recorded, and every clock is the source's timestamps. The same clip therefore always
+    gives the same decisions, whether replayed flat out or at its recorded timing
+    """
+
+    def __init__(
+        self,
+        source_config: dict[str, Any],
+        realtime: bool = False,
+        recognize: bool = True,
+        render: bool = True,
+        lock: str | None = "front",
+    ):
+        self.source_config = source_config
+        self.realtime = realtime
+        self.recognize = recognize
+        self.render = render
+        self.lock = lock
+
+        self.face_recognition = FaceRecognizer()
+        self.embedding_manager = EmebeddingManager(db)
+        self._listeners = [
+            ("face_recognition", self.face_recognition.update_config),
+            ("face_recognition", self.embedding_manager.update_config),
+        ]
+        for section, listener in self._listeners:
+            config_manager.register_listener(section, listener)
+
+        self.notification_manager = _DecisionLog()
+        self._latencies: dict[str, list[float]] = {}
+        self._unlocks: list[dict[str, Any]] = []
+        self._lock_free_at: dict[str, float] = {}
+
+    def close(self):
+        for section, listener in self._listeners:
+            config_manager.unregister_listener(section, listener)
+
+    # the parts of State a Camera calls into
+    def submit_recognition(
+        self, camera: Camera, track_ids: list[int], frame, keypoints: list
+    ) -> list[int] | None:
+        if not self.recognize:
+            return track_ids  # never queued, the tracks stay Unknown
+        start = time.perf_counter()
+        results = self.face_recognition.recognize_faces(
+            frame, self.embedding_manager.snapshot, keypoints
+        )
+        self._latencies["recognition"].append(time.perf_counter() - start)
+        camera.deliver_recognition(track_ids, results)
+        return None
+
+    def request_unlock(self, lock: str, since: float | None = None) -> bool:
+        now = self.notification_manager.timestamp
+        if now < self._lock_free_at.get(lock, float("-inf")):
+            return False
+        self._lock_free_at[lock] = now + LOCK_CYCLE_S
+        self._unlocks.append(
+            {
+                "frame": self.notification_manager.frame,
+                "t": round(now, 3),
+                "lock": lock,
+            }
+        )
+        return True
+
+    def warm_up(self):
+        """Load the recognition model now so the first face doesn't pay for it"""
+        if self.recognize:
+            model_for_config(
+                config_manager.get_section("face_recognition"), db.active_model
+            )
+
+    def run(self, max_frames: int | None = None) -> dict[str, Any]:
+        self._latencies = {stage: [] for stage in STAGES}
+        self._unlocks = []
+        self._lock_free_at = {}
+        decisions = self.notification_manager
+        timeline = []
+
+        camera = Camera("replay", {**self.source_config, "lock": self.lock}, self)
+        source = open_frame_source(self.source_config, realtime=self.realtime)
+        face_mesh = camera.face_mesh()
+        # the gate follows video.motion like State's cameras do
+        camera.gate.update_config(config_manager.get_section("video").get("motion", {}))
+        camera.gate.reset(source.clock())
+        processed = 0
+        started = time.perf_counter()
+        try:
+            while source.is_opened() and (
+                max_frames is None or source.frames < max_frames
+            ):
+                source.wait()  # pacing isn't capture time
+                start = time.perf_counter()
+                item = camera.capture(source)
+                self._latencies["capture"].append(time.perf_counter() - start)
+                if source.ended:
+                    break
+                if item is None:  # skipped by the motion gate
+                    continue
+                processed += 1
+
+                decisions.frame, decisions.timestamp = source.frames - 1, item[1]
+                decisions.faces = []
+                recognition = len(self._latencies["recognition"])
+                start = time.perf_counter()
+                rendered = camera.landmarks(face_mesh, item)
+                # recognition runs inline here, its time is reported on its own
+                elapsed = time.perf_counter() - start
+                elapsed -= sum(self._latencies["recognition"][recognition:])
+                self._latencies["landmarks"].append(elapsed)
+                timeline.append((decisions.frame, item[1], tuple(decisions.faces)))
+
+                if self.render:
+                    start = time.perf_counter()
+                    camera.encode(rendered, [DEFAULT_VARIANT])
+                    self._latencies["render"].append(time.perf_counter() - start)
+        finally:
+            seconds = time.perf_counter() - started
+            face_mesh.close()
+            source.close()
+            camera.close()
+
+        return {
+            "source": source.describe(),
+            "realtime": self.realtime,
+            "frames": source.frames,
+            "processed": processed,
+            "seconds": round(seconds, 3),
+            "fps": round(source.frames / seconds, 2) if seconds else 0.0,
+            "gate": {
+                "transitions": camera.gate.transitions,
+                "frames": dict(camera.gate.frames),
+            },
+            "stages": {
+                stage: self._summary(latencies)
+                for stage, latencies in self._latencies.items()
+            },
+            "decisions": self._changes(timeline),
+            "unlocks": list(self._unlocks),
+        }
+
+    @staticmethod
+    def _summary(latencies: list[float]) -> dict[str, Any]:
+        if not latencies:
+            return {"count": 0}
+        ms = np.asarray(latencies) * 1000
+        return {
+            "count": len(ms),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        }
+
+    @staticmethod
+    def _changes(timeline) -> list[dict[str, Any]]:
+        """Only the frames where a face appeared, left, or its outcome changed"""
+        changes = []
+        previous = None
+        for frame, timestamp, faces in timeline:
+            if faces == previous:
+                continue
+            previous = faces
+            changes.append(
+                {
+                    "frame": frame,
+                    "t": round(timestamp, 3),
+                    "faces": [
+                        {
+                            "name": name,
+                            "verified": verified,
+                            "live": live,
+                            "access": access,
+                        }
+                        for name, verified, live, access in faces
+                    ],
+                }
+            )
+        return changes
@@ -1,183 +1,278 @@
 import asyncio
-import cv2
-import mediapipe as mp
+import threading
+import time
 
 from config import config_manager
 from database.data_operations import db
 
-from face_recognition import FaceRecognizer, Overlay
-from liveness import Blink
+from face_recognition import FaceRecognizer
+from face_recognition.model_registry import model_for_config
 from notifications import NotificationManager
+from runtime_services.camera import Camera
 from runtime_services.embedding_manager import EmebeddingManager
+from runtime_services.model_migration import ModelMigration
+from runtime_services.pipeline import FairQueue, Pipeline
+from runtime_services.recognition_pool import RecognitionPool
 from hardware_integration.lock_controller import LockController
 from hardware_integration.arduino import ArduinoLike
-from utils.enums import AccessLevel
+from utils import metrics
+
+TIME_TO_UNLOCK = metrics.histogram(
+    "lock_override_time_to_unlock_seconds",
+    "From a face first being tracked to its lock opening.",
+    ("lock",),
+)
+UNLOCKS = metrics.counter("lock_override_unlocks_total", "Lock open cycles.", ("lock",))
+RECOGNITION_SECONDS = metrics.histogram(
+    "lock_override_recognition_seconds",
+    "One recognition request on the shared stage, inline or round trip to a worker.",
+    ("mode",),
+)
+_INLINE = RECOGNITION_SECONDS.labels("inline")
+_POOL = RECOGNITION_SECONDS.labels("pool")
 
 
 class State:
     def __init__(self, arduino: ArduinoLike) -> None:
         self.face_recognition = FaceRecognizer()
-        self.liveness = Blink()
-        self.overlay = Overlay()
         self.notification_manager = NotificationManager()
         # Inject Arduino if provided; otherwise LockController will create its own
-        self.door = LockController(arduino)
+        self._arduino = arduino
+        self.locks: dict[str, LockController] = {}
 
-        self._video_task: asyncio.Task | None = None
-        self._stop_signal = asyncio.Event()
-        self.latest_frame_jpg_enc = None
+        self.cameras: dict[str, Camera] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+        # one recognition stage shared by every running camera
+        self._recognition: Pipeline | None = None
+        self._recognition_queue: FairQueue | None = None
+        self._recognition_users = 0
+        self._recognition_guard = asyncio.Lock()
 
         # variables to debounce for notifications (pending) and door
-        self._door_busy = False
+        self._door_busy: set[str] = set()
+        self._door_guard = threading.Lock()
 
         config_manager.register_listener(
             "face_recognition", self.face_recognition.update_config
         )
-        config_manager.register_listener("blink_config", self.liveness.update_config)
-        config_manager.register_listener("overlay", self.overlay.update_config)
         config_manager.register_listener(
             "notifications", self.notification_manager.update_config
         )
 
         self.embedding_manager = EmebeddingManager(db)
         db.register_listener(self.embedding_manager)
-        
-    async def cycle_lock(self):
-        self._door_busy = True
-        self.door.open()
+        config_manager.register_listener(
+            "face_recognition", self.embedding_manager.update_config
+        )
+
+        # optional worker processes for recognition, fed gallery changes as they happen
+        self.recognition_pool = RecognitionPool(db)
+        self.embedding_manager.register_listener(self.recognition_pool)
+        config_manager.register_listener(
+            "face_recognition", self.recognition_pool.update_config
+        )
+
+        # a model change re-embeds the gallery in the background before switching over
+        self.model_migration = ModelMigration(db)
+        config_manager.register_listener("face_recognition", self.on_model_config)
+
+        config_manager.register_listener("video", self.on_video_config)
+        # queue drops and gate modes are already counted, read them at scrape time
+        metrics.REGISTRY.register_collector(self.collect_metrics)
+
+    def on_model_config(self, config):
+        if config["model"] != db.active_model:
+            self.model_migration.start(config["model"], config)
+        else:
+            self.model_migration.cancel()
+            # new providers or session options build new sessions, warm them off the loop
+            threading.Thread(
+                target=model_for_config,
+                args=(dict(config), db.active_model),
+                daemon=True,
+            ).start()
+
+    def on_video_config(self, config):
+        cameras = config.get("cameras", {})
+        for name, camera in list(self.cameras.items()):
+            if cameras.get(name) == camera.config:
+                continue
+            # removed or changed, a changed camera comes back with its new config
+            del self.cameras[name]
+            replacement = None
+            if name in cameras:
+                replacement = self._add_camera(name, cameras[name])
+            self._retire(camera, replacement)
+        for name, camera_config in cameras.items():
+            if name not in self.cameras:
+                self._add_camera(name, camera_config)
+        for camera in self.cameras.values():
+            camera.gate.update_config(config.get("motion", {}))
+
+    def _add_camera(self, name: str, config: dict) -> Camera:
+        camera = Camera(name, dict(config), self)
+        if camera.lock is not None and camera.lock not in self.locks:
+            # the sketch drives a single servo, every lock name maps onto it for now
+            self.locks[camera.lock] = LockController(self._arduino)
+        self.cameras[name] = camera
+        return camera
+
+    def _retire(self, camera: Camera, replacement: Camera | None):
+        camera.close()
+        if not camera.is_running():
+            return
+
+        async def swap():
+            await camera.stop()
+            if replacement is not None:
+                await replacement.start()
+
+        # config changes arrive on the API's loop, a running camera implies one exists
+        asyncio.run_coroutine_threadsafe(swap(), self._loop)
+
+    def camera(self, name: str) -> Camera:
+        """Raises KeyError for a camera that isn't configured"""
+        return self.cameras[name]
+
+    def request_unlock(self, lock: str, since: float | None = None) -> bool:
+        """
+        Claim `lock` from a camera thread and cycle it on the loop, False while busy.
+        `since` is when the face was first seen, on time.monotonic
+        """
+        with self._door_guard:
+            if lock in self._door_busy:
+                return False
+            self._door_busy.add(lock)
+        asyncio.run_coroutine_threadsafe(self.cycle_lock(lock, since), self._loop)
+        return True
+
+    async def cycle_lock(self, lock: str, since: float | None = None):
+        door = self.locks[lock]
+        door.open()
+        if since is not None:
+            TIME_TO_UNLOCK.labels(lock).observe(time.monotonic() - since)
+        UNLOCKS.labels(lock).inc()
         await asyncio.sleep(10)
-        self.door.close()
+        door.close()
         await asyncio.sleep(5)
-        self._door_busy = False # TODO: is there a better way to control the door cooldown?... always on model?
-        
+        with self._door_guard:
+            self._door_busy.discard(lock) # TODO: is there a better way to control the door cooldown?... always on model?
+
     def is_video_running(self) -> bool:
-        return self._video_task is not None
+        return any(camera.is_running() for camera in self.cameras.values())
 
     async def start_video(self) -> str:
-        if self._video_task and not self._video_task.done():
-            return "Video already running"
-
-        self._stop_signal.clear()
-        self._video_task = asyncio.create_task(self._run_video_loop())
-        return "Started Video"
+        if not self.cameras:
+            return "No cameras configured"
+        results = [await camera.start() for camera in self.cameras.values()]
+        return "Started Video" if "Started Video" in results else "Video already running"
 
     async def stop_video(self) -> str:
-        if not self._video_task or self._video_task.done():
-            return "Video not running"
-        self._stop_signal.set()
-        await self._video_task
-        self._video_task = None
-        return "Stopped Video"
-
-    async def _run_video_loop(self):
-        face_mesh = mp.solutions.face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.7,
-            min_tracking_confidence=0.7,
+        results = [await camera.stop() for camera in list(self.cameras.values())]
+        return "Stopped Video" if "Stopped Video" in results else "Video not running"
+
+    # recognition is started by the first camera and stopped with the last one
+    async def recognition_started(self):
+        async with self._recognition_guard:
+            if self._recognition is None:
+                self._loop = asyncio.get_running_loop()
+                pipeline = Pipeline()
+                self._recognition_queue = pipeline.fair_queue("recognition", maxsize=2)
+                pipeline.stage(
+                    "recognition", self._recognize, source=self._recognition_queue
+                )
+                await asyncio.to_thread(self.recognition_pool.start)
+                pipeline.start()
+                self._recognition = pipeline
+            self._recognition_users += 1
+
+    async def recognition_stopped(self, camera: Camera):
+        async with self._recognition_guard:
+            self._recognition_users -= 1
+            if self._recognition_queue is not None:
+                self._recognition_queue.remove_lane(camera.name)
+            if self._recognition_users or self._recognition is None:
+                return
+            pipeline, self._recognition = self._recognition, None
+            self._recognition_queue = None
+            pipeline.stop()
+            await asyncio.to_thread(pipeline.join)
+            # after the pipeline, a blocked submit may still be waiting on a worker
+            await asyncio.to_thread(self.recognition_pool.stop)
+
+    def recognition_running(self) -> bool:
+        return self._recognition is not None and self._recognition.running()
+
+    def submit_recognition(
+        self, camera: Camera, track_ids: list[int], frame, keypoints: list
+    ) -> list[int] | None:
+        """
+        Queue one frame's faces for the shared recognizer, recognized together in one
+        pass. Returns the track ids of a request that lost its place
+        """
+        recognition = self._recognition_queue
+        if recognition is None:
+            return track_ids
+        dropped = recognition.put(
+            camera.name,
+            (camera, track_ids, frame, self.embedding_manager.snapshot, keypoints),
         )
+        return None if dropped is None else dropped[1]
+
+    def _recognize(self, request):
+        camera, track_ids, frame, gallery, keypoints = request
+        start = time.perf_counter()
+        if self.recognition_pool.running():
+
+            def deliver(results):
+                _POOL.observe(time.perf_counter() - start)
+                camera.deliver_recognition(track_ids, results)
+
+            # workers match against their own gallery copy, the result comes back later
+            self.recognition_pool.submit(frame, keypoints, deliver)
+            return
+        results = self.face_recognition.recognize_faces(frame, gallery, keypoints)
+        _INLINE.observe(time.perf_counter() - start)
+        camera.deliver_recognition(track_ids, results)
+
+    def pipeline_stats(self) -> dict:
+        return {
+            "cameras": {
+                name: camera.pipeline_stats() for name, camera in self.cameras.items()
+            },
+            "recognition": (
+                {"running": False, "stages": {}, "queues": {}}
+                if self._recognition is None
+                else self._recognition.stats()
+            ),
+            "recognition_pool": self.recognition_pool.stats(),
+        }
 
-        cap = cv2.VideoCapture(0)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, 720)
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 720)
-        print(f"Width: {cap.get(cv2.CAP_PROP_FRAME_WIDTH)}")
-        print(f"Height: {cap.get(cv2.CAP_PROP_FRAME_HEIGHT)}")
-
-        try:
-            while not self._stop_signal.is_set() and cap.isOpened():
-                # use thread for intensive blocking operations so api can still respond quickly
-                ret, frame = await asyncio.to_thread(cap.read)
-                if not ret:
-                    print("Failed to read frame")
-                    break
-
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = await asyncio.to_thread(face_mesh.process, rgb_frame)
-
-                if results.multi_face_landmarks:
-                    for landmarks in results.multi_face_landmarks:
-                        (
-                            name,
-                            score,
-                            access,
-                        ) = await asyncio.to_thread(  # TODO: update for no-GIL python
-                            self.face_recognition.run_facial_recognition,
-                            frame,
-                            self.embedding_manager.embeddings,
-                            self.embedding_manager.users,
-                        )
-                        img_height, img_width, _ = frame.shape
-                        landmarks_dict = {}
-                        x1, y1, x2, y2 = img_width, img_height, 0, 0
-                        for i, lm in enumerate(landmarks.landmark):
-                            x = int(lm.x * img_width)
-                            y = int(lm.y * img_height)
-                            landmarks_dict[i] = (x, y)
-                            x1 = min(x1, x)
-                            y1 = min(y1, y)
-                            x2 = max(x2, x)
-                            y2 = max(y2, y)
-
-                        x1, y1, x2, y2 = (
-                            max(x1 - 15, 0),
-                            max(y1 - 15, 0),
-                            min(x2 + 15, img_width),
-                            min(y2 + 15, img_height),
-                        )
-
-                        if name == "Unknown":
-                            self.liveness.reset()
-                        else:
-                            self.liveness.calculate_liveness(landmarks_dict)
-
-                        self.overlay.draw(
-                            self.face_recognition.verified,
-                            self.liveness.live,
-                            name,
-                            self.liveness.total_blinks,
-                            frame,
-                            x1,
-                            x2,
-                            y1,
-                            y2,
-                        )
-
-                        # TODO: these single services should not be doing checks, move that here
-                        self.notification_manager.check_and_send(
-                            self.face_recognition.verified,
-                            self.liveness.live,
-                            name,
-                            access_level=access,
-                        )
-
-                        if (
-                            not self._door_busy
-                            and self.face_recognition.verified
-                            and self.liveness.live
-                            and (
-                                access == AccessLevel.ADMIN
-                                or access == AccessLevel.FAMILY
-                            )
-                        ):
-                            # run in a task to avoid blocking loop
-                            asyncio.create_task(self.cycle_lock())
-
-                else:  # no face landmarks recognized
-                    self.face_recognition.reset()
-                    self.liveness.reset()
-
-                # imencode should be lightweight enough on this smaller resolution to run w/o thread
-                self.latest_frame_jpg_enc = cv2.imencode(".jpg", frame)
-                # cv2.imshow("Face Detection", frame)
-                if cv2.waitKey(1) & 0xFF == ord("q"):
-                    self._stop_signal.set()
-                    break
-        finally:
-            cap.release()
-            cv2.destroyAllWindows()
-            for _ in range(2):
-                cv2.waitKey(1)  # let HighGUI process the close event
-            face_mesh.close()
-            self._stop_signal.set()
-            self._video_task = None
-            self.latest_frame_jpg_enc = None
+    def collect_metrics(self) -> list[metrics.CollectedMetric]:
+        stats = self.pipeline_stats()
+        dropped, active = [], []
+        for name, camera in stats["cameras"].items():
+            for queue_name, queue_stats in camera["queues"].items():
+                dropped.append(
+                    ({"camera": name, "queue": queue_name}, queue_stats["dropped"])
+                )
+            active.append(({"camera": name}, int(camera["gate"]["mode"] == "active")))
+        recognition_queue = stats["recognition"]["queues"].get("recognition", {})
+        for lane, lane_stats in recognition_queue.get("lanes", {}).items():
+            dropped.append(
+                ({"camera": lane, "queue": "recognition"}, lane_stats["dropped"])
+            )
+        return [
+            (
+                "lock_override_pipeline_dropped_total",
+                "counter",
+                "Frames or requests a full latest-wins queue dropped, per camera run.",
+                dropped,
+            ),
+            (
+                "lock_override_camera_active",
+                "gauge",
+                "1 while a camera's motion gate is active, 0 while it watches.",
+                active,
+            ),
+        ]
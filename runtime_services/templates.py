@@ -0,0 +1,149 @@
+import numpy as np
+
+from runtime_services.quantization import STORAGE_DTYPES, QuantizedMatrix, quantize
+
+
+class TemplateView:
+    """
+    Read-only per-image embeddings published with a gallery snapshot.
+    Gallery row r owns template rows starts[r] : starts[r] + counts[r]
+    """
+
+    __slots__ = ("matrix", "starts", "counts")
+
+    def __init__(self, matrix: QuantizedMatrix, starts: np.ndarray, counts: np.ndarray):
+        starts.flags.writeable = False
+        counts.flags.writeable = False
+        self.matrix = matrix
+        self.starts = starts
+        self.counts = counts
+
+    def max_scores(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """(Q, C) best template score of each query against its C candidate gallery rows"""
+        out = np.full(rows.shape, -np.inf, dtype=np.float32)
+        for q in range(queries.shape[0]):
+            (cols,) = np.nonzero(rows[q] >= 0)
+            candidates = rows[q, cols]
+            counts = self.counts[candidates]
+            cols, candidates, counts = (
+                cols[counts > 0],
+                candidates[counts > 0],
+                counts[counts > 0],
+            )
+            if cols.size == 0:
+                continue
+            # gather every candidate segment in one go, then max within each segment
+            offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            template_rows = np.repeat(self.starts[candidates] - offsets, counts)
+            template_rows += np.arange(template_rows.shape[0])
+            scores = self.matrix.dot(queries[q : q + 1], template_rows)[0]
+            out[q, cols] = np.maximum.reduceat(scores, offsets)
+        return out
+
+    def max_scores_all(self, queries: np.ndarray) -> np.ndarray:
+        """(Q, rows) best template score of each query against every gallery row"""
+        n = self.starts.shape[0]
+        scores = np.full((queries.shape[0], len(self.matrix) + 1), -np.inf, np.float32)
+        scores[:, :-1] = self.matrix.dot(queries)
+        # segments aren't contiguous, so reduce over interleaved (start, end) pairs
+        # and keep the even results, the trailing -inf column makes end == len valid
+        bounds = np.empty(2 * n, dtype=np.int64)
+        bounds[0::2] = self.starts
+        bounds[1::2] = self.starts + self.counts
+        best = (
+            np.maximum.reduceat(scores, bounds, axis=1)[:, 0::2] if n else scores[:, :0]
+        )
+        best[:, self.counts == 0] = -np.inf
+        return best
+
+
+class TemplateStore:
+    """
+    Mutable per-image embeddings owned by EmebeddingManager and only touched under its
+    lock. A user's templates are replaced by appending a fresh segment, dead segments are
+    compacted away once they outnumber the live ones, always into a new buffer so
+    published views stay valid
+    """
+
+    def __init__(self, dim: int, storage_dtype: str = "float32"):
+        self._dim = dim
+        self._storage_dtype = storage_dtype
+        self._codes = np.empty((64, dim), dtype=STORAGE_DTYPES[storage_dtype])
+        self._scales = np.ones(64, dtype=np.float32)
+        self._used = 0  # template rows written, live or dead
+        self._live = 0
+
+        self._starts = np.zeros(16, dtype=np.int64)  # gallery row -> first template
+        self._counts = np.zeros(16, dtype=np.int64)
+        self._size = 0  # gallery rows
+
+    def __len__(self) -> int:
+        return self._live
+
+    def _reserve(self, extra: int):
+        if self._used + extra <= self._codes.shape[0]:
+            return
+        capacity = max(self._codes.shape[0] * 2, self._used + extra)
+        codes = np.empty((capacity, self._dim), dtype=self._codes.dtype)
+        codes[: self._used] = self._codes[: self._used]
+        scales = np.ones(capacity, dtype=np.float32)
+        scales[: self._used] = self._scales[: self._used]
+        self._codes, self._scales = codes, scales
+
+    def set(self, row: int, embeddings: np.ndarray):
+        """Replace the templates of gallery `row`, appending a new row if row == size"""
+        if row >= self._starts.shape[0]:
+            capacity = max(self._starts.shape[0] * 2, row + 1)
+            self._starts = np.resize(self._starts, capacity)
+            self._counts = np.resize(self._counts, capacity)
+        if row >= self._size:
+            self._counts[row] = 0
+            self._size = row + 1
+
+        codes, scales = quantize(embeddings, self._storage_dtype)
+        self._reserve(codes.shape[0])
+        start = self._used
+        self._codes[start : start + codes.shape[0]] = codes
+        if scales is not None:
+            self._scales[start : start + codes.shape[0]] = scales
+        self._used += codes.shape[0]
+        self._live += codes.shape[0] - int(self._counts[row])
+        self._starts[row] = start
+        self._counts[row] = codes.shape[0]
+
+        self._maybe_compact()
+
+    def remove(self, row: int, last: int):
+        """Mirror the gallery swap-delete, row `last` now lives at `row`"""
+        self._live -= int(self._counts[row])
+        self._starts[row] = self._starts[last]
+        self._counts[row] = self._counts[last]
+        self._size = last
+        self._maybe_compact()
+
+    def _maybe_compact(self):
+        if self._used > 1024 and self._used > 2 * self._live:
+            self._compact()
+
+    def _compact(self):
+        starts, counts = self._starts[: self._size], self._counts[: self._size]
+        offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        live_rows = np.repeat(starts - offsets, counts) + np.arange(int(counts.sum()))
+        # fancy indexing copies, so published views keep the old buffer untouched
+        codes = self._codes[live_rows]
+        scales = self._scales[live_rows]
+        capacity = max(64, 2 * codes.shape[0])
+        self._codes = np.empty((capacity, self._dim), dtype=codes.dtype)
+        self._codes[: codes.shape[0]] = codes
+        self._scales = np.ones(capacity, dtype=np.float32)
+        self._scales[: codes.shape[0]] = scales
+        self._starts[: self._size] = offsets
+        self._used = self._live = codes.shape[0]
+
+    def view(self) -> TemplateView:
+        scales = self._scales[: self._used] if self._storage_dtype == "int8" else None
+        return TemplateView(
+            QuantizedMatrix(self._codes[: self._used], scales),
+            self._starts[: self._size].copy(),
+            self._counts[: self._size].copy(),
+        )
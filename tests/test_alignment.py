@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+from mediapipe.framework.formats import landmark_pb2
+
+from face_recognition.alignment import mesh_keypoints, mesh_points, mesh_xyz
+
+
+def _face(count: int = 478, seed: int = 0) -> landmark_pb2.NormalizedLandmarkList:
+    face = landmark_pb2.NormalizedLandmarkList()
+    rng = np.random.default_rng(seed)
+    for x, y, z in rng.uniform((0.3, 0.25, -0.1), (0.7, 0.75, 0.1), (count, 3)):
+        face.landmark.add(x=x, y=y, z=z)
+    return face
+
+
+class MeshLandmarksTest(unittest.TestCase):
+    def test_pixels_and_depth_from_the_landmark_fields(self):
+        face = _face()
+        xyz = mesh_xyz(face, 640, 480)
+        expected = [(lm.x * 640, lm.y * 480, lm.z * 640) for lm in face.landmark]
+        np.testing.assert_allclose(xyz, expected)
+        np.testing.assert_array_equal(
+            mesh_points(face, 640, 480), xyz[:, :2].astype(np.int32)
+        )
+
+    def test_keypoints_keep_subpixel_precision(self):
+        xyz = mesh_xyz(_face(), 640, 480)
+        keypoints = mesh_keypoints(xyz[:, :2])
+        np.testing.assert_allclose(
+            keypoints, xyz[[468, 473, 1, 61, 291], :2], rtol=1e-6
+        )
+        self.assertTrue((keypoints != np.round(keypoints)).any())
+
+    def test_eye_corners_without_refined_landmarks(self):
+        xyz = mesh_xyz(_face(count=468), 640, 480)
+        keypoints = mesh_keypoints(xyz[:, :2])
+        np.testing.assert_allclose(
+            keypoints[0], xyz[[33, 133], :2].mean(axis=0), rtol=1e-6
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+from api import config
+from utils.enums import ConfigSections
+
+
+class ReplaceSectionTest(unittest.TestCase):
+    def setUp(self):
+        # nothing reaches config.json, the section comes back as it was validated
+        patcher = mock.patch.object(
+            config.config_manager, "replace_section", side_effect=lambda _, body: body
+        )
+        self.replace_section = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _put(self, section: ConfigSections, body: dict):
+        return asyncio.run(config.replace_config_section(section, body))
+
+    def _assert_rejected(self, section: ConfigSections, body: dict):
+        with self.assertRaises(HTTPException) as raised:
+            self._put(section, body)
+        self.assertEqual(raised.exception.status_code, 422)
+        self.replace_section.assert_not_called()
+
+    def test_body_of_another_section_is_rejected(self):
+        self._assert_rejected(
+            ConfigSections.BLINK, {"checks": ["blink"], "mode": "all"}
+        )
+
+    def test_motion_and_camera_bounds(self):
+        for motion in ({"watch_fps": 0}, {"min_changed": 0}, {"pixel_threshold": -1}):
+            self._assert_rejected(ConfigSections.VIDEO, {"motion": motion})
+        for camera in ({"max_faces": 0}, {"fps": 0}, {"width": -720}):
+            self._assert_rejected(ConfigSections.VIDEO, {"cameras": {"front": camera}})
+
+    def test_valid_video_section_is_stored_with_defaults(self):
+        stored = self._put(ConfigSections.VIDEO, {"cameras": {"front": {}}})
+        self.assertEqual(stored["config"]["cameras"]["front"]["max_faces"], 4)
+        self.assertEqual(stored["config"]["motion"]["watch_fps"], 2.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import contextlib
+import io
+import unittest
+
+import numpy as np
+
+from runtime_services.embedding_manager import EmebeddingManager
+
+
+class _Database:
+    """Just enough of Database for an empty gallery, changes arrive as callbacks"""
+
+    active_model = "test"
+
+    def get_all_users(self):
+        return []
+
+    def get_image_embeddings(self, user_id=None):
+        return {}
+
+
+def _unit(seed: int, dim: int = 8) -> np.ndarray:
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+class PublishedSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        # the manager reports every gallery change, keep that out of the test output
+        quiet = contextlib.redirect_stdout(io.StringIO())
+        quiet.__enter__()
+        self.addCleanup(quiet.__exit__, None, None, None)
+        self.manager = EmebeddingManager(_Database(), dim=8)
+
+    def _assert_unchanged(self, snapshot, ids, vectors):
+        self.assertEqual(snapshot.ids.tolist(), ids)
+        np.testing.assert_array_equal(snapshot.matrix.codes, np.stack(vectors))
+
+    def test_append_after_deleting_the_tail_row(self):
+        self.manager.on_embedding_update(1, _unit(1))
+        old = self.manager.snapshot
+
+        self.manager.on_embedding_update(1, None)
+        self.manager.on_embedding_update(2, _unit(2))
+
+        self._assert_unchanged(old, [1], [_unit(1)])
+        self.assertEqual(self.manager.snapshot.ids.tolist(), [2])
+
+    def test_append_after_deleting_a_middle_row(self):
+        for user_id in (1, 2, 3):
+            self.manager.on_embedding_update(user_id, _unit(user_id))
+        old = self.manager.snapshot
+
+        self.manager.on_embedding_update(1, None)
+        self.manager.on_embedding_update(4, _unit(4))
+
+        self._assert_unchanged(old, [1, 2, 3], [_unit(1), _unit(2), _unit(3)])
+        self.assertEqual(self.manager.snapshot.ids.tolist(), [3, 2, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()
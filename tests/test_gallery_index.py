@@ -0,0 +1,100 @@
+import unittest
+
+import numpy as np
+
+from runtime_services.gallery_index import BruteForceIndex, IVFIndex, top_k
+from runtime_services.quantization import QuantizedMatrix
+
+
+def _units(rows: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TopKTest(unittest.TestCase):
+    def test_sorted_and_padded(self):
+        scores = np.array([[0.1, 0.9, 0.5]], np.float32)
+        rows, top = top_k(scores, 5)
+        self.assertEqual(rows.tolist(), [[1, 2, 0, -1, -1]])
+        np.testing.assert_array_equal(top[0, :3], np.float32([0.9, 0.5, 0.1]))
+        self.assertTrue(np.isneginf(top[0, 3:]).all())
+
+    def test_empty_gallery(self):
+        rows, top = top_k(np.empty((2, 0), np.float32), 3)
+        self.assertEqual(rows.tolist(), [[-1] * 3] * 2)
+        self.assertTrue(np.isneginf(top).all())
+
+
+class IVFIndexTest(unittest.TestCase):
+    """
+    Mirrors EmebeddingManager's moves: append at the end, swap-delete into the hole.
+    With every list probed IVF must return exactly what a linear scan does
+    """
+
+    def setUp(self):
+        self.rows = _units(200)
+        self.queries = _units(8, seed=1)
+        self.index = IVFIndex(nlist=8, nprobe=8)
+        self.index.build(QuantizedMatrix.from_float(self.rows))
+
+    def _assert_exact(self, index=None, rows=None):
+        index = index or self.index
+        rows = self.rows if rows is None else rows
+        matrix = QuantizedMatrix.from_float(rows)
+        got_rows, got_scores = index.view().search(self.queries, matrix, k=3)
+        want_rows, want_scores = (
+            BruteForceIndex().view().search(self.queries, matrix, k=3)
+        )
+        np.testing.assert_array_equal(got_rows, want_rows)
+        np.testing.assert_allclose(got_scores, want_scores, rtol=1e-6)
+
+    def _lists(self) -> list[int]:
+        return sorted(int(r) for entries in self.index._lists for r in entries)
+
+    def test_built_index_is_exact_with_every_list_probed(self):
+        self._assert_exact()
+
+    def test_add_after_build(self):
+        extra = _units(20, seed=2)
+        for offset, embedding in enumerate(extra):
+            self.index.add(len(self.rows) + offset, embedding)
+        self.rows = np.concatenate((self.rows, extra))
+        self.assertEqual(self._lists(), list(range(len(self.rows))))
+        self._assert_exact()
+
+    def test_swap_delete_moves_the_last_row(self):
+        for row in (5, 0, 150, 196):
+            last = len(self.rows) - 1
+            self.index.remove(row, last)
+            self.rows[row] = self.rows[last]
+            self.rows = self.rows[:last]
+        self.assertEqual(self._lists(), list(range(len(self.rows))))
+        self._assert_exact()
+
+    def test_update_moves_a_row_between_lists(self):
+        replacement = -self.rows[7]
+        self.index.update(7, replacement)
+        self.rows[7] = replacement
+        self.assertEqual(self._lists(), list(range(len(self.rows))))
+        self._assert_exact()
+
+    def test_published_view_is_unchanged_by_later_moves(self):
+        view = self.index.view()
+        matrix = QuantizedMatrix.from_float(self.rows)
+        before = view.search(self.queries, matrix, k=3)
+        self.index.remove(3, len(self.rows) - 1)
+        self.index.add(len(self.rows) - 1, _units(1, seed=3)[0])
+        after = view.search(self.queries, matrix, k=3)
+        np.testing.assert_array_equal(before[0], after[0])
+
+    def test_untrained_index_grows_from_the_first_add(self):
+        index = IVFIndex(nprobe=4)
+        index.build(QuantizedMatrix.from_float(np.empty((0, 16), np.float32)))
+        rows = _units(40, seed=4)
+        for row, embedding in enumerate(rows):
+            index.add(row, embedding)
+        self._assert_exact(index, rows)
+
+
+if __name__ == "__main__":
+    unittest.main()
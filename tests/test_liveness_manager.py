@@ -0,0 +1,75 @@
+import contextlib
+import io
+import unittest
+
+import numpy as np
+
+from config.config_manager import DEFAULT_CONFIG
+from liveness.blink import Blink
+from liveness.liveness_manager import LivenessManager
+
+FPS = 30.0
+_EYES = Blink()._EYES
+
+
+def _face(eye_open: bool) -> np.ndarray:
+    """(478, 2) landmarks whose eyes have an EAR of 0.4 when open and 0.1 when closed"""
+    points = np.zeros((478, 2), np.float32)
+    half_height = 2.0 if eye_open else 0.5
+    for p1, p2, p3, p4, p5, p6 in _EYES:
+        points[p1], points[p4] = (0, 0), (10, 0)
+        points[p2], points[p3] = (3, -half_height), (7, -half_height)
+        points[p6], points[p5] = (3, half_height), (7, half_height)
+    return points
+
+
+class LivenessExpiryTest(unittest.TestCase):
+    def setUp(self):
+        self.manager = LivenessManager()
+        self.now = 0.0
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.manager.update_config({"checks": ["blink"], "mode": "all"})
+            self.manager.update_check_config(
+                "blink_config", {**DEFAULT_CONFIG["blink_config"], "smoothing_ms": 0}
+            )
+
+    def _frames(self, seconds: float, eye_open: bool = True):
+        face = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(round(seconds * FPS)):
+                self.now += 1 / FPS
+                face = self.manager.check(1, _face(eye_open), self.now)
+        return face
+
+    def _blink(self):
+        self._frames(0.2)
+        self._frames(0.15, eye_open=False)
+        return self._frames(0.1)
+
+    def test_live_face_without_new_blinks_expires(self):
+        self._blink()
+        self.assertTrue(self._blink().live)
+
+        reset_after_s = DEFAULT_CONFIG["blink_config"]["reset_after_s"]
+        self.assertTrue(self._frames(reset_after_s - 1).live)
+        # the camera only unlocks for a live face, standing still must not keep it live
+        self.assertFalse(self._frames(2).live)
+
+    def test_blinking_keeps_a_face_live(self):
+        self._blink()
+        self._blink()
+        for _ in range(3):
+            self._frames(6)
+            self.assertTrue(self._blink().live)
+
+    def test_face_verifies_again_after_expiring(self):
+        self._blink()
+        self._blink()
+        self.assertFalse(self._frames(12).live)
+        self._blink()
+        self.assertTrue(self._blink().live)
+        self.assertEqual(len(self.manager.stats()["decisions"]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from runtime_services.motion import ACTIVE, WATCH, MotionGate
+
+_STILL = np.zeros((120, 160, 3), np.uint8)
+_MOVED = np.full((120, 160, 3), 255, np.uint8)
+
+
+class MotionGateClockTest(unittest.TestCase):
+    def setUp(self):
+        self.gate = MotionGate()
+        self.gate.update_config({"quiet_s": 2.0, "watch_fps": 2.0})
+
+    def test_modes_are_timed_on_the_source_clock(self):
+        # a replayed clip starts its own clock at zero, nowhere near time.monotonic
+        self.gate.reset(0.0)
+        self.gate.observe(_STILL, False, 0.5)
+        self.gate.observe(_MOVED, False, 1.0)
+        self.assertEqual(self.gate.mode, ACTIVE)
+        # the same picture again isn't motion, quiet_s after the change it's watching
+        self.gate.observe(_MOVED, False, 2.0)
+        self.gate.observe(_MOVED, False, 4.0)
+        self.assertEqual(self.gate.mode, WATCH)
+
+        stats = self.gate.stats()
+        self.assertEqual(stats["seconds"], {WATCH: 1.0, ACTIVE: 3.0})
+        self.assertEqual(stats["since_motion_s"], 3.0)
+
+    def test_first_frame_starts_the_clock_without_a_reset(self):
+        self.gate.observe(_STILL, False, 5000.0)
+        self.gate.observe(_STILL, False, 5001.5)
+        self.assertEqual(self.gate.stats()["seconds"], {WATCH: 1.5, ACTIVE: 0.0})
+        self.assertIsNone(self.gate.stats()["since_motion_s"])
+
+    def test_reset_onto_a_new_clock_closes_the_old_span(self):
+        self.gate.reset(100.0)
+        self.gate.observe(_STILL, True, 101.0)
+        self.gate.reset(0.0)
+        self.gate.observe(_STILL, False, 0.5)
+        # a second of watching on the old clock, half a second on the new one
+        self.assertEqual(self.gate.stats()["seconds"], {WATCH: 1.5, ACTIVE: 0.0})
+
+    def test_zero_watch_rate_samples_every_frame(self):
+        self.gate.update_config({"watch_fps": 0})
+        self.gate.reset(0.0)
+        self.gate.observe(_STILL, False, 0.0)
+        self.assertTrue(self.gate.sample_due(0.01))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+
+import numpy as np
+
+from runtime_services.quantization import QuantizedMatrix, quantize
+
+
+def _units(rows: int, dim: int = 64, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class QuantizedMatrixTest(unittest.TestCase):
+    def setUp(self):
+        self.gallery = _units(300)
+        self.queries = _units(5, seed=1)
+        self.exact = self.queries @ self.gallery.T
+
+    def test_int8_codes_use_the_full_range_per_row(self):
+        codes, scales = quantize(self.gallery, "int8")
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_array_equal(np.abs(codes).max(axis=1), 127)
+        np.testing.assert_allclose(
+            codes * scales[:, None], self.gallery, atol=scales.max() / 2 + 1e-7
+        )
+
+    def test_int8_scores_match_float_within_a_rounding_step(self):
+        matrix = QuantizedMatrix.from_float(self.gallery, "int8")
+        # chunked upcasting must not change the result
+        matrix.chunk = 64
+        scores = matrix.dot(self.queries)
+        self.assertEqual(scores.dtype, np.float32)
+        np.testing.assert_allclose(scores, self.exact, atol=0.02)
+        np.testing.assert_allclose(
+            scores, self.queries @ matrix.dequantize().T, rtol=1e-5, atol=1e-6
+        )
+
+    def test_scores_of_selected_rows_use_their_own_scales(self):
+        rows = np.array([299, 3, 150, 3])
+        for dtype in ("float32", "float16", "int8"):
+            matrix = QuantizedMatrix.from_float(self.gallery, dtype)
+            np.testing.assert_allclose(
+                matrix.dot(self.queries, rows),
+                matrix.dot(self.queries)[:, rows],
+                rtol=1e-5,
+                atol=1e-6,
+                err_msg=dtype,
+            )
+
+    def test_zero_row_scores_zero(self):
+        matrix = QuantizedMatrix.from_float(np.zeros((1, 64), np.float32), "int8")
+        np.testing.assert_array_equal(matrix.dot(self.queries), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
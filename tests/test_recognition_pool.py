@@ -0,0 +1,143 @@
+import contextlib
+import io
+import queue
+import threading
+import time
+import unittest
+
+import numpy as np
+
+from runtime_services.recognition_pool import _NO_MATCH, RecognitionPool
+from utils.enums import AccessLevel
+
+_MATCH = ("Alice", 0.9, AccessLevel.FAMILY)
+_FRAME = np.zeros((48, 64, 3), np.uint8)
+_KEYPOINTS = [np.zeros((5, 2), np.float32)]
+
+
+class _Worker(threading.Thread):
+    """
+    Thread standing in for a worker process: answers every face with a match once
+    `release` is set, and stops answering once killed
+    """
+
+    release = threading.Event()
+
+    def __init__(self, target, args, name, daemon):
+        super().__init__(target=self._serve, args=args[1:], name=name, daemon=True)
+        self.killed = False
+
+    def _serve(self, tasks, control, results):
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            self.release.wait()
+            if self.killed:
+                return
+            request_id, _, _, _, keypoints = task
+            results.put((request_id, [_MATCH] * len(keypoints), None))
+
+    def is_alive(self) -> bool:
+        return not self.killed and super().is_alive()
+
+    def terminate(self):
+        self.killed = True
+
+    def close(self):
+        pass
+
+
+class _ThreadContext:
+    Queue = queue.Queue
+    Process = _Worker
+
+
+class RecognitionPoolTest(unittest.TestCase):
+    def setUp(self):
+        _Worker.release.set()
+        self.pool = RecognitionPool(db=None)
+        self.pool._ctx = _ThreadContext()
+        self.results: list[list] = []
+        self.pool.update_config({"recognition_workers": 2})
+        self._quietly(self.pool.start)
+
+    def tearDown(self):
+        _Worker.release.set()
+        self._quietly(self.pool.stop)
+
+    @staticmethod
+    def _quietly(fn, *args):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn(*args)
+
+    def _submit(self):
+        self.pool.submit(_FRAME, _KEYPOINTS, self.results.append)
+
+    def _wait_for(self, count: int, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.results) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(self.results), count)
+
+    def test_submit_while_stopped_resolves_to_no_match(self):
+        self._quietly(self.pool.stop)
+        self._submit()
+        self.assertEqual(self.results, [[_NO_MATCH]])
+
+    def test_only_the_dead_workers_requests_fail(self):
+        _Worker.release.clear()
+        for _ in range(4):
+            self._submit()
+        # requests alternate between the two idle workers
+        self.assertEqual(
+            sorted(w for w, *_ in self.pool._pending.values()), [0, 0, 1, 1]
+        )
+        self.pool._processes[0].killed = True
+        _Worker.release.set()
+
+        self._quietly(self._wait_for, 4)
+        self.assertEqual(self.results.count([_MATCH]), 2)
+        self.assertEqual(self.results.count([_NO_MATCH]), 2)
+        self.assertEqual(self.pool.stats()["alive"], 2)
+
+        # the replacement worker takes new requests
+        for _ in range(2):
+            self._submit()
+        self._wait_for(6)
+        self.assertEqual(self.results[4:], [[_MATCH], [_MATCH]])
+
+    def test_resize_off_the_caller_while_submitting(self):
+        stop = threading.Event()
+        submitted, errors = [], []
+
+        def submit_until_stopped():
+            try:
+                while not stop.is_set():
+                    self._submit()
+                    submitted.append(1)
+            except Exception as e:
+                errors.append(e)
+
+        submitter = threading.Thread(target=submit_until_stopped)
+        with contextlib.redirect_stdout(io.StringIO()):
+            submitter.start()
+            started = time.perf_counter()
+            self.pool.update_config({"recognition_workers": 3})
+            returned_s = time.perf_counter() - started
+            deadline = time.monotonic() + 5
+            while len(self.pool._processes) != 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            stop.set()
+            submitter.join()
+            self._wait_for(len(submitted))
+
+        self.assertLess(returned_s, 0.1)
+        self.assertEqual(errors, [])
+        self.assertEqual(self.pool.stats()["alive"], 3)
+        # a match, or no match for what arrived mid restart, each answered once
+        self.assertTrue(all(r in ([_MATCH], [_NO_MATCH]) for r in self.results))
+
+
+if __name__ == "__main__":
+    unittest.main()
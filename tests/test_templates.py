@@ -0,0 +1,94 @@
+import unittest
+
+import numpy as np
+
+from runtime_services.templates import TemplateStore
+
+
+def _units(rows: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((rows, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+class TemplateStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.store = TemplateStore(dim=16)
+        # gallery row -> that user's templates, the reference the store is checked with
+        self.templates: dict[int, np.ndarray] = {}
+        self.queries = _units(4, seed=99)
+
+    def _set(self, row: int, count: int, seed: int):
+        embeddings = _units(count, seed=seed) if count else np.empty((0, 16))
+        self.store.set(row, embeddings)
+        self.templates[row] = embeddings
+
+    def _remove(self, row: int):
+        last = len(self.templates) - 1
+        self.store.remove(row, last)
+        self.templates[row] = self.templates.pop(last)
+
+    def _expected(self) -> np.ndarray:
+        best = np.full((len(self.queries), len(self.templates)), -np.inf, np.float32)
+        for row, embeddings in self.templates.items():
+            if len(embeddings):
+                best[:, row] = (self.queries @ embeddings.T).max(axis=1)
+        return best
+
+    def _assert_scores(self):
+        view = self.store.view()
+        expected = self._expected()
+        np.testing.assert_allclose(
+            view.max_scores_all(self.queries), expected, rtol=1e-5
+        )
+        # every query with its own candidates, including padding and repeats
+        rows = np.array([[0, -1, 2], [2, 2, -1], [1, 0, 3], [-1, -1, -1]])
+        rows[rows >= len(self.templates)] = -1
+        got = view.max_scores(self.queries, rows)
+        for q, candidates in enumerate(rows):
+            for c, row in enumerate(candidates):
+                want = -np.inf if row < 0 else expected[q, row]
+                self.assertAlmostEqual(float(got[q, c]), float(want), places=5)
+
+    def test_segments_of_different_sizes(self):
+        for row, count in enumerate((3, 1, 5, 2)):
+            self._set(row, count, seed=row)
+        self._assert_scores()
+
+    def test_user_without_templates_never_matches(self):
+        self._set(0, 2, seed=0)
+        self._set(1, 0, seed=1)
+        self._set(2, 1, seed=2)
+        self._assert_scores()
+        self.assertTrue(
+            np.isneginf(self.store.view().max_scores_all(self.queries)[:, 1]).all()
+        )
+
+    def test_replacing_and_swap_deleting_rows(self):
+        for row, count in enumerate((3, 1, 5, 2)):
+            self._set(row, count, seed=row)
+        old = self.store.view()
+        old_scores = old.max_scores_all(self.queries)
+
+        self._set(1, 4, seed=10)
+        self._remove(0)
+        self._assert_scores()
+        # a published view keeps answering for the gallery it was published with
+        np.testing.assert_array_equal(old.max_scores_all(self.queries), old_scores)
+
+    def test_compaction_keeps_every_live_segment(self):
+        for row in range(4):
+            self._set(row, 3, seed=row)
+        old = self.store.view()
+        old_scores = old.max_scores_all(self.queries)
+        rounds = 400
+        for round_ in range(rounds):
+            self._set(round_ % 4, 3, seed=100 + round_)
+        self.assertEqual(len(self.store), 12)
+        # dead segments were dropped along the way
+        self.assertLess(self.store._used, 3 * rounds)
+        self._assert_scores()
+        np.testing.assert_array_equal(old.max_scores_all(self.queries), old_scores)
+
+
+if __name__ == "__main__":
+    unittest.main()
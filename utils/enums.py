@@ -41,4 +41,7 @@ class ConfigSections(Enum):
     RECOGNITION = "face_recognition"
     NOTIFICATIONS = "notifications"
     BLINK = "blink_config"
+    PARALLAX = "parallax_config"
+    LIVENESS = "liveness"
     OVERLAY = "overlay"
+    VIDEO = "video"
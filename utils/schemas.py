@@ -1,6 +1,12 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
+from typing import Literal
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, field_validator
 from utils.enums import AccessLevel
 
+RecognitionModule = Literal[
+    "detection", "recognition", "landmark_3d_68", "landmark_2d_106", "genderage"
+]
+LivenessCheckName = Literal["blink", "parallax"]
+
 
 # USERS API SCHEMAS
 class UserCreate(BaseModel):
@@ -21,12 +27,65 @@ class ImageResponse(BaseModel):
     message: str
 
 
+class BatchImageResult(BaseModel):
+    img_name: str
+    added: bool
+    message: str
+
+
+class BatchImageResponse(BaseModel):
+    user_id: int
+    added: int
+    results: list[BatchImageResult]
+
+
 # CONFIG API SCHEMAS
+class SessionOptionsConfig(BaseModel):
+    """ONNX Runtime session tuning, unset fields inherit the default entry"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    intra_op_num_threads: int | None = None
+    inter_op_num_threads: int | None = None
+    graph_optimization_level: Literal["disable", "basic", "extended", "all"] | None = (
+        None
+    )
+    execution_mode: Literal["sequential", "parallel"] | None = None
+    enable_cpu_mem_arena: bool | None = None
+    enable_mem_pattern: bool | None = None
+
+
 class FaceRecognitionConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     model: str
     similarity_threshold: float
+    providers: list[str] = ["CPUExecutionProvider"]
+    # keyed by "default" or a module name
+    session_options: dict[
+        Literal["default"] | RecognitionModule, SessionOptionsConfig
+    ] = {}
+    warmup_runs: int = 1
+    index: Literal["auto", "brute_force", "ivf"] = "auto"
+    ivf_min_size: int = 20000
+    ivf_nprobe: int = 8
+    storage_dtype: Literal["float32", "float16", "int8"] = "float32"
+    matching: Literal["centroid", "multi_template"] = "centroid"
+    template_prefilter: int = 16
+    recognition_workers: int = 0
+    modules: list[RecognitionModule] = ["detection", "recognition"]
+    alignment: Literal["detector", "mesh"] = "detector"
+    track_max_age: int = 15
+    reverify_interval: int = 30
+    reverify_iou: float = 0.5
+    score_decay: float = 0.005
+
+    @field_validator("modules")
+    @classmethod
+    def _needs_detection_and_recognition(cls, modules):
+        if not {"detection", "recognition"} <= set(modules):
+            raise ValueError("modules must include detection and recognition")
+        return modules
 
 
 class EmailConfig(BaseModel):
@@ -60,8 +119,26 @@ class BlinkConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     ear_threshold: float
-    blink_consec_frames: int
+    min_closed_ms: float = 60.0  # eyes closed at least this long is a blink, at any fps
+    smoothing_ms: float = 30.0  # EAR smoothing time constant, 0 turns it off
     blinks_to_verify: int
+    reset_after_s: float = 10.0
+
+
+class ParallaxConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    window_ms: float = 600.0  # each frame is compared with the oldest this recent
+    min_parallax: float = 0.03  # radians of head turn the landmark depth has to show
+    min_depth_fit: float = 0.6  # share of the non planar motion depth must explain
+    hits_to_verify: int = 2  # frames in the window showing it
+
+
+class LivenessConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    checks: list[LivenessCheckName]  # run cheapest first, empty turns liveness off
+    mode: Literal["all", "any"] = "all"  # every check must pass, or any one of them
 
 
 class OverlayConfig(BaseModel):
@@ -72,10 +149,46 @@ class OverlayConfig(BaseModel):
     mesh: bool = False
 
 
+class CameraConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    source: int | str = 0  # device index, file, image directory or stream URL
+    kind: Literal["auto", "camera", "video", "images", "synthetic"] = "auto"
+    fps: float | None = Field(default=None, gt=0)  # playback rate of recorded sources
+    loop: bool = False  # restart a clip or image directory at its end
+    realtime: bool = True  # pace recorded sources, False reads them as fast as possible
+    width: int = Field(default=720, ge=1)
+    height: int = Field(default=720, ge=1)
+    lock: str | None = None  # None only watches, it never opens a door
+    # FaceMesh faces per frame, all recognized in one pass
+    max_faces: int = Field(default=4, ge=1)
+
+
+class MotionConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    enabled: bool = True
+    width: int = Field(default=160, ge=16)  # width of the compared image
+    pixel_threshold: int = Field(default=25, ge=1, le=255)  # gray level change counted
+    min_changed: float = Field(default=0.01, gt=0, le=1)  # changed fraction that moved
+    quiet_s: float = Field(default=5.0, ge=0)  # seconds without motion until watching
+    watch_fps: float = Field(default=2.0, gt=0)  # samples per second while watching
+
+
+class VideoConfig(BaseModel):
+    model_config = ConfigDict(extra="forbid")
+
+    cameras: dict[str, CameraConfig] = {}
+    motion: MotionConfig = MotionConfig()
+
+
 class AppConfig(BaseModel):
     model_config = ConfigDict(extra="forbid")
 
     face_recognition: FaceRecognitionConfig
     notifications: NotificationsConfig
     blink_config: BlinkConfig
+    parallax_config: ParallaxConfig = ParallaxConfig()
+    liveness: LivenessConfig
     overlay: OverlayConfig
+    video: VideoConfig